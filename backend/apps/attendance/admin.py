@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Attendance
+from .models import Attendance, AttendanceDailySummary, AttendanceEvent
 
 
 @admin.register(Attendance)
@@ -9,3 +9,18 @@ class AttendanceAdmin(admin.ModelAdmin):
     search_fields = ['user__first_name', 'user__last_name']
     readonly_fields = ['created_at', 'updated_at']
 
+
+@admin.register(AttendanceEvent)
+class AttendanceEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'event_id', 'event_type', 'device_time', 'status', 'attendance', 'created_at']
+    list_filter = ['event_type', 'status', 'created_at']
+    search_fields = ['event_id', 'user__first_name', 'user__last_name']
+    readonly_fields = ['created_at']
+
+
+@admin.register(AttendanceDailySummary)
+class AttendanceDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'work_date', 'first_checkin', 'last_checkout', 'total_hours', 'sessions', 'is_late']
+    list_filter = ['is_late', 'work_date']
+    search_fields = ['user__first_name', 'user__last_name']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,267 @@
+"""
+Холодный архив посещаемости: один файл NumPy .npz на компанию и месяц
+
+Каждая колонка - отдельный массив компактного типа (datetime64, int32, bool),
+редкие текстовые поля (заметки, фото, координаты) - JSON в члене extra.
+Члены архива хранятся без сжатия (ZIP_STORED, как пишет np.savez), поэтому
+колонки открываются через np.memmap по смещению внутри zip: фильтр по дате,
+сотруднику и опозданию считается по отображенным в память колонкам, а в
+Python-объекты превращаются только строки текущей страницы.
+
+Дневные сводки (AttendanceDailySummary) при архивации не удаляются, отчеты
+и расчет ЗП продолжают работать по ним.
+"""
+import json
+import os
+import struct
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+
+COLUMNS = {
+    'id': 'i8',
+    'user_id': 'i8',
+    'work_date': 'datetime64[D]',
+    'checkin_time': 'datetime64[us]',
+    'checkout_time': 'datetime64[us]',
+    'total_hours': 'f8',
+    'is_late': '?',
+    'late_minutes': 'i4',
+    'face_verified': '?',
+    'location_verified': '?',
+    'work_location_id': 'i8',
+    'created_at': 'datetime64[us]',
+    'updated_at': 'datetime64[us]',
+}
+DATETIME_COLUMNS = ['checkin_time', 'checkout_time', 'created_at', 'updated_at']
+BOOL_COLUMNS = ['is_late', 'face_verified', 'location_verified']
+EXTRA_FIELDS = [
+    'notes', 'checkin_photo_url', 'checkout_photo_url',
+    'checkin_latitude', 'checkin_longitude', 'checkout_latitude', 'checkout_longitude',
+]
+DECIMAL_FIELDS = {'checkin_latitude', 'checkin_longitude', 'checkout_latitude', 'checkout_longitude'}
+ARCHIVE_FIELDS = list(COLUMNS) + EXTRA_FIELDS
+NULL_ID = -1
+
+
+def archive_dir(company_id):
+    return Path(settings.ATTENDANCE_ARCHIVE_DIR) / (str(company_id) if company_id else 'none')
+
+
+def archive_path(company_id, month):
+    return archive_dir(company_id) / f'{month:%Y-%m}.npz'
+
+
+def archive_files(company_id, start=None, end=None):
+    """Файлы архива компании за период, от новых к старым"""
+    directory = archive_dir(company_id)
+    if not directory.exists():
+        return []
+    paths = []
+    for path in directory.glob('*.npz'):
+        month = datetime.strptime(path.stem, '%Y-%m').date()
+        if start and month < start.replace(day=1):
+            continue
+        if end and month > end:
+            continue
+        paths.append(path)
+    return sorted(paths, reverse=True)
+
+
+def _to_datetime64(value):
+    if value is None:
+        return np.datetime64('NaT')
+    return np.datetime64(value.astimezone(dt_timezone.utc).replace(tzinfo=None), 'us')
+
+
+def _from_datetime64(value):
+    value = value.item()
+    return value.replace(tzinfo=dt_timezone.utc) if value is not None else None
+
+
+def save_archive(path, rows):
+    """
+    Записывает строки (dict из values(*ARCHIVE_FIELDS)) в файл. Строки уже
+    существующего файла сохраняются, совпадающие по id заменяются новыми.
+    Запись атомарна: временный файл + os.replace.
+    """
+    merged = {row['id']: row for row in load_rows(path)} if path.exists() else {}
+    merged.update((row['id'], row) for row in rows)
+    rows = sorted(merged.values(), key=lambda row: (row['checkin_time'], row['id']))
+
+    arrays = {
+        'id': np.array([row['id'] for row in rows], dtype='i8'),
+        'user_id': np.array([row['user_id'] for row in rows], dtype='i8'),
+        'work_date': np.array([row['work_date'] for row in rows], dtype='datetime64[D]'),
+        'total_hours': np.array(
+            [np.nan if row['total_hours'] is None else float(row['total_hours']) for row in rows], dtype='f8'
+        ),
+        'late_minutes': np.array([row['late_minutes'] for row in rows], dtype='i4'),
+        'work_location_id': np.array([row['work_location_id'] or NULL_ID for row in rows], dtype='i8'),
+    }
+    for name in DATETIME_COLUMNS:
+        arrays[name] = np.array([_to_datetime64(row[name]) for row in rows], dtype='datetime64[us]')
+    for name in BOOL_COLUMNS:
+        arrays[name] = np.array([row[name] for row in rows], dtype='?')
+
+    extra = {}
+    for row in rows:
+        values = {
+            name: str(row[name]) if name in DECIMAL_FIELDS else row[name]
+            for name in EXTRA_FIELDS if row[name] is not None
+        }
+        if values:
+            extra[str(row['id'])] = values
+    arrays['extra'] = np.frombuffer(json.dumps(extra, ensure_ascii=False).encode(), dtype='u1')
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def memmap_column(path, name):
+    """Колонка архива как np.memmap (член zip хранится без сжатия)"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f'{name}.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            with archive.open(info) as member:
+                return np.load(member)
+
+    with open(path, 'rb') as f:
+        # Локальный заголовок zip: 30 байт + имя файла + extra
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if not shape[0]:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+def read_extra(path):
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('extra.npy') as member:
+            return json.loads(np.load(member).tobytes().decode())
+
+
+def load_rows(path, indices=None):
+    """Строки архива (все или по индексам) в формате values(*ARCHIVE_FIELDS)"""
+    columns = {name: memmap_column(path, name) for name in COLUMNS}
+    if indices is None:
+        indices = range(len(columns['id']))
+    extra = read_extra(path)
+
+    rows = []
+    for index in indices:
+        total_hours = columns['total_hours'][index]
+        work_location_id = int(columns['work_location_id'][index])
+        row = {
+            'id': int(columns['id'][index]),
+            'user_id': int(columns['user_id'][index]),
+            'work_date': columns['work_date'][index].item(),
+            'total_hours': None if np.isnan(total_hours) else Decimal(f'{total_hours:.2f}'),
+            'late_minutes': int(columns['late_minutes'][index]),
+            'work_location_id': None if work_location_id == NULL_ID else work_location_id,
+        }
+        for name in DATETIME_COLUMNS:
+            row[name] = _from_datetime64(columns[name][index])
+        for name in BOOL_COLUMNS:
+            row[name] = bool(columns[name][index])
+        values = extra.get(str(row['id']), {})
+        for name in EXTRA_FIELDS:
+            value = values.get(name)
+            row[name] = Decimal(value) if value is not None and name in DECIMAL_FIELDS else value
+        rows.append(row)
+    return rows
+
+
+class ArchivedRows:
+    """
+    Отфильтрованные строки архива, от новых к старым. Хранит только индексы
+    строк в файлах; срез (страница пагинатора) читает из файлов только эти строки.
+    """
+
+    def __init__(self, parts):
+        self.parts = [(path, indices) for path, indices in parts if len(indices)]
+
+    def __len__(self):
+        return sum(len(indices) for _, indices in self.parts)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(len(self))
+        rows = []
+        offset = 0
+        for path, indices in self.parts:
+            size = len(indices)
+            if offset + size > start and offset < stop:
+                selected = indices[max(start - offset, 0):stop - offset]
+                rows.extend(load_rows(path, selected))
+            offset += size
+            if offset >= stop:
+                break
+        return with_names(rows)
+
+
+def find_archived(company_id, start=None, end=None, user_ids=None, is_late=None):
+    """
+    Поиск по архиву компании. Фильтры считаются масками NumPy по колонкам,
+    отображенным в память; результат сортирован по checkin_time по убыванию.
+    """
+    parts = []
+    for path in archive_files(company_id, start, end):
+        work_date = memmap_column(path, 'work_date')
+        mask = np.ones(len(work_date), dtype=bool)
+        if start:
+            mask &= work_date >= np.datetime64(start, 'D')
+        if end:
+            mask &= work_date <= np.datetime64(end, 'D')
+        if user_ids is not None:
+            mask &= np.isin(memmap_column(path, 'user_id'), list(user_ids))
+        if is_late is not None:
+            mask &= memmap_column(path, 'is_late') == is_late
+
+        indices = np.flatnonzero(mask)
+        order = np.lexsort((
+            memmap_column(path, 'id')[indices],
+            memmap_column(path, 'checkin_time')[indices],
+        ))
+        parts.append((path, indices[order[::-1]]))
+    return ArchivedRows(parts)
+
+
+def with_names(rows):
+    """Добавляет user_name и work_location_name, как values() горячей истории"""
+    from apps.users.models import User
+    from apps.geolocation.models import WorkLocation
+
+    users = {
+        user['id']: user for user in User.objects.filter(
+            id__in={row['user_id'] for row in rows}
+        ).values('id', 'first_name', 'last_name')
+    }
+    locations = dict(WorkLocation.objects.filter(
+        id__in={row['work_location_id'] for row in rows if row['work_location_id']}
+    ).values_list('id', 'name'))
+
+    for row in rows:
+        user = users.get(row['user_id'], {})
+        row['user__first_name'] = user.get('first_name', '')
+        row['user__last_name'] = user.get('last_name', '')
+        row['work_location__name'] = locations.get(row['work_location_id'])
+    return rows
@@ -0,0 +1,188 @@
+"""
+Пакетная обработка отметок прихода/ухода (турникеты, киоски)
+
+Весь пакет обрабатывается фиксированным числом запросов независимо от размера:
+сотрудники, графики, локации и открытые смены загружаются одним запросом
+каждый, запись идет через bulk_create/bulk_update в одной транзакции,
+на дашборд уходит одно агрегированное WebSocket событие.
+"""
+import logging
+from django.db import transaction
+from django.utils import timezone
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from apps.departments.schedules import get_schedules
+from apps.geolocation.models import WorkLocation
+from .models import Attendance, local_work_date, open_daily_summaries, refresh_daily_summaries
+from apps.reports.cache import bump_data_version
+from .presence import update_presence
+
+logger = logging.getLogger(__name__)
+
+channel_layer = get_channel_layer()
+
+CHECKOUT_FIELDS = [
+    'checkout_time', 'checkout_photo_url', 'checkout_latitude',
+    'checkout_longitude', 'total_hours', 'updated_at'
+]
+
+
+def event_error(index, code, message, details=None):
+    error = {'code': code, 'message': message}
+    if details:
+        error['details'] = details
+    return {'index': index, 'status': 'error', 'error': error}
+
+
+def process_attendance_events(events, users_queryset):
+    """
+    Применяет провалидированные события (dict с ключом 'index').
+
+    users_queryset ограничивает сотрудников, для которых разрешены отметки
+    (тенант и роль). Возвращает результаты, индексированные по 'index'.
+    """
+    now = timezone.now()
+    for event in events:
+        event.setdefault('timestamp', now)
+
+    users = users_queryset.filter(id__in={e['user_id'] for e in events}).only(
+        'id', 'company_id', 'department_id', 'work_schedule_id', 'first_name', 'last_name'
+    ).in_bulk()
+    schedules = get_schedules({u.work_schedule_id for u in users.values()})
+    locations = {}
+    for location in WorkLocation.objects.filter(
+        department_id__in={u.department_id for u in users.values() if u.department_id},
+        is_active=True
+    ).order_by('id'):
+        locations.setdefault(location.department_id, location)
+
+    results = {}
+    outcomes = []  # (index, status, attendance)
+    created = []
+    closed = {}
+
+    with transaction.atomic():
+        days = set()
+        for event in events:
+            user = users.get(event['user_id'])
+            if user:
+                event['work_date'] = local_work_date(event['timestamp'], user.company_id)
+                days.add(event['work_date'])
+
+        open_sessions = {}
+        for attendance in Attendance.objects.select_for_update().filter(
+            user_id__in=users.keys(),
+            work_date__in=days,
+            checkout_time__isnull=True
+        ).order_by('checkin_time'):
+            open_sessions[(attendance.user_id, attendance.work_date)] = attendance
+
+        # События применяются в хронологическом порядке
+        for event in sorted(events, key=lambda e: e['timestamp']):
+            index = event['index']
+            user = users.get(event['user_id'])
+            if user is None:
+                results[index] = event_error(index, 'NOT_FOUND', 'Сотрудник не найден')
+                continue
+
+            key = (user.id, event['work_date'])
+            session = open_sessions.get(key)
+
+            if event['event_type'] == 'checkin':
+                if session:
+                    results[index] = event_error(index, 'ALREADY_CHECKED_IN', 'Приход уже отмечен')
+                    continue
+                schedule = schedules.get(user.work_schedule_id)
+                is_late, late_minutes = schedule.lateness(event['timestamp']) if schedule else (False, 0)
+                attendance = Attendance(
+                    user=user,
+                    company_id=user.company_id,
+                    checkin_time=event['timestamp'],
+                    work_date=event['work_date'],
+                    checkin_photo_url=event.get('photo_url'),
+                    checkin_latitude=event.get('latitude'),
+                    checkin_longitude=event.get('longitude'),
+                    work_location=locations.get(user.department_id) if event.get('latitude') else None,
+                    is_late=is_late,
+                    late_minutes=late_minutes,
+                    face_verified=event.get('face_verified', False),
+                    location_verified=event.get('location_verified', False)
+                )
+                created.append(attendance)
+                open_sessions[key] = attendance
+                outcomes.append((index, 'checked_in', attendance))
+            else:
+                if session is None:
+                    results[index] = event_error(index, 'NOT_CHECKED_IN', 'Приход не отмечен')
+                    continue
+                if event['timestamp'] < session.checkin_time:
+                    results[index] = event_error(
+                        index, 'VALIDATION_ERROR', 'Время ухода раньше времени прихода'
+                    )
+                    continue
+                session.user = user
+                session.checkout_time = event['timestamp']
+                session.checkout_photo_url = event.get('photo_url')
+                session.checkout_latitude = event.get('latitude')
+                session.checkout_longitude = event.get('longitude')
+                session.total_hours = session.calculate_total_hours()
+                session.updated_at = now
+                del open_sessions[key]
+                if session.pk:
+                    closed[session.pk] = session
+                outcomes.append((index, 'checked_out', session))
+
+        # Сигналы при пакетной записи не вызываются: поля заполнены выше, сводки обновляются явно
+        Attendance.objects.bulk_create(created)
+        Attendance.objects.bulk_update(closed.values(), CHECKOUT_FIELDS)
+        # Как и в refresh_daily_summary: открытые смены только начинают день в сводке
+        open_daily_summaries(attendance for attendance in created if not attendance.checkout_time)
+        refresh_daily_summaries(
+            (attendance.user_id, attendance.work_date)
+            for attendance in created + list(closed.values()) if attendance.checkout_time
+        )
+
+    update_presence(created + list(closed.values()))
+    bump_data_version(attendance.company_id for attendance in created + list(closed.values()))
+    for index, status, attendance in outcomes:
+        results[index] = {'index': index, 'status': status, 'attendance_id': attendance.id}
+
+    send_batch_event(outcomes)
+    return results
+
+
+def send_batch_event(outcomes):
+    """Одно агрегированное WebSocket событие на весь пакет"""
+    if not outcomes:
+        return
+    checkins, checkouts = [], []
+    for _, status, attendance in outcomes:
+        user = attendance.user
+        if status == 'checked_in':
+            checkins.append({
+                'user_id': user.id,
+                'user_name': f'{user.first_name} {user.last_name}',
+                'department_id': user.department_id,
+                'checkin_time': attendance.checkin_time.isoformat(),
+                'is_late': attendance.is_late,
+                'late_minutes': attendance.late_minutes
+            })
+        else:
+            checkouts.append({
+                'user_id': user.id,
+                'user_name': f'{user.first_name} {user.last_name}',
+                'checkout_time': attendance.checkout_time.isoformat(),
+                'total_hours': float(attendance.total_hours or 0)
+            })
+    try:
+        if channel_layer:
+            async_to_sync(channel_layer.group_send)(
+                'dashboard',
+                {
+                    'type': 'attendance_batch',
+                    'checkins': checkins,
+                    'checkouts': checkouts
+                }
+            )
+    except Exception as e:
+        logger.warning(f"Failed to send WebSocket event: {e}")
@@ -0,0 +1,204 @@
+"""
+Очередь отметок прихода (write-behind)
+
+При ATTENDANCE_CHECKIN_QUEUE приход только валидируется и ставится в очередь,
+ответ 202 уходит сразу. Команда drain_checkin_queue пачками переносит события
+в Attendance через process_attendance_events и отправляет WebSocket события.
+
+Для read-your-writes очередь хранит маркер ожидающего прихода по ключу
+(сотрудник, рабочий день): его читает AttendanceCurrentView, он же защищает
+от повторной отметки до записи в БД. Маркер снимается после записи.
+"""
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from apps.users.models import User
+from .batch import process_attendance_events
+from .serializers import AttendanceEventSerializer
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'attendance:checkin_queue'
+PENDING_KEY = 'attendance:checkin_pending'
+GROUP_NAME = 'attendance-drainers'
+# Чужие неподтвержденные события старше этого забираются (упавший drainer)
+CLAIM_IDLE_MS = 60000
+
+
+def _pending_field(user_id, work_date):
+    return f'{user_id}:{work_date.isoformat()}'
+
+
+class MemoryCheckinQueue:
+    """Очередь в памяти процесса: тесты и разработка без Redis"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._ids = itertools.count(1)
+
+    def enqueue(self, user_id, work_date, event):
+        """Ставит событие в очередь; False, если приход за этот день уже ожидает записи"""
+        field = _pending_field(user_id, work_date)
+        with self._lock:
+            if field in self._pending:
+                return False
+            self._pending[field] = event
+            self._entries[str(next(self._ids))] = (field, event)
+        return True
+
+    def pending(self, user_id, work_date):
+        return self._pending.get(_pending_field(user_id, work_date))
+
+    def read(self, count, block=None):
+        if block and not self._entries:
+            time.sleep(block / 1000)
+        with self._lock:
+            return [
+                (entry_id, event)
+                for entry_id, (_, event) in itertools.islice(self._entries.items(), count)
+            ]
+
+    def ack(self, entry_ids):
+        with self._lock:
+            for entry_id in entry_ids:
+                field, _ = self._entries.pop(entry_id, (None, None))
+                self._pending.pop(field, None)
+
+
+def default_consumer():
+    """Имя потребителя процесса: у каждого drainer свой список неподтвержденных"""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class RedisCheckinQueue:
+    """
+    Redis stream с группой потребителей: неподтвержденные события перечитываются
+    своим потребителем, а события упавшего потребителя забираются XAUTOCLAIM
+    """
+
+    def __init__(self, url, consumer=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.consumer = consumer or default_consumer()
+        self._group_ready = False
+
+    def enqueue(self, user_id, work_date, event):
+        field = _pending_field(user_id, work_date)
+        payload = json.dumps(event)
+        # HSETNX атомарно защищает от двойной отметки между воркерами
+        if not self.client.hsetnx(PENDING_KEY, field, payload):
+            return False
+        try:
+            self.client.xadd(STREAM_KEY, {'field': field, 'payload': payload})
+        except Exception:
+            self.client.hdel(PENDING_KEY, field)
+            raise
+        return True
+
+    def pending(self, user_id, work_date):
+        payload = self.client.hget(PENDING_KEY, _pending_field(user_id, work_date))
+        return json.loads(payload) if payload else None
+
+    def read(self, count, block=None):
+        self._ensure_group()
+        # Сначала свои неподтвержденные (после ошибки записи), затем зависшие у других, затем новые
+        entries = self._read_group('0', count)
+        if not entries:
+            entries = self._claim_stale(count)
+        if not entries:
+            entries = self._read_group('>', count, block)
+        self._fields = {entry_id: data['field'] for entry_id, data in entries}
+        return [(entry_id, json.loads(data['payload'])) for entry_id, data in entries]
+
+    def _read_group(self, stream_id, count, block=None):
+        response = self.client.xreadgroup(
+            GROUP_NAME, self.consumer, {STREAM_KEY: stream_id}, count=count, block=block
+        )
+        return response[0][1] if response else []
+
+    def _claim_stale(self, count):
+        """Переводит на себя события, не подтвержденные другим потребителем дольше CLAIM_IDLE_MS"""
+        response = self.client.xautoclaim(
+            STREAM_KEY, GROUP_NAME, self.consumer, CLAIM_IDLE_MS, start_id='0-0', count=count
+        )
+        # Удаленные из stream записи приходят как (id, None)
+        return [(entry_id, data) for entry_id, data in response[1] if data]
+
+    def ack(self, entry_ids):
+        if not entry_ids:
+            return
+        fields = [self._fields.pop(entry_id) for entry_id in entry_ids if entry_id in self._fields]
+        pipe = self.client.pipeline()
+        pipe.xack(STREAM_KEY, GROUP_NAME, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        if fields:
+            pipe.hdel(PENDING_KEY, *fields)
+        pipe.execute()
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        import redis
+
+        try:
+            self.client.xgroup_create(STREAM_KEY, GROUP_NAME, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._fields = {}
+        self._group_ready = True
+
+
+_queue = None
+
+
+def get_checkin_queue(consumer=None):
+    """
+    Очередь из ATTENDANCE_CHECKIN_QUEUE или None для синхронной записи.
+    consumer - имя потребителя Redis stream (по умолчанию хост и pid процесса).
+    """
+    global _queue
+    backend = getattr(settings, 'ATTENDANCE_CHECKIN_QUEUE', '')
+    if not backend:
+        return None
+    if _queue is None:
+        if backend == 'redis':
+            _queue = RedisCheckinQueue(settings.REDIS_URL, consumer)
+        elif backend == 'memory':
+            _queue = MemoryCheckinQueue()
+        else:
+            raise ValueError(f'Unknown ATTENDANCE_CHECKIN_QUEUE backend: {backend}')
+    return _queue
+
+
+def drain(queue, batch_size=500, block=None):
+    """Переносит одну пачку из очереди в БД, возвращает число событий"""
+    entries = queue.read(batch_size, block=block)
+    if not entries:
+        return 0
+
+    events = []
+    for index, (_, payload) in enumerate(entries):
+        serializer = AttendanceEventSerializer(data=payload)
+        if serializer.is_valid():
+            events.append(dict(serializer.validated_data, index=index))
+        else:
+            logger.error(f'Invalid queued check-in {payload}: {serializer.errors}')
+
+    if events:
+        results = process_attendance_events(events, User.objects.filter(is_active=True))
+        for result in results.values():
+            if result['status'] == 'error':
+                logger.warning(f'Queued check-in rejected: {result}')
+
+    queue.ack([entry_id for entry_id, _ in entries])
+    return len(entries)
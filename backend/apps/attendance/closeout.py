@@ -0,0 +1,116 @@
+"""
+Автоматическое закрытие забытых смен
+
+Открытые смены группируются по (компания, график, рабочая дата): у всех смен
+группы одно время окончания по графику. Каждая группа, у которой конец смены
+плюс льготный период прошел, закрывается одним UPDATE; total_hours
+считается в SQL (сигнал pre_save calculate_hours при update() не вызывается).
+Смены без графика не закрываются.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import DateTimeField, F, FloatField, Func, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from apps.departments.schedules import get_schedules
+from apps.reports.cache import bump_data_version
+from .models import Attendance, refresh_daily_summaries
+from .presence import remove_presence
+
+logger = logging.getLogger(__name__)
+channel_layer = get_channel_layer()
+
+
+class EpochSeconds(Func):
+    """Длительность (разность моментов времени) в секундах"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # На SQLite разность дат Django возвращает в микросекундах
+        return self.as_sql(compiler, connection, template='(%(expressions)s) / 1000000.0', **extra_context)
+
+
+def closing_time(schedule, work_date):
+    """Время закрытия смены: конец смены по графику, в выходной - конец дня"""
+    shift = schedule.shift_for(work_date)
+    if shift:
+        return shift.end
+    return datetime.combine(work_date + timedelta(days=1), time.min, tzinfo=schedule.tz)
+
+
+def close_stale_sessions(grace, now=None, company_id=None, dry_run=False):
+    """
+    Закрывает открытые смены, у которых конец смены + grace уже прошел.
+    Возвращает {company_id: [(attendance_id, user_id, work_date, checkout_time)]}.
+    """
+    now = now or timezone.now()
+    open_sessions = Attendance.objects.filter(checkout_time__isnull=True, user__work_schedule__isnull=False)
+    if company_id:
+        open_sessions = open_sessions.filter(company_id=company_id)
+
+    groups = list(open_sessions.values_list('company_id', 'user__work_schedule_id', 'work_date').distinct())
+    schedules = get_schedules({schedule_id for _, schedule_id, _ in groups})
+
+    closed = defaultdict(list)
+    for group_company_id, schedule_id, work_date in groups:
+        schedule = schedules.get(schedule_id)
+        if schedule is None:
+            continue
+        checkout_time = closing_time(schedule, work_date)
+        if checkout_time + grace > now:
+            continue
+
+        sessions = open_sessions.filter(
+            company_id=group_company_id,
+            user__work_schedule_id=schedule_id,
+            work_date=work_date,
+        )
+        rows = list(sessions.values_list('id', 'user_id'))
+        if not rows or dry_run:
+            closed[group_company_id] += [(pk, user_id, work_date, checkout_time) for pk, user_id in rows]
+            continue
+
+        end = Value(checkout_time, output_field=DateTimeField())
+        with transaction.atomic():
+            # Повторная проверка checkout_time IS NULL: смену могли закрыть вручную
+            Attendance.objects.filter(id__in=[pk for pk, _ in rows], checkout_time__isnull=True).update(
+                checkout_time=Greatest(end, F('checkin_time')),
+                total_hours=Greatest(EpochSeconds(end - F('checkin_time')), Value(0.0)) / Value(3600.0),
+                updated_at=now,
+            )
+            refresh_daily_summaries({(user_id, work_date) for _, user_id in rows})
+        remove_presence([(group_company_id, user_id, pk) for pk, user_id in rows])
+        bump_data_version([group_company_id])
+        closed[group_company_id] += [(pk, user_id, work_date, checkout_time) for pk, user_id in rows]
+    return dict(closed)
+
+
+def send_closeout_events(closed):
+    """Одно WebSocket событие на компанию"""
+    for company_id, sessions in closed.items():
+        try:
+            if channel_layer:
+                async_to_sync(channel_layer.group_send)(
+                    'dashboard',
+                    {
+                        'type': 'attendance_auto_checkout',
+                        'company_id': company_id,
+                        'closed': len(sessions),
+                        'sessions': [
+                            {
+                                'attendance_id': pk,
+                                'user_id': user_id,
+                                'work_date': work_date.isoformat(),
+                                'checkout_time': checkout_time.isoformat(),
+                            }
+                            for pk, user_id, work_date, checkout_time in sessions
+                        ]
+                    }
+                )
+        except Exception as e:
+            logger.warning(f"Failed to send WebSocket event: {e}")
@@ -51,6 +51,24 @@ class DashboardConsumer(AsyncWebsocketConsumer):
             'data': event
         }))
 
+    async def attendance_batch(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'attendance:batch',
+            'data': event
+        }))
+
+    async def attendance_auto_checkout(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'attendance:auto_checkout',
+            'data': event
+        }))
+
+    async def payroll_completed(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'payroll:completed',
+            'data': event
+        }))
+
     async def employee_late(self, event):
         await self.send(text_data=json.dumps({
             'type': 'employee:late',
@@ -0,0 +1,80 @@
+"""
+Потоковая выгрузка истории посещаемости (CSV / NDJSON)
+
+Строки читаются через values_list().iterator(chunk_size) - на PostgreSQL это
+серверный курсор, поэтому память не растет с размером выгрузки. Модели и DRF
+сериализаторы не создаются: каждая строка форматируется простой функцией.
+"""
+import csv
+import json
+from datetime import date, datetime
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+# (заголовок, поле values_list)
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('work_date', 'work_date'),
+    ('checkin_time', 'checkin_time'),
+    ('checkout_time', 'checkout_time'),
+    ('total_hours', 'total_hours'),
+    ('is_late', 'is_late'),
+    ('late_minutes', 'late_minutes'),
+    ('work_location', 'work_location__name'),
+    ('face_verified', 'face_verified'),
+    ('location_verified', 'location_verified'),
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """Буфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def _format_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (bool, int, str)):
+        return value
+    return str(value)
+
+
+def export_rows(queryset):
+    rows = queryset.values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield [_format_value(value) for value in row]
+
+
+def iter_csv(queryset):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel открывал кириллицу корректно
+    yield '\ufeff' + writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in export_rows(queryset):
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def iter_ndjson(queryset):
+    headers = [header for header, _ in EXPORT_COLUMNS]
+    for row in export_rows(queryset):
+        yield json.dumps(dict(zip(headers, row)), ensure_ascii=False) + '\n'
+
+
+def iter_export(queryset, export_format):
+    if export_format == 'ndjson':
+        return iter_ndjson(queryset)
+    return iter_csv(queryset)
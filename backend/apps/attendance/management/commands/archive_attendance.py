@@ -0,0 +1,85 @@
+"""
+Перенос старой посещаемости в холодный архив (.npz на компанию и месяц)
+Запуск: python manage.py archive_attendance --older-than-days 365 [--company-id 1] [--dry-run]
+
+Архивируются только целые месяцы раньше месяца границы. Для каждой пары
+компания/месяц файл записывается до удаления строк, повторный запуск
+дописывает строки в существующий файл. Дневные сводки не удаляются.
+Архив доступен только для чтения: GET /api/attendance/?archive=1
+
+Строки удаляются пачками одним DELETE без загрузки в Python и сигналов
+post_delete (сводки сохраняются): ссылки событий синхронизации и штрафов
+обнуляются явно, версия данных компании увеличивается один раз после
+всех ее месяцев.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Min
+from django.utils import timezone
+from apps.attendance.archive import ARCHIVE_FIELDS, archive_path, save_archive
+from apps.attendance.models import Attendance, AttendanceEvent
+from apps.attendance.partitioning import add_months, month_start
+from apps.reports.cache import bump_data_version
+from apps.requests.models import Penalty
+
+
+class Command(BaseCommand):
+    help = 'Переносит посещаемость старше N дней в архивные файлы .npz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=365)
+        parser.add_argument('--company-id', type=int)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Размер пачки удаления')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет архивировано')
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 1:
+            raise CommandError('--older-than-days должен быть больше 0')
+
+        cutoff = month_start(timezone.localdate() - timedelta(days=options['older_than_days']))
+        queryset = Attendance.objects.filter(work_date__lt=cutoff)
+        if options['company_id']:
+            queryset = queryset.filter(company_id=options['company_id'])
+
+        companies = queryset.values('company_id').annotate(first=Min('work_date')).order_by('company_id')
+        total = 0
+        for company in companies:
+            month = month_start(company['first'])
+            archived = 0
+            while month < cutoff:
+                next_month = add_months(month, 1)
+                rows = queryset.filter(
+                    company_id=company['company_id'], work_date__gte=month, work_date__lt=next_month
+                )
+                archived += self._archive(company['company_id'], month, rows, options)
+                month = next_month
+            if archived and not options['dry_run']:
+                bump_data_version([company['company_id']])
+            total += archived
+
+        action = 'Будет архивировано' if options['dry_run'] else 'Архивировано'
+        self.stdout.write(self.style.SUCCESS(f'{action} записей: {total} (до {cutoff})'))
+
+    def _archive(self, company_id, month, queryset, options):
+        rows = list(queryset.order_by('checkin_time', 'id').values(*ARCHIVE_FIELDS))
+        if not rows:
+            return 0
+
+        path = archive_path(company_id, month)
+        if options['dry_run']:
+            self.stdout.write(f'{path}: {len(rows)} записей')
+            return len(rows)
+
+        stored = save_archive(path, rows)
+        ids = [row['id'] for row in rows]
+        using = router.db_for_write(Attendance)
+        with transaction.atomic(using=using):
+            for i in range(0, len(ids), options['batch_size']):
+                batch = ids[i:i + options['batch_size']]
+                # on_delete=SET_NULL эмулируется Django - при прямом DELETE обнуляем сами
+                AttendanceEvent.objects.filter(attendance_id__in=batch).update(attendance=None)
+                Penalty.objects.filter(attendance_id__in=batch).update(attendance=None)
+                Attendance.objects.filter(id__in=batch)._raw_delete(using)
+        self.stdout.write(f'{path}: {len(rows)} записей (всего в файле {stored})')
+        return len(rows)
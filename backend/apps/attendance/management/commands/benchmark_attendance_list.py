@@ -0,0 +1,114 @@
+"""
+Бенчмарк страницы списка посещаемости
+Запуск: python manage.py benchmark_attendance_list --rows 20000 --page-size 100
+
+Сравнивает прежний путь (модели + AttendanceSerializer, без select_related)
+с AttendanceRowSerializer поверх values(): число запросов и время на страницу.
+Проверяет, что при include=notes,photos вывод совпадает. Синтетические данные
+откатываются по завершении.
+"""
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from apps.departments.models import Department
+from apps.geolocation.models import WorkLocation
+from apps.users.models import Company, User
+from apps.attendance.models import Attendance, local_work_date
+from apps.attendance.serializers import AttendanceSerializer, AttendanceRowSerializer
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк списка посещаемости (AttendanceSerializer vs values())'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Количество записей посещаемости')
+        parser.add_argument('--users', type=int, default=200, help='Количество сотрудников')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров на вариант')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            company = self._create_data(options)
+            queryset = Attendance.objects.filter(company=company).order_by('-checkin_time')
+            page_size = options['page_size']
+
+            def legacy_page():
+                queryset.count()
+                return AttendanceSerializer(list(queryset[:page_size]), many=True).data
+
+            def fast_page(include):
+                row_serializer = AttendanceRowSerializer(include=include)
+                rows = queryset.values(*row_serializer.value_fields())
+                rows.count()
+                return row_serializer.serialize(list(rows[:page_size]))
+
+            if legacy_page() != fast_page(['notes', 'photos']):
+                raise CommandError('Вывод AttendanceRowSerializer отличается от AttendanceSerializer')
+            self.stdout.write('Вывод совпадает с AttendanceSerializer (include=notes,photos)\n')
+
+            variants = [
+                ('AttendanceSerializer', legacy_page),
+                ('values(), include=notes,photos', lambda: fast_page(['notes', 'photos'])),
+                ('values(), по умолчанию', lambda: fast_page([])),
+            ]
+            for label, page in variants:
+                with CaptureQueriesContext(connection) as queries:
+                    page()
+                timings = self._measure(page, options['repeat'])
+                self.stdout.write(
+                    f'{label}: {len(queries)} запросов, '
+                    f'avg {statistics.mean(timings):.2f} ms, max {max(timings):.2f} ms'
+                )
+
+            transaction.set_rollback(True)
+
+    def _create_data(self, options):
+        rows, users_count = options['rows'], options['users']
+        self.stdout.write(f'Создание {users_count} сотрудников и {rows} записей...')
+
+        company = Company.objects.create(name='Benchmark')
+        department = Department.objects.create(company=company, name='Benchmark')
+        location = WorkLocation.objects.create(
+            department=department, name='Офис', latitude=41.3, longitude=69.2, radius=100
+        )
+        users = User.objects.bulk_create([
+            User(
+                company=company,
+                department=department,
+                email=f'bench-list-{i}@benchmark.local',
+                first_name='Bench',
+                last_name=str(i),
+                password='!'
+            )
+            for i in range(users_count)
+        ])
+
+        now = timezone.now()
+        batch = []
+        for i in range(rows):
+            checkin = now - timedelta(days=i // users_count, hours=9)
+            batch.append(Attendance(
+                user=users[i % users_count],
+                company=company,
+                checkin_time=checkin,
+                work_date=local_work_date(checkin, company.id),
+                checkout_time=checkin + timedelta(hours=8),
+                total_hours=8,
+                work_location=location if i % 2 else None,
+                checkin_photo_url='https://storage.example.com/photo.jpg',
+                notes='Заметка' if i % 3 == 0 else None
+            ))
+        Attendance.objects.bulk_create(batch, batch_size=5000)
+        return company
+
+    def _measure(self, page, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            page()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
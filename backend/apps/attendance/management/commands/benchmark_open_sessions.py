@@ -0,0 +1,139 @@
+"""
+Бенчмарк поиска открытой смены сотрудника
+Запуск: python manage.py benchmark_open_sessions --rows 1000000
+
+Сравнивает старый запрос (checkin_time__date=today) с поиском по частичному
+индексу attendance_open_session_idx. Все синтетические данные создаются внутри
+транзакции и откатываются по завершении.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from apps.users.models import Company, User
+from apps.attendance.models import Attendance, local_work_date
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк поиска открытой смены (старый запрос vs частичный индекс)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Количество записей посещаемости')
+        parser.add_argument('--users', type=int, default=5000, help='Количество сотрудников')
+        parser.add_argument('--lookups', type=int, default=500, help='Количество замеров на вариант')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            company, user_ids = self._create_data(options)
+            sample = [random.choice(user_ids) for _ in range(options['lookups'])]
+            today = local_work_date(timezone.now(), company.id)
+
+            def legacy_lookup(uid):
+                return Attendance.objects.filter(
+                    user_id=uid,
+                    checkin_time__date=today,
+                    checkout_time__isnull=True
+                ).first()
+
+            def legacy_active(_):
+                return list(Attendance.objects.filter(
+                    checkin_time__date=today,
+                    checkout_time__isnull=True
+                ).values_list('user_id', flat=True))
+
+            def indexed_lookup(uid):
+                return Attendance.objects.open_sessions(today).filter(user_id=uid).first()
+
+            def indexed_active(_):
+                return list(Attendance.objects.open_sessions(today).values_list('user_id', flat=True))
+
+            # "До": без частичного индекса (DDL откатывается вместе с данными)
+            self._execute_index_sql('remove_sql')
+            results = [
+                ('До, сотрудник: checkin_time__date=today', self._measure(sample, legacy_lookup)),
+                ('До, все активные: checkin_time__date=today', self._measure(sample[:20], legacy_active)),
+            ]
+            self.stdout.write('\nПлан запроса до:')
+            self.stdout.write(Attendance.objects.filter(
+                checkin_time__date=today, checkout_time__isnull=True
+            ).explain())
+
+            # "После": частичный индекс attendance_open_session_idx
+            self._execute_index_sql('create_sql')
+            results += [
+                ('После, сотрудник: open_sessions()', self._measure(sample, indexed_lookup)),
+                ('После, все активные: open_sessions()', self._measure(sample[:20], indexed_active)),
+            ]
+            self.stdout.write('\nПлан запроса после:')
+            self.stdout.write(Attendance.objects.open_sessions(today).explain())
+
+            self.stdout.write('')
+            for label, timings in results:
+                self._report(label, timings)
+
+            transaction.set_rollback(True)
+
+    def _execute_index_sql(self, method):
+        index = next(i for i in Attendance._meta.indexes if i.name == 'attendance_open_session_idx')
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            cursor.execute(str(getattr(index, method)(Attendance, editor)))
+
+    def _create_data(self, options):
+        rows, users_count, batch_size = options['rows'], options['users'], options['batch_size']
+        self.stdout.write(f'Создание {users_count} сотрудников и {rows} записей...')
+
+        company = Company.objects.create(name='Benchmark')
+        users = User.objects.bulk_create([
+            User(
+                company=company,
+                email=f'bench-{i}@benchmark.local',
+                first_name='Bench',
+                last_name=str(i),
+                password='!'
+            )
+            for i in range(users_count)
+        ], batch_size=batch_size)
+        user_ids = [u.id for u in users]
+
+        now = timezone.now()
+        batch = []
+        for i in range(rows):
+            user_id = user_ids[i % users_count]
+            days_ago = i // users_count
+            checkin = now - timedelta(days=days_ago, hours=1)
+            # Половина сотрудников сейчас на смене, остальные смены закрыты
+            is_open = days_ago == 0 and i % 2 == 0
+            batch.append(Attendance(
+                user_id=user_id,
+                company=company,
+                checkin_time=checkin,
+                work_date=local_work_date(checkin, company.id),
+                checkout_time=None if is_open else checkin + timedelta(hours=8),
+                total_hours=None if is_open else 8
+            ))
+            if len(batch) >= batch_size:
+                Attendance.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Attendance.objects.bulk_create(batch)
+        return company, user_ids
+
+    def _measure(self, sample, lookup):
+        timings = []
+        for user_id in sample:
+            started = time.perf_counter()
+            lookup(user_id)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{label}: avg {statistics.mean(timings):.3f} ms, p95 {p95:.3f} ms'
+        )
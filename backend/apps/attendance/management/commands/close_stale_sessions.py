@@ -0,0 +1,57 @@
+"""
+Автоматическое закрытие забытых смен (cron, например каждый час)
+Запуск: python manage.py close_stale_sessions [--grace-minutes 120] [--pending-days 2] [--company-id 1] [--dry-run]
+
+Смена закрывается временем окончания по графику сотрудника, если с него
+прошло больше grace минут. По каждой компании отправляется одно событие
+attendance:auto_checkout в WebSocket группу dashboard.
+
+До закрытия разбираются отложенные уходы синхронизации (pending): они
+применяются к сменам своего дня, а старше --pending-days без смены
+завершаются ошибкой NOT_CHECKED_IN.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.attendance.closeout import close_stale_sessions, send_closeout_events
+from apps.attendance.sync import resolve_pending_checkouts
+
+
+class Command(BaseCommand):
+    help = 'Закрывает открытые смены после окончания смены по графику'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=120)
+        parser.add_argument(
+            '--pending-days', type=int, default=2,
+            help='Срок ожидания прихода для отложенного ухода синхронизации, дней'
+        )
+        parser.add_argument('--company-id', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Только показать смены для закрытия')
+
+    def handle(self, *args, **options):
+        if options['grace_minutes'] < 0:
+            raise CommandError('--grace-minutes не может быть отрицательным')
+
+        if not options['dry_run']:
+            # Настоящий уход точнее закрытия по графику - применяется первым
+            applied, expired = resolve_pending_checkouts(
+                timezone.now() - timedelta(days=options['pending_days']),
+                company_id=options['company_id'],
+            )
+            if applied or expired:
+                self.stdout.write(f'Отложенные уходы: применено {applied}, просрочено {expired}')
+
+        closed = close_stale_sessions(
+            timedelta(minutes=options['grace_minutes']),
+            company_id=options['company_id'],
+            dry_run=options['dry_run'],
+        )
+        for company_id, sessions in closed.items():
+            self.stdout.write(f'Компания {company_id}: {len(sessions)} смен')
+        if not options['dry_run']:
+            send_closeout_events(closed)
+
+        total = sum(len(sessions) for sessions in closed.values())
+        action = 'Будет закрыто' if options['dry_run'] else 'Закрыто смен'
+        self.stdout.write(self.style.SUCCESS(f'{action}: {total}'))
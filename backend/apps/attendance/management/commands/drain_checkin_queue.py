@@ -0,0 +1,42 @@
+"""
+Перенос отметок прихода из очереди в БД (режим ATTENDANCE_CHECKIN_QUEUE)
+Запуск: python manage.py drain_checkin_queue
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.checkin_queue import drain, get_checkin_queue
+
+
+class Command(BaseCommand):
+    help = 'Переносит отметки прихода из очереди в БД пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--block', type=int, default=1000, help='Ожидание новых событий, мс')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь и завершиться')
+        parser.add_argument(
+            '--consumer',
+            help='Имя потребителя Redis stream, уникальное для процесса (по умолчанию хост-pid)'
+        )
+
+    def handle(self, *args, **options):
+        queue = get_checkin_queue(options['consumer'])
+        if queue is None:
+            raise CommandError('ATTENDANCE_CHECKIN_QUEUE не задан')
+
+        total = 0
+        while True:
+            try:
+                count = drain(queue, options['batch_size'], block=options['block'])
+            except Exception as e:
+                if options['once']:
+                    raise
+                # События остаются неподтвержденными и будут перечитаны
+                self.stderr.write(f'Ошибка записи пачки: {e}')
+                time.sleep(1)
+                continue
+            total += count
+            if options['once'] and not count:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Записано событий: {total}'))
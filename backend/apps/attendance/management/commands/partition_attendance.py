@@ -0,0 +1,65 @@
+"""
+Помесячное партиционирование attendance (PostgreSQL)
+
+Запуск:
+    python manage.py partition_attendance --convert            # однократное преобразование
+    python manage.py partition_attendance --ensure-future 3    # секции на 3 месяца вперед (cron)
+    python manage.py partition_attendance --detach-before 2023-01-01 [--drop]
+    python manage.py partition_attendance                      # список секций
+
+На SQLite и других СУБД команда ничего не делает.
+"""
+from datetime import datetime, date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from apps.attendance import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Помесячное партиционирование таблицы attendance (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Преобразовать attendance в секционированную таблицу')
+        parser.add_argument('--ensure-future', type=int, metavar='MONTHS', help='Создать секции на N месяцев вперед')
+        parser.add_argument('--detach-before', metavar='YYYY-MM-DD', help='Отключить секции месяцев раньше даты')
+        parser.add_argument('--drop', action='store_true', help='Удалить отключенные секции')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write(self.style.WARNING('Партиционирование доступно только на PostgreSQL, пропуск'))
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            partitioned = partitioning.is_partitioned(cursor)
+
+            if options['convert']:
+                if partitioned:
+                    self.stdout.write('Таблица attendance уже секционирована')
+                else:
+                    self.stdout.write('Преобразование attendance (таблица заблокирована до завершения)...')
+                    dropped = partitioning.convert_to_partitioned(cursor, options['ensure_future'] or 3)
+                    for table, constraint in dropped:
+                        self.stdout.write(f'  удален внешний ключ {table}.{constraint}')
+                    partitioned = True
+            elif not partitioned:
+                raise CommandError('Таблица attendance не секционирована, запустите с --convert')
+
+            if options['ensure_future']:
+                today = date.today().replace(day=1)
+                created = partitioning.ensure_partitions(
+                    cursor, partitioning.add_months(today, options['ensure_future'])
+                )
+                for name in created:
+                    self.stdout.write(f'  создана секция {name}')
+
+            if options['detach_before']:
+                try:
+                    before = datetime.strptime(options['detach_before'], '%Y-%m-%d').date()
+                except ValueError:
+                    raise CommandError('Неверный формат даты, используйте YYYY-MM-DD')
+                for name in partitioning.detach_partitions(cursor, before, drop=options['drop']):
+                    action = 'удалена' if options['drop'] else 'отключена'
+                    self.stdout.write(f'  секция {name} {action}')
+
+            for name, bound in partitioning.list_partitions(cursor):
+                self.stdout.write(f'{name}: {bound}')
@@ -0,0 +1,87 @@
+"""
+Пересчет дневных сводок посещаемости за период
+Запуск: python manage.py rebuild_daily_summaries --start-date 2024-01-01 --end-date 2024-12-31
+
+Сводки пересчитываются одним GROUP BY на месяц и записываются пачками через
+upsert. Сводки дней, по которым не осталось смен, удаляются, кроме месяцев,
+перенесенных в архив (archive_attendance). Текущие итоги ЗП за эти месяцы
+удаляются и пересчитываются по новым сводкам при следующем обращении.
+"""
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from apps.attendance.archive import archive_path
+from apps.attendance.models import (
+    Attendance, AttendanceDailySummary, build_daily_summary,
+    daily_summary_values, upsert_daily_summaries
+)
+from apps.salary.models import SalaryRunningTotal
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает AttendanceDailySummary за период'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', required=True, help='YYYY-MM-DD')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, по умолчанию сегодня')
+        parser.add_argument('--company-id', type=int)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            end = (
+                datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+                if options['end_date'] else date.today()
+            )
+        except ValueError:
+            raise CommandError('Неверный формат даты, используйте YYYY-MM-DD')
+        if start > end:
+            raise CommandError('start-date позже end-date')
+
+        total = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, (chunk_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1))
+            count = self._rebuild(chunk_start, chunk_end, options)
+            self.stdout.write(f'{chunk_start} - {chunk_end}: {count} сводок')
+            total += count
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано сводок: {total}'))
+
+    def _rebuild(self, start, end, options):
+        attendances = Attendance.objects.filter(work_date__gte=start, work_date__lte=end)
+        summaries = AttendanceDailySummary.objects.filter(work_date__gte=start, work_date__lte=end)
+        if options['company_id']:
+            attendances = attendances.filter(company_id=options['company_id'])
+            summaries = summaries.filter(company_id=options['company_id'])
+
+        count = 0
+        batch = []
+        with transaction.atomic():
+            for row in daily_summary_values(attendances).iterator(chunk_size=options['batch_size']):
+                batch.append(build_daily_summary(row))
+                if len(batch) >= options['batch_size']:
+                    upsert_daily_summaries(batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                upsert_daily_summaries(batch)
+                count += len(batch)
+
+            archived = [
+                company_id for company_id in summaries.values_list('company_id', flat=True).distinct()
+                if archive_path(company_id, start.replace(day=1)).exists()
+            ]
+            summaries.exclude(company_id__in=archived).exclude(Exists(Attendance.objects.filter(
+                user_id=OuterRef('user_id'),
+                work_date=OuterRef('work_date')
+            ))).delete()
+
+            running_totals = SalaryRunningTotal.objects.filter(period=start.replace(day=1))
+            if options['company_id']:
+                running_totals = running_totals.filter(user__company_id=options['company_id'])
+            running_totals.delete()
+        return count
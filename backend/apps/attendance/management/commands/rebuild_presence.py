@@ -0,0 +1,44 @@
+"""
+Пересборка ростера присутствия из БД (после сбоя или очистки Redis)
+Запуск: python manage.py rebuild_presence [--company-id 1]
+
+Ростер каждой компании заменяется атомарно открытыми сменами текущего
+рабочего дня компании.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.attendance.models import Attendance, local_work_date
+from apps.attendance.presence import build_entries, get_presence
+from apps.users.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ростер присутствия из открытых смен'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int)
+
+    def handle(self, *args, **options):
+        presence = get_presence()
+        if presence is None:
+            raise CommandError('ATTENDANCE_PRESENCE_BACKEND не задан')
+
+        companies = Company.objects.filter(is_active=True)
+        if options['company_id']:
+            companies = companies.filter(id=options['company_id'])
+
+        now = timezone.now()
+        total = 0
+        for company_id in companies.values_list('id', flat=True):
+            sessions = Attendance.objects.open_sessions(local_work_date(now, company_id)).filter(
+                company_id=company_id
+            ).select_related('user').only(
+                'id', 'company_id', 'user_id', 'checkin_time', 'work_date', 'checkin_latitude',
+                'checkin_longitude', 'user__first_name', 'user__last_name', 'user__department'
+            )
+            entries = build_entries(list(sessions))
+            presence.replace(company_id, entries)
+            self.stdout.write(f'Компания {company_id}: на работе {len(entries)}')
+            total += len(entries)
+
+        self.stdout.write(self.style.SUCCESS(f'Ростер пересобран, на работе: {total}'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('checkout_time__isnull', True)), fields=['user', 'checkin_time'], name='attendance_open_session_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:45
+
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def backfill_company_and_work_date(apps, schema_editor):
+    """Заполняет company и work_date существующих записей пачками по id"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    Company = apps.get_model('users', 'Company')
+
+    default_tz = ZoneInfo(settings.TIME_ZONE)
+    timezones = {
+        company_id: ZoneInfo(tz_name)
+        for company_id, tz_name in Company.objects.values_list('id', 'timezone')
+    }
+
+    last_id = 0
+    while True:
+        rows = list(
+            Attendance.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'checkin_time', 'user__company_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        Attendance.objects.bulk_update([
+            Attendance(
+                id=attendance_id,
+                company_id=company_id,
+                work_date=timezone.localtime(checkin_time, timezones.get(company_id, default_tz)).date()
+            )
+            for attendance_id, checkin_time, company_id in rows
+        ], ['company', 'work_date'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_company_timezone'),
+        ('attendance', '0003_attendance_attendance_open_session_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_open_session_idx',
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='users.company'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='work_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_company_and_work_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['company', 'work_date'], name='attendance_company_06bcb5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'work_date'], name='attendance_user_id_174cfb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('checkout_time__isnull', True)), fields=['user', 'work_date'], name='attendance_open_session_idx'),
+        ),
+    ]
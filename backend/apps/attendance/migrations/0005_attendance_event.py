@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0004_attendance_company_work_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64)),
+                ('event_type', models.CharField(choices=[('checkin', 'Приход'), ('checkout', 'Уход')], max_length=20)),
+                ('device_time', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('error_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attendance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='attendance.attendance')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Событие синхронизации',
+                'verbose_name_plural': 'События синхронизации',
+                'db_table': 'attendance_events',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attendanceevent',
+            constraint=models.UniqueConstraint(fields=('user', 'event_id'), name='unique_user_attendance_event'),
+        ),
+    ]
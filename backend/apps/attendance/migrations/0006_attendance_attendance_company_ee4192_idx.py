@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendance_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['company', 'checkin_time', 'id'], name='attendance_company_ee4192_idx'),
+        ),
+    ]
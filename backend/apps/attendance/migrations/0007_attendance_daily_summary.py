@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    """Заполняет сводки по существующим записям одним GROUP BY"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceDailySummary = apps.get_model('attendance', 'AttendanceDailySummary')
+
+    first_session = Attendance.objects.filter(
+        user_id=OuterRef('user_id'),
+        work_date=OuterRef('work_date')
+    ).order_by('checkin_time', 'id')
+    rows = Attendance.objects.filter(work_date__isnull=False).order_by().values('user_id', 'work_date').annotate(
+        summary_company_id=Max('company_id'),
+        first_checkin=Min('checkin_time'),
+        last_checkout=Max('checkout_time'),
+        hours=Sum('total_hours'),
+        sessions=Count('id'),
+        open_sessions=Count('id', filter=Q(checkout_time__isnull=True)),
+        first_is_late=Subquery(first_session.values('is_late')[:1]),
+        first_late_minutes=Subquery(first_session.values('late_minutes')[:1])
+    )
+
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(AttendanceDailySummary(
+            user_id=row['user_id'],
+            company_id=row['summary_company_id'],
+            work_date=row['work_date'],
+            first_checkin=row['first_checkin'],
+            last_checkout=row['last_checkout'],
+            total_hours=round(row['hours'] or 0, 2),
+            sessions=row['sessions'],
+            open_sessions=row['open_sessions'],
+            is_late=bool(row['first_is_late']),
+            late_minutes=row['first_late_minutes'] or 0
+        ))
+        if len(batch) >= BATCH_SIZE:
+            AttendanceDailySummary.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        AttendanceDailySummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_company_timezone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0006_attendance_attendance_company_ee4192_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('work_date', models.DateField()),
+                ('first_checkin', models.DateTimeField()),
+                ('last_checkout', models.DateTimeField(blank=True, null=True)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('open_sessions', models.PositiveIntegerField(default=0)),
+                ('is_late', models.BooleanField(default=False)),
+                ('late_minutes', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='users.company')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сводка посещаемости за день',
+                'verbose_name_plural': 'Сводки посещаемости за день',
+                'db_table': 'attendance_daily_summaries',
+                'indexes': [models.Index(fields=['company', 'work_date'], name='attendance__company_f46fae_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attendancedailysummary',
+            constraint=models.UniqueConstraint(fields=('user', 'work_date'), name='unique_user_daily_summary'),
+        ),
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_missing_work_date(apps, schema_editor):
+    """Заполняет work_date строк, записанных в обход pre_save"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    Company = apps.get_model('users', 'Company')
+
+    default_tz = ZoneInfo(settings.TIME_ZONE)
+    timezones = {
+        company_id: ZoneInfo(tz_name)
+        for company_id, tz_name in Company.objects.values_list('id', 'timezone')
+    }
+    rows = Attendance.objects.filter(work_date__isnull=True).values_list('id', 'checkin_time', 'user__company_id')
+    Attendance.objects.bulk_update([
+        Attendance(
+            id=attendance_id,
+            work_date=timezone.localtime(checkin_time, timezones.get(company_id, default_tz)).date()
+        )
+        for attendance_id, checkin_time, company_id in rows
+    ], ['work_date'], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_attendance_daily_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_missing_work_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendance',
+            name='work_date',
+            field=models.DateField(blank=True),
+        ),
+    ]
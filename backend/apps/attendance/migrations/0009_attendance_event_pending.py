@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def mark_unmatched_checkouts_pending(apps, schema_editor):
+    """Уходы, сохраненные ошибкой NOT_CHECKED_IN, ждут свой приход (pending)"""
+    AttendanceEvent = apps.get_model('attendance', 'AttendanceEvent')
+    AttendanceEvent.objects.filter(
+        event_type='checkout',
+        status='error',
+        error_code='NOT_CHECKED_IN'
+    ).update(status='pending', error_code=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_attendance_work_date_not_null'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_unmatched_checkouts_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_attendance_event_pending'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendanceevent',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['user', 'device_time'], name='attendance_event_pending_idx'),
+        ),
+    ]
@@ -1,15 +1,52 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models.signals import pre_save
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from apps.users.models import get_company_timezone
+from apps.reports.cache import bump_data_version
+from .presence import update_presence
 
 User = get_user_model()
 
 
+def local_work_date(moment, company_id=None):
+    """Рабочая дата момента времени в часовом поясе компании"""
+    return timezone.localtime(moment, get_company_timezone(company_id)).date()
+
+
+# Поля смены, изменение которых пересчитывает дневную сводку
+SUMMARY_SOURCE_FIELDS = ['user_id', 'work_date', 'checkin_time', 'checkout_time', 'is_late', 'late_minutes']
+
+
+class AttendanceQuerySet(models.QuerySet):
+    """
+    Фильтры по дню идут по денормализованному work_date, а не через
+    checkin_time__date: приведение к дате не позволяет использовать индексы.
+    """
+
+    def for_day(self, day):
+        return self.filter(work_date=day)
+
+    def open_sessions(self, day):
+        """Открытые смены (без отметки ухода) за день, по частичному индексу"""
+        return self.for_day(day).filter(checkout_time__isnull=True)
+
+
 class Attendance(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendances')
+    # Денормализовано из user.company для выборок без join
+    company = models.ForeignKey(
+        'users.Company',
+        on_delete=models.CASCADE,
+        related_name='attendances',
+        null=True,
+        blank=True
+    )
     checkin_time = models.DateTimeField()
+    # Дата смены в часовом поясе компании, вычисляется при записи; ключ партиционирования
+    work_date = models.DateField(blank=True)
     checkout_time = models.DateTimeField(null=True, blank=True)
     
     checkin_photo_url = models.URLField(max_length=500, null=True, blank=True)
@@ -39,6 +76,18 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AttendanceQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._summary_state = instance.summary_state()
+        return instance
+
+    def summary_state(self):
+        """Значения полей, от которых зависит дневная сводка (отложенные поля не загружаются)"""
+        return tuple(self.__dict__.get(field) for field in SUMMARY_SOURCE_FIELDS)
+
     class Meta:
         db_table = 'attendance'
         verbose_name = 'Учет рабочего времени'
@@ -46,6 +95,16 @@ class Attendance(models.Model):
         indexes = [
             models.Index(fields=['user', 'checkin_time']),
             models.Index(fields=['checkin_time']),
+            models.Index(fields=['company', 'work_date']),
+            models.Index(fields=['user', 'work_date']),
+            # Keyset пагинация истории: (checkin_time, id) в пределах компании
+            models.Index(fields=['company', 'checkin_time', 'id']),
+            # Частичный индекс только по открытым сменам: поиск "на смене ли сотрудник"
+            models.Index(
+                fields=['user', 'work_date'],
+                condition=models.Q(checkout_time__isnull=True),
+                name='attendance_open_session_idx'
+            ),
         ]
         ordering = ['-checkin_time']
 
@@ -59,9 +118,254 @@ class Attendance(models.Model):
         return None
 
 
+class AttendanceEvent(models.Model):
+    """
+    Событие клиента (Telegram бот, мобильное приложение) с клиентским ID.
+    Повторная отправка того же event_id не создает новых записей, а
+    возвращает сохраненный результат.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('checkin', 'Приход'),
+        ('checkout', 'Уход'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_events')
+    event_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    device_time = models.DateTimeField()
+    attendance = models.ForeignKey(
+        Attendance,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events'
+    )
+    # Результат применения: checked_in, checked_out, merged, ignored, pending (уход ждет приход), error
+    status = models.CharField(max_length=20)
+    error_code = models.CharField(max_length=50, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'attendance_events'
+        verbose_name = 'Событие синхронизации'
+        verbose_name_plural = 'События синхронизации'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event_id'], name='unique_user_attendance_event'),
+        ]
+        indexes = [
+            # Отложенные уходы (pending) ищутся по сотруднику и времени устройства
+            models.Index(
+                fields=['user', 'device_time'],
+                condition=models.Q(status='pending'),
+                name='attendance_event_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.event_id}'
+
+
+class AttendanceDailySummary(models.Model):
+    """
+    Сводка по сотруднику за рабочий день, поддерживается инкрементально
+    (refresh_daily_summaries) и пересчитывается командой rebuild_daily_summaries.
+    Опоздание берется по первой смене дня.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_summaries')
+    company = models.ForeignKey(
+        'users.Company',
+        on_delete=models.CASCADE,
+        related_name='daily_summaries',
+        null=True,
+        blank=True
+    )
+    work_date = models.DateField()
+    first_checkin = models.DateTimeField()
+    last_checkout = models.DateTimeField(null=True, blank=True)
+    total_hours = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    sessions = models.PositiveIntegerField(default=0)
+    open_sessions = models.PositiveIntegerField(default=0)
+    is_late = models.BooleanField(default=False)
+    late_minutes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'attendance_daily_summaries'
+        verbose_name = 'Сводка посещаемости за день'
+        verbose_name_plural = 'Сводки посещаемости за день'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'work_date'], name='unique_user_daily_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'work_date']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.work_date}'
+
+
+SUMMARY_UPDATE_FIELDS = [
+    'company', 'first_checkin', 'last_checkout', 'total_hours',
+    'sessions', 'open_sessions', 'is_late', 'late_minutes', 'updated_at'
+]
+
+
+def daily_summary_values(queryset):
+    """Агрегаты строк Attendance по (сотрудник, рабочий день) одним GROUP BY"""
+    first_session = Attendance.objects.filter(
+        user_id=OuterRef('user_id'),
+        work_date=OuterRef('work_date')
+    ).order_by('checkin_time', 'id')
+    return queryset.filter(work_date__isnull=False).order_by().values('user_id', 'work_date').annotate(
+        summary_company_id=Max('company_id'),
+        first_checkin=Min('checkin_time'),
+        last_checkout=Max('checkout_time'),
+        hours=Sum('total_hours'),
+        sessions=Count('id'),
+        open_sessions=Count('id', filter=Q(checkout_time__isnull=True)),
+        first_is_late=Subquery(first_session.values('is_late')[:1]),
+        first_late_minutes=Subquery(first_session.values('late_minutes')[:1])
+    )
+
+
+def build_daily_summary(row):
+    return AttendanceDailySummary(
+        user_id=row['user_id'],
+        company_id=row['summary_company_id'],
+        work_date=row['work_date'],
+        first_checkin=row['first_checkin'],
+        last_checkout=row['last_checkout'],
+        total_hours=round(row['hours'] or 0, 2),
+        sessions=row['sessions'],
+        open_sessions=row['open_sessions'],
+        is_late=bool(row['first_is_late']),
+        late_minutes=row['first_late_minutes'] or 0
+    )
+
+
+def upsert_daily_summaries(summaries, batch_size=None):
+    AttendanceDailySummary.objects.bulk_create(
+        summaries,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'work_date'],
+        update_fields=SUMMARY_UPDATE_FIELDS
+    )
+
+
+def refresh_daily_summaries(keys):
+    """
+    Пересчитывает сводки для пар (user_id, work_date) по строкам этих дней.
+    Вызывается сигналами при уходе, исправлении и удалении смены и из
+    пакетных путей.
+    """
+    keys = {(user_id, day) for user_id, day in keys if user_id and day}
+    if not keys:
+        return
+    # Надмножество по IN, точные пары отбираются в Python
+    user_ids = {user_id for user_id, _ in keys}
+    days = {day for _, day in keys}
+
+    summaries = [
+        build_daily_summary(row)
+        for row in daily_summary_values(Attendance.objects.filter(user_id__in=user_ids, work_date__in=days))
+        if (row['user_id'], row['work_date']) in keys
+    ]
+    if summaries:
+        upsert_daily_summaries(summaries)
+
+    # День без смен (запись удалена или перенесена) - сводка удаляется
+    missing = keys - {(summary.user_id, summary.work_date) for summary in summaries}
+    if missing:
+        stale = AttendanceDailySummary.objects.filter(
+            user_id__in={user_id for user_id, _ in missing},
+            work_date__in={day for _, day in missing}
+        ).values_list('id', 'user_id', 'work_date')
+        AttendanceDailySummary.objects.filter(
+            id__in=[pk for pk, user_id, day in stale if (user_id, day) in missing]
+        ).delete()
+
+    # Текущие итоги ЗП: только дни, где часы могли измениться (не одни открытые смены)
+    worked = {
+        (summary.user_id, summary.work_date) for summary in summaries
+        if summary.total_hours or summary.sessions > summary.open_sessions
+    }
+    if worked | missing:
+        # apps.salary импортирует модели посещаемости - импорт здесь, не на уровне модуля
+        from apps.salary.running import refresh_running_totals
+        refresh_running_totals(worked | missing)
+
+
+def open_daily_summaries(sessions):
+    """
+    Строки сводки для дней, начатых приходом: одна вставка без пересчета
+    (INSERT ... ON CONFLICT DO NOTHING). День уже со сводкой не меняется,
+    полный пересчет - при уходе или автозакрытии.
+    """
+    AttendanceDailySummary.objects.bulk_create([
+        AttendanceDailySummary(
+            user_id=session.user_id,
+            company_id=session.company_id,
+            work_date=session.work_date,
+            first_checkin=session.checkin_time,
+            sessions=1,
+            open_sessions=1,
+            is_late=session.is_late,
+            late_minutes=session.late_minutes
+        )
+        for session in sessions
+    ], ignore_conflicts=True)
+
+
 @receiver(pre_save, sender=Attendance)
 def calculate_hours(sender, instance, **kwargs):
     if instance.checkout_time and instance.checkin_time:
         delta = instance.checkout_time - instance.checkin_time
         instance.total_hours = delta.total_seconds() / 3600
 
+
+@receiver(pre_save, sender=Attendance)
+def fill_company_and_work_date(sender, instance, **kwargs):
+    if instance.company_id is None:
+        instance.company_id = instance.user.company_id
+    if instance.checkin_time:
+        instance.work_date = local_work_date(instance.checkin_time, instance.company_id)
+
+
+@receiver(post_save, sender=Attendance)
+def refresh_daily_summary(sender, instance, created, **kwargs):
+    """
+    Сводка пересчитывается при уходе и исправлениях смены. Приход (новая
+    открытая смена) только вставляет строку начатого дня, если ее нет:
+    утренний поток отметок не пересчитывает сводки.
+    """
+    previous = getattr(instance, '_summary_state', None)
+    instance._summary_state = instance.summary_state()
+    if created and instance.checkout_time is None:
+        open_daily_summaries([instance])
+        return
+    if previous == instance._summary_state:
+        return
+    keys = [(instance.user_id, instance.work_date)]
+    if previous:
+        # Исправление могло перенести смену на другой день или сотрудника
+        keys.append((previous[0], previous[1]))
+    refresh_daily_summaries(keys)
+
+
+@receiver(post_delete, sender=Attendance)
+def refresh_deleted_daily_summary(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении сотрудника или компании сводки удаляются вместе с ним
+    if getattr(origin, 'model', type(origin)) is not Attendance:
+        return
+    refresh_daily_summaries([(instance.user_id, instance.work_date)])
+
+
+@receiver(post_save, sender=Attendance)
+def refresh_presence(sender, instance, **kwargs):
+    update_presence([instance])
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def bump_report_version(sender, instance, **kwargs):
+    bump_data_version([instance.company_id])
@@ -0,0 +1,195 @@
+"""
+Помесячное партиционирование таблицы attendance (только PostgreSQL)
+
+Таблица преобразуется в PARTITION BY RANGE (work_date) с секциями
+attendance_pYYYY_MM и секцией по умолчанию attendance_pdefault. Запросы с
+фильтром по work_date (история, сводки, поиск смены за день) читают только
+нужные секции.
+
+Ограничения PostgreSQL, которые учитывает преобразование:
+- первичный ключ секционированной таблицы обязан содержать ключ секционирования,
+  поэтому он становится (id, work_date), а id берется из отдельной последовательности;
+- внешние ключи на attendance(id) невозможны (id не уникален на уровне БД),
+  поэтому ограничения attendance_events.attendance_id и penalties.attendance_id
+  удаляются. Связи остаются в Django: on_delete выполняет ORM.
+"""
+from datetime import date
+from django.db import connection
+from .models import Attendance
+
+PARENT_TABLE = Attendance._meta.db_table
+LEGACY_TABLE = f'{PARENT_TABLE}_legacy'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_pdefault'
+ID_SEQUENCE = f'{PARENT_TABLE}_partitioned_id_seq'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month:%Y_%m}'
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+        [PARENT_TABLE]
+    )
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(cursor):
+    """[(имя секции, граница)] в порядке имен"""
+    cursor.execute("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.oid = to_regclass(%s)
+        ORDER BY child.relname
+    """, [PARENT_TABLE])
+    return cursor.fetchall()
+
+
+def create_partition(cursor, month):
+    """
+    Создает секцию месяца, если ее нет. Строки этого месяца, попавшие в секцию
+    по умолчанию, переносятся в новую секцию.
+    """
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0]:
+        return False
+
+    start, end = month, add_months(month, 1)
+    cursor.execute(
+        f"SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE work_date >= %s AND work_date < %s LIMIT 1",
+        [start, end]
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(PARENT_TABLE)} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        return True
+
+    # Пересечение с секцией по умолчанию: таблица создается отдельно и подключается
+    cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(PARENT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} WHERE work_date >= %s AND work_date < %s RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        [start, end]
+    )
+    cursor.execute(
+        f"ALTER TABLE {qn(PARENT_TABLE)} ATTACH PARTITION {qn(name)} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return True
+
+
+def ensure_partitions(cursor, until):
+    """Секции от текущего месяца до until включительно"""
+    created = []
+    month = month_start(date.today())
+    while month <= until:
+        if create_partition(cursor, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def referencing_foreign_keys(cursor, table):
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = to_regclass(%s)
+    """, [table])
+    return cursor.fetchall()
+
+
+def convert_to_partitioned(cursor, months_ahead=3):
+    """
+    Преобразует обычную таблицу attendance в секционированную.
+    Выполняется в одной транзакции под ACCESS EXCLUSIVE блокировкой.
+    Возвращает удаленные внешние ключи [(таблица, ограничение)].
+    """
+    cursor.execute(f"LOCK TABLE {qn(PARENT_TABLE)} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} RENAME TO {qn(LEGACY_TABLE)}")
+
+    # Колонки и NOT NULL без identity/индексов: они создаются ниже под секционирование
+    cursor.execute(
+        f"CREATE TABLE {qn(PARENT_TABLE)} (LIKE {qn(LEGACY_TABLE)}) PARTITION BY RANGE (work_date)"
+    )
+    cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(PARENT_TABLE)} DEFAULT")
+
+    cursor.execute(f"SELECT MIN(work_date), MAX(work_date) FROM {qn(LEGACY_TABLE)}")
+    first, last = cursor.fetchone()
+    today = month_start(date.today())
+    month = month_start(first) if first else today
+    last_month = max(month_start(last) if last else today, add_months(today, months_ahead))
+    while month <= last_month:
+        create_partition(cursor, month)
+        month = add_months(month, 1)
+
+    cursor.execute(f"INSERT INTO {qn(PARENT_TABLE)} SELECT * FROM {qn(LEGACY_TABLE)}")
+
+    dropped = referencing_foreign_keys(cursor, LEGACY_TABLE)
+    for table, constraint in dropped:
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {qn(constraint)}")
+    cursor.execute(f"DROP TABLE {qn(LEGACY_TABLE)}")
+
+    cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} ADD PRIMARY KEY (id, work_date)")
+    cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(ID_SEQUENCE)}")
+    cursor.execute(
+        f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {qn(PARENT_TABLE)}), 0) + 1, false)",
+        [ID_SEQUENCE]
+    )
+    cursor.execute(
+        f"ALTER TABLE {qn(PARENT_TABLE)} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')"
+    )
+    cursor.execute(f"ALTER SEQUENCE {qn(ID_SEQUENCE)} OWNED BY {qn(PARENT_TABLE)}.id")
+
+    # Индексы и внешние ключи модели в том виде, в каком их создает Django
+    editor = connection.schema_editor()
+    for sql in editor._model_indexes_sql(Attendance):
+        cursor.execute(str(sql))
+    for field in Attendance._meta.local_concrete_fields:
+        if field.remote_field and field.db_constraint:
+            cursor.execute(str(editor._create_fk_sql(Attendance, field, '_fk_%(to_table)s_%(to_column)s')))
+
+    cursor.execute(f"ANALYZE {qn(PARENT_TABLE)}")
+    return dropped
+
+
+def detach_partitions(cursor, before, drop=False):
+    """
+    Отключает секции месяцев раньше before. Отключенные секции остаются
+    отдельными таблицами (для архивации) или удаляются при drop=True.
+    """
+    detached = []
+    for name, _ in list_partitions(cursor):
+        if name == DEFAULT_PARTITION:
+            continue
+        year, month = name.rsplit('_p', 1)[1].split('_')
+        if date(int(year), int(month), 1) >= month_start(before):
+            continue
+        cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}")
+        if drop:
+            cursor.execute(f"DROP TABLE {qn(name)}")
+        detached.append(name)
+    return detached
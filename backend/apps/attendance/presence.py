@@ -0,0 +1,201 @@
+"""
+Ростер присутствия: кто сейчас на работе
+
+Открытые смены хранятся в Redis хэшах attendance:presence:<company_id>
+и attendance:presence:<company_id>:department:<department_id>
+(поле - user_id, значение - JSON строки ростера). AttendanceActiveView
+читает хэш компании или отдела и запись самого пользователя одним
+pipeline, без SQL.
+
+Ростер обновляется при каждой записи смены (post_save, пакетные отметки,
+автозакрытие смен) и пересобирается из БД командой rebuild_presence.
+Строка удаляется только если в ростере та же смена (attendance_id), поэтому
+закрытие вчерашней забытой смены не убирает сегодняшнюю.
+"""
+import json
+import logging
+import threading
+from django.conf import settings
+from apps.departments.models import Department
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'attendance:presence'
+
+# Удаляет строку сотрудника из хэша компании и отдела, если смена совпадает
+REMOVE_SCRIPT = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value then return 0 end
+local entry = cjson.decode(value)
+if tostring(entry['attendance_id']) ~= ARGV[2] then return 0 end
+redis.call('HDEL', KEYS[1], ARGV[1])
+if entry['department_id'] ~= cjson.null then
+    redis.call('HDEL', KEYS[1] .. ':department:' .. entry['department_id'], ARGV[1])
+end
+return 1
+"""
+
+
+def company_key(company_id):
+    return f'{KEY_PREFIX}:{company_id}'
+
+
+def department_key(company_id, department_id):
+    return f'{company_key(company_id)}:department:{department_id}'
+
+
+def build_entries(attendances):
+    """Строки ростера для открытых смен (одним запросом для названий отделов)"""
+    department_names = dict(Department.objects.filter(
+        id__in={a.user.department_id for a in attendances if a.user.department_id}
+    ).values_list('id', 'name'))
+    return [
+        {
+            'company_id': attendance.company_id,
+            'user_id': attendance.user_id,
+            'attendance_id': attendance.id,
+            'full_name': f'{attendance.user.first_name} {attendance.user.last_name}',
+            'department_id': attendance.user.department_id,
+            'department': department_names.get(attendance.user.department_id),
+            'checkin_time': attendance.checkin_time.isoformat(),
+            'work_date': attendance.work_date.isoformat(),
+            'latitude': float(attendance.checkin_latitude) if attendance.checkin_latitude else None,
+            'longitude': float(attendance.checkin_longitude) if attendance.checkin_longitude else None,
+        }
+        for attendance in attendances
+    ]
+
+
+class MemoryPresence:
+    """Ростер в памяти процесса: тесты и разработка без Redis"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._companies = {}
+
+    def add(self, entries):
+        with self._lock:
+            for entry in entries:
+                self._companies.setdefault(entry['company_id'], {})[entry['user_id']] = entry
+
+    def remove(self, sessions):
+        with self._lock:
+            for company_id, user_id, attendance_id in sessions:
+                roster = self._companies.get(company_id, {})
+                if user_id in roster and roster[user_id]['attendance_id'] == attendance_id:
+                    del roster[user_id]
+
+    def read(self, company_id, department_id=None, everyone=False, user_id=None):
+        roster = self._companies.get(company_id, {})
+        entries = {}
+        if everyone or department_id:
+            entries = {
+                entry['user_id']: entry for entry in roster.values()
+                if everyone or entry['department_id'] == department_id
+            }
+        if user_id and user_id in roster:
+            entries.setdefault(user_id, roster[user_id])
+        return list(entries.values())
+
+    def replace(self, company_id, entries):
+        with self._lock:
+            self._companies[company_id] = {entry['user_id']: entry for entry in entries}
+
+
+class RedisPresence:
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._remove = self.client.register_script(REMOVE_SCRIPT)
+
+    def add(self, entries):
+        pipe = self.client.pipeline(transaction=False)
+        for entry in entries:
+            payload = json.dumps(entry)
+            pipe.hset(company_key(entry['company_id']), entry['user_id'], payload)
+            if entry['department_id']:
+                pipe.hset(department_key(entry['company_id'], entry['department_id']), entry['user_id'], payload)
+        pipe.execute()
+
+    def remove(self, sessions):
+        pipe = self.client.pipeline(transaction=False)
+        for company_id, user_id, attendance_id in sessions:
+            self._remove(keys=[company_key(company_id)], args=[user_id, attendance_id], client=pipe)
+        pipe.execute()
+
+    def read(self, company_id, department_id=None, everyone=False, user_id=None):
+        pipe = self.client.pipeline(transaction=False)
+        if everyone:
+            pipe.hgetall(company_key(company_id))
+        elif department_id:
+            pipe.hgetall(department_key(company_id, department_id))
+        if user_id:
+            pipe.hget(company_key(company_id), user_id)
+        responses = pipe.execute()
+
+        entries = {}
+        if everyone or department_id:
+            for payload in responses.pop(0).values():
+                entry = json.loads(payload)
+                entries[entry['user_id']] = entry
+        if user_id and responses and responses[0]:
+            entry = json.loads(responses[0])
+            entries.setdefault(entry['user_id'], entry)
+        return list(entries.values())
+
+    def replace(self, company_id, entries):
+        keys = [company_key(company_id)] + list(self.client.scan_iter(f'{company_key(company_id)}:department:*'))
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(*keys)
+        for entry in entries:
+            payload = json.dumps(entry)
+            pipe.hset(company_key(company_id), entry['user_id'], payload)
+            if entry['department_id']:
+                pipe.hset(department_key(company_id, entry['department_id']), entry['user_id'], payload)
+        pipe.execute()
+
+
+_presence = None
+
+
+def get_presence():
+    """Ростер из ATTENDANCE_PRESENCE_BACKEND или None (список активных из SQL)"""
+    global _presence
+    backend = getattr(settings, 'ATTENDANCE_PRESENCE_BACKEND', '')
+    if not backend:
+        return None
+    if _presence is None:
+        if backend == 'redis':
+            _presence = RedisPresence(settings.REDIS_URL)
+        elif backend == 'memory':
+            _presence = MemoryPresence()
+        else:
+            raise ValueError(f'Unknown ATTENDANCE_PRESENCE_BACKEND backend: {backend}')
+    return _presence
+
+
+def update_presence(attendances):
+    """Открытые смены добавляются в ростер, закрытые удаляются. Ошибки Redis не мешают отметке."""
+    presence = get_presence()
+    if presence is None:
+        return
+    attendances = [a for a in attendances if a.pk]
+    try:
+        presence.remove([
+            (a.company_id, a.user_id, a.id) for a in attendances if a.checkout_time is not None
+        ])
+        presence.add(build_entries([a for a in attendances if a.checkout_time is None]))
+    except Exception as e:
+        logger.warning(f'Failed to update presence roster: {e}')
+
+
+def remove_presence(sessions):
+    """Удаляет смены [(company_id, user_id, attendance_id)] из ростера"""
+    presence = get_presence()
+    if presence is None:
+        return
+    try:
+        presence.remove(sessions)
+    except Exception as e:
+        logger.warning(f'Failed to update presence roster: {e}')
@@ -1,3 +1,5 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Attendance
 from apps.users.serializers import UserSerializer
@@ -21,6 +23,63 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'total_hours']
 
 
+class AttendanceRowSerializer:
+    """
+    Быстрая сериализация списков из строк values() с JOIN на user и work_location.
+
+    Значения форматируются теми же полями DRF, что и в AttendanceSerializer,
+    поэтому вывод совпадает. notes и URL фото отдаются только по include.
+    """
+    OPTIONAL_FIELDS = {
+        'notes': ['notes'],
+        'photos': ['checkin_photo_url', 'checkout_photo_url'],
+    }
+
+    def __init__(self, include=()):
+        excluded = {
+            name
+            for group, names in self.OPTIONAL_FIELDS.items() if group not in include
+            for name in names
+        }
+        self.fields = [
+            (name, field) for name, field in AttendanceSerializer().fields.items()
+            if name not in excluded
+        ]
+
+    def value_fields(self):
+        """Поля для queryset.values()"""
+        lookups = ['id']
+        for name, field in self.fields:
+            if name == 'user_name':
+                lookups += ['user__first_name', 'user__last_name']
+            elif name == 'work_location_name':
+                lookups.append('work_location__name')
+            elif isinstance(field, serializers.RelatedField):
+                lookups.append(f'{field.source}_id')
+            else:
+                lookups.append(field.source)
+        return list(dict.fromkeys(lookups))
+
+    def to_representation(self, row):
+        data = {}
+        for name, field in self.fields:
+            if name == 'user_name':
+                data[name] = f"{row['user__first_name']} {row['user__last_name']}"
+            elif name == 'work_location_name':
+                # Как в DRF: без локации поле пропускается
+                if row['work_location__name'] is not None:
+                    data[name] = row['work_location__name']
+            elif isinstance(field, serializers.RelatedField):
+                data[name] = row[f'{field.source}_id']
+            else:
+                value = row[field.source]
+                data[name] = None if value is None else field.to_representation(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
 class AttendanceCheckinSerializer(serializers.Serializer):
     photo_url = serializers.URLField(required=False, allow_null=True)
     latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False, allow_null=True)
@@ -36,6 +95,50 @@ class AttendanceCheckoutSerializer(serializers.Serializer):
     face_verified = serializers.BooleanField(default=False)
 
 
+class AttendanceEventSerializer(serializers.Serializer):
+    """Отметка турникета/киоска в пакете"""
+    EVENT_TYPE_CHOICES = [
+        ('checkin', 'Приход'),
+        ('checkout', 'Уход'),
+    ]
+    
+    user_id = serializers.IntegerField()
+    event_type = serializers.ChoiceField(choices=EVENT_TYPE_CHOICES)
+    timestamp = serializers.DateTimeField(required=False)
+    photo_url = serializers.URLField(required=False, allow_null=True)
+    latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False, allow_null=True)
+    longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False, allow_null=True)
+    face_verified = serializers.BooleanField(default=False)
+    location_verified = serializers.BooleanField(default=False)
+
+    def validate_timestamp(self, value):
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError('Время отметки не может быть в будущем')
+        return value
+
+
+class AttendanceSyncEventSerializer(serializers.Serializer):
+    """Событие офлайн-клиента, event_id уникален в пределах сотрудника"""
+    event_id = serializers.CharField(max_length=64)
+    event_type = serializers.ChoiceField(choices=AttendanceEventSerializer.EVENT_TYPE_CHOICES)
+    device_time = serializers.DateTimeField()
+    photo_url = serializers.URLField(required=False, allow_null=True)
+    latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False, allow_null=True)
+    longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False, allow_null=True)
+    face_verified = serializers.BooleanField(default=False)
+    location_verified = serializers.BooleanField(default=False)
+
+    def validate_device_time(self, value):
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError('Время отметки не может быть в будущем')
+        return value
+
+
+class AttendanceBatchSerializer(serializers.Serializer):
+    # События валидируются по одному, чтобы ошибка в одном не отклоняла весь пакет
+    events = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=1000)
+
+
 class CurrentStatusSerializer(serializers.Serializer):
     is_checked_in = serializers.BooleanField()
     checkin_time = serializers.DateTimeField(allow_null=True)
@@ -0,0 +1,268 @@
+"""
+Идемпотентная синхронизация отметок офлайн-клиентов (Telegram бот, мобильное приложение)
+
+Клиент присваивает каждому событию event_id и передает время устройства.
+Повторы распознаются одним запросом по уникальному индексу (user, event_id)
+и возвращают сохраненный результат. Опоздавшие события встраиваются в
+смены своего дня по времени устройства:
+
+- приход внутри существующей смены игнорируется;
+- приход раньше следующей смены дня сдвигает ее начало (merged);
+- уход закрывает последнюю начатую до него смену или продлевает закрытую,
+  если пришел более поздний уход (merged); более ранний уход игнорируется;
+- уход без начатой смены (приход еще не дошел) сохраняется как pending и
+  применяется, когда придет приход того же дня раньше него. Повтор pending
+  события применяется заново: приход мог быть отмечен и без синхронизации.
+
+Оставшиеся pending уходы разбирает close_stale_sessions
+(resolve_pending_checkouts): применяются к сменам своего дня, а старше
+срока ожидания без смены получают ошибку NOT_CHECKED_IN.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from apps.departments.schedules import calculate_lateness
+from apps.geolocation.models import WorkLocation
+from apps.users.models import get_company_timezone
+from .batch import send_batch_event
+from .models import Attendance, AttendanceEvent, local_work_date
+
+ERROR_MESSAGES = {
+    'NOT_CHECKED_IN': 'Приход не отмечен',
+}
+
+
+def sync_attendance_events(user, events):
+    """Применяет события пользователя, возвращает результаты в порядке входа"""
+    try:
+        return _sync(user, events)
+    except IntegrityError:
+        # Параллельный повтор тех же event_id: при второй попытке они уже в хранилище
+        return _sync(user, events)
+
+
+def _sync(user, events):
+    stored = {
+        record.event_id: record
+        for record in AttendanceEvent.objects.filter(
+            user=user,
+            event_id__in=[e['event_id'] for e in events]
+        )
+    }
+
+    new_events = {}
+    for event in events:
+        record = stored.get(event['event_id'])
+        if record is None or record.status == 'pending':
+            new_events.setdefault(event['event_id'], event)
+
+    applied = {}
+    outcomes = []
+    if new_events:
+        with transaction.atomic():
+            applied, resolved, outcomes = _apply(user, sorted(new_events.values(), key=lambda e: e['device_time']))
+            for event_id, record in applied.items():
+                if event_id in stored:
+                    record.pk = stored[event_id].pk
+                    resolved.append(record)
+            AttendanceEvent.objects.bulk_create([r for r in applied.values() if r.pk is None])
+            AttendanceEvent.objects.bulk_update(resolved, ['attendance', 'status', 'error_code'])
+
+    results = []
+    seen = set()
+    for event in events:
+        event_id = event['event_id']
+        record = applied.get(event_id) or stored[event_id]
+        result = {
+            'event_id': event_id,
+            'status': record.status,
+            'attendance_id': record.attendance_id,
+            'duplicate': event_id in stored or event_id in seen
+        }
+        if record.error_code:
+            result['error'] = {
+                'code': record.error_code,
+                'message': ERROR_MESSAGES.get(record.error_code, record.error_code)
+            }
+        results.append(result)
+        seen.add(event_id)
+
+    send_batch_event(outcomes)
+    return results
+
+
+def _apply(user, events):
+    days = {local_work_date(e['device_time'], user.company_id) for e in events}
+    sessions_by_day = defaultdict(list)
+    for attendance in Attendance.objects.select_for_update().filter(
+        user=user,
+        work_date__in=days
+    ).order_by('checkin_time'):
+        sessions_by_day[attendance.work_date].append(attendance)
+
+    # Ранее отложенные уходы этих дней (кроме переотправленных в этом запросе):
+    # диапазон device_time покрывает дни, точные дни отбираются в Python
+    tz = get_company_timezone(user.company_id)
+    waiting_by_day = defaultdict(list)
+    for record in AttendanceEvent.objects.select_for_update().filter(
+        user=user,
+        status='pending',
+        device_time__gte=datetime.combine(min(days), time.min, tzinfo=tz),
+        device_time__lt=datetime.combine(max(days) + timedelta(days=1), time.min, tzinfo=tz)
+    ).exclude(event_id__in=[e['event_id'] for e in events]).order_by('device_time'):
+        day = local_work_date(record.device_time, user.company_id)
+        if day in days:
+            waiting_by_day[day].append(record)
+
+    applied = {}
+    resolved = []
+    outcomes = []
+    for index, event in enumerate(events):
+        day = local_work_date(event['device_time'], user.company_id)
+        sessions = sessions_by_day[day]
+        if event['event_type'] == 'checkin':
+            status, attendance, error_code = _apply_checkin(user, sessions, event, waiting_by_day[day], resolved)
+        else:
+            status, attendance, error_code = _apply_checkout(sessions, event)
+
+        if status in ('checked_in', 'checked_out'):
+            attendance.user = user
+            outcomes.append((index, status, attendance))
+        applied[event['event_id']] = AttendanceEvent(
+            user=user,
+            event_id=event['event_id'],
+            event_type=event['event_type'],
+            device_time=event['device_time'],
+            attendance=attendance,
+            status=status,
+            error_code=error_code
+        )
+
+    for record in resolved:
+        if record.status == 'checked_out':
+            record.attendance.user = user
+            outcomes.append((None, record.status, record.attendance))
+    return applied, resolved, outcomes
+
+
+def _apply_checkin(user, sessions, event, waiting, resolved):
+    """Применяет приход и отложенные уходы дня позже него (resolved - их записи)"""
+    moment = event['device_time']
+    for session in sessions:
+        if session.checkin_time <= moment and (session.checkout_time is None or moment <= session.checkout_time):
+            return 'ignored', session, None
+
+    following = next((s for s in sessions if s.checkin_time > moment), None)
+    if following:
+        following.checkin_time = moment
+        following.is_late, following.late_minutes = calculate_lateness(user.work_schedule_id, moment)
+        following.save()
+        _apply_waiting(sessions, waiting, moment, resolved)
+        return 'merged', following, None
+
+    work_location = None
+    if event.get('latitude') and user.department_id:
+        work_location = WorkLocation.objects.filter(
+            department_id=user.department_id,
+            is_active=True
+        ).first()
+    is_late, late_minutes = calculate_lateness(user.work_schedule_id, moment)
+    attendance = Attendance.objects.create(
+        user=user,
+        company_id=user.company_id,
+        checkin_time=moment,
+        checkin_photo_url=event.get('photo_url'),
+        checkin_latitude=event.get('latitude'),
+        checkin_longitude=event.get('longitude'),
+        work_location=work_location,
+        is_late=is_late,
+        late_minutes=late_minutes,
+        face_verified=event.get('face_verified', False),
+        location_verified=event.get('location_verified', False)
+    )
+    sessions.append(attendance)
+    sessions.sort(key=lambda s: s.checkin_time)
+    _apply_waiting(sessions, waiting, moment, resolved)
+    return 'checked_in', attendance, None
+
+
+def _apply_waiting(sessions, waiting, moment, resolved):
+    """Применяет отложенные уходы позже прихода moment к сменам дня"""
+    for record in [r for r in waiting if r.device_time > moment]:
+        record.status, record.attendance, record.error_code = _apply_checkout(
+            sessions,
+            {'device_time': record.device_time}
+        )
+        waiting.remove(record)
+        resolved.append(record)
+
+
+def _apply_checkout(sessions, event):
+    moment = event['device_time']
+    started = [s for s in sessions if s.checkin_time <= moment]
+    if not started:
+        # Приход еще не дошел: уход ждет его, а не сохраняется ошибкой
+        return 'pending', None, None
+
+    session = started[-1]
+    if session.checkout_time is not None and session.checkout_time >= moment:
+        return 'ignored', session, None
+
+    status = 'checked_out' if session.checkout_time is None else 'merged'
+    session.checkout_time = moment
+    session.checkout_photo_url = event.get('photo_url', session.checkout_photo_url)
+    session.checkout_latitude = event.get('latitude', session.checkout_latitude)
+    session.checkout_longitude = event.get('longitude', session.checkout_longitude)
+    session.save()
+    return status, session, None
+
+
+def resolve_pending_checkouts(expire_before, company_id=None):
+    """
+    Применяет отложенные уходы к сменам их дней (приход мог быть отмечен не
+    через синхронизацию). Уход, так и не нашедший смену и отправленный
+    раньше expire_before, получает ошибку NOT_CHECKED_IN.
+    Возвращает (применено, просрочено).
+    """
+    records = AttendanceEvent.objects.select_for_update().filter(status='pending').select_related('user')
+    if company_id:
+        records = records.filter(user__company_id=company_id)
+
+    with transaction.atomic():
+        records = list(records.order_by('device_time'))
+        if not records:
+            return 0, 0
+        keys = {
+            (record.user_id, local_work_date(record.device_time, record.user.company_id))
+            for record in records
+        }
+        sessions_by_key = defaultdict(list)
+        # Надмножество по IN, точные пары отбираются в Python
+        for attendance in Attendance.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in keys},
+            work_date__in={day for _, day in keys}
+        ).order_by('checkin_time'):
+            sessions_by_key[(attendance.user_id, attendance.work_date)].append(attendance)
+
+        changed = []
+        outcomes = []
+        for record in records:
+            day = local_work_date(record.device_time, record.user.company_id)
+            status, attendance, error_code = _apply_checkout(
+                sessions_by_key[(record.user_id, day)],
+                {'device_time': record.device_time}
+            )
+            if status == 'pending' and record.device_time >= expire_before:
+                continue
+            if status == 'pending':
+                status, error_code = 'error', 'NOT_CHECKED_IN'
+            record.status, record.attendance, record.error_code = status, attendance, error_code
+            changed.append(record)
+            if status == 'checked_out':
+                attendance.user = record.user
+                outcomes.append((None, status, attendance))
+        AttendanceEvent.objects.bulk_update(changed, ['attendance', 'status', 'error_code'])
+
+    send_batch_event(outcomes)
+    expired = sum(1 for record in changed if record.status == 'error')
+    return len(changed) - expired, expired
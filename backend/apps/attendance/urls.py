@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     AttendanceListCreateView, AttendanceRetrieveUpdateDestroyView,
     AttendanceCheckinView, AttendanceCheckoutView,
-    AttendanceCurrentView, AttendanceActiveView
+    AttendanceCurrentView, AttendanceActiveView, AttendanceBatchView,
+    AttendanceSyncView, AttendanceExportView
 )
 
 urlpatterns = [
@@ -10,7 +11,10 @@ urlpatterns = [
     path('<int:pk>/', AttendanceRetrieveUpdateDestroyView.as_view(), name='attendance-detail'),
     path('checkin/', AttendanceCheckinView.as_view(), name='attendance-checkin'),
     path('checkout/', AttendanceCheckoutView.as_view(), name='attendance-checkout'),
+    path('batch/', AttendanceBatchView.as_view(), name='attendance-batch'),
+    path('sync/', AttendanceSyncView.as_view(), name='attendance-sync'),
     path('current/', AttendanceCurrentView.as_view(), name='attendance-current'),
     path('active/', AttendanceActiveView.as_view(), name='attendance-active'),
     path('history/', AttendanceListCreateView.as_view(), name='attendance-history'),
+    path('export/', AttendanceExportView.as_view(), name='attendance-export'),
 ]
@@ -2,28 +2,38 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import PageNumberPagination
 from config.mixins import TenantFilterMixin
-from .models import Attendance
+from config.pagination import HybridPagination
+from .models import Attendance, local_work_date
 from .serializers import (
-    AttendanceSerializer, AttendanceCheckinSerializer,
-    AttendanceCheckoutSerializer
+    AttendanceSerializer, AttendanceRowSerializer, AttendanceCheckinSerializer,
+    AttendanceCheckoutSerializer, AttendanceEventSerializer,
+    AttendanceBatchSerializer, AttendanceSyncEventSerializer
 )
-from apps.departments.models import WorkSchedule
+from .batch import event_error, process_attendance_events
+from .sync import sync_attendance_events
+from .checkin_queue import get_checkin_queue
+from .export import EXPORT_FORMATS, iter_export
+from .archive import find_archived
+from .presence import get_presence, remove_presence
+from apps.departments.schedules import calculate_lateness
 from apps.geolocation.models import WorkLocation
+from apps.users.models import User
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
 channel_layer = get_channel_layer()
 
 
-class AttendanceListCreateView(TenantFilterMixin, generics.ListCreateAPIView):
-    """Список и создание записей посещаемости"""
+class AttendanceHistoryMixin(TenantFilterMixin):
+    """Область видимости истории по роли и фильтры периода (список и выгрузка)"""
     queryset = Attendance.objects.all()
-    serializer_class = AttendanceSerializer
-    permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['user', 'is_late']
     ordering_fields = ['checkin_time']
@@ -47,15 +57,100 @@ class AttendanceListCreateView(TenantFilterMixin, generics.ListCreateAPIView):
         user_id = self.request.query_params.get('user_id')
         
         if start_date:
-            queryset = queryset.filter(checkin_time__date__gte=start_date)
+            queryset = queryset.filter(work_date__gte=start_date)
         if end_date:
-            queryset = queryset.filter(checkin_time__date__lte=end_date)
+            queryset = queryset.filter(work_date__lte=end_date)
         if user_id and (user.role in ['manager', 'admin']):
             queryset = queryset.filter(user_id=user_id)
         
         return queryset
 
 
+class AttendanceListCreateView(AttendanceHistoryMixin, generics.ListCreateAPIView):
+    """
+    Список и создание записей посещаемости
+    Список строится из values() одним запросом, ?include=notes,photos добавляет поля
+    ?archive=1 читает только холодный архив (см. archive_attendance)
+    """
+    serializer_class = AttendanceSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = HybridPagination
+
+    def list(self, request, *args, **kwargs):
+        include = request.query_params.get('include', '').split(',')
+        row_serializer = AttendanceRowSerializer(include=include)
+        if request.query_params.get('archive') in ('1', 'true'):
+            return self.list_archived(request, row_serializer)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*row_serializer.value_fields())
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.serialize(page))
+        return Response(row_serializer.serialize(queryset))
+
+    def list_archived(self, request, row_serializer):
+        """История из архивных файлов: та же область видимости и фильтры, только чтение"""
+        user = request.user
+        params = request.query_params
+        start_date = parse_date(params['start_date']) if params.get('start_date') else None
+        end_date = parse_date(params['end_date']) if params.get('end_date') else None
+        if (params.get('start_date') and not start_date) or (params.get('end_date') and not end_date):
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Неверный формат даты, используйте YYYY-MM-DD'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        user_ids = None
+        if user.role == 'employee':
+            user_ids = {user.id}
+        elif user.role == 'manager' and user.department:
+            user_ids = set(User.objects.filter(department=user.department).values_list('id', flat=True))
+        requested = [params.get('user')]
+        if user.role in ['manager', 'admin']:
+            requested.append(params.get('user_id'))
+        for user_id in filter(None, requested):
+            selected = {int(user_id)} if user_id.isdigit() else set()
+            user_ids = selected if user_ids is None else user_ids & selected
+
+        is_late = {'true': True, 'false': False}.get(params.get('is_late', '').lower())
+        company = getattr(request, 'company', None) or user.company
+        rows = find_archived(company.id if company else None, start_date, end_date, user_ids, is_late)
+
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(row_serializer.serialize(page))
+
+
+class AttendanceExportView(AttendanceHistoryMixin, generics.GenericAPIView):
+    """
+    Потоковая выгрузка истории посещаемости
+    ?export_format=csv (по умолчанию) или ndjson, фильтры как у истории
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Неподдерживаемый формат выгрузки'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            iter_export(queryset, export_format),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        filename = f'attendance_{timezone.localdate().isoformat()}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 class AttendanceRetrieveUpdateDestroyView(TenantFilterMixin, generics.RetrieveUpdateDestroyAPIView):
     """Детали, обновление и удаление записи посещаемости"""
     queryset = Attendance.objects.all()
@@ -75,6 +170,11 @@ class AttendanceRetrieveUpdateDestroyView(TenantFilterMixin, generics.RetrieveUp
         
         return queryset
 
+    def perform_destroy(self, instance):
+        session = (instance.company_id, instance.user_id, instance.id)
+        instance.delete()
+        remove_presence([session])
+
 
 class AttendanceCheckinView(APIView):
     """Отметить приход"""
@@ -86,14 +186,11 @@ class AttendanceCheckinView(APIView):
             serializer.is_valid(raise_exception=True)
             
             user = request.user
-            today = timezone.now().date()
+            checkin_time = timezone.now()
+            today = local_work_date(checkin_time, user.company_id)
             
             # Проверяем, не отмечен ли уже приход
-            existing = Attendance.objects.filter(
-                user=user,
-                checkin_time__date=today,
-                checkout_time__isnull=True
-            ).first()
+            existing = Attendance.objects.open_sessions(today).filter(user=user).exists()
             
             if existing:
                 return Response({
@@ -103,26 +200,17 @@ class AttendanceCheckinView(APIView):
                     }
                 }, status=status.HTTP_400_BAD_REQUEST)
             
+            queue = get_checkin_queue()
+            if queue:
+                return self.enqueue_checkin(queue, user, today, checkin_time, serializer.validated_data)
+            
             # Определяем опоздание
             is_late = False
             late_minutes = 0
             work_location = None
             
             try:
-                if hasattr(user, 'work_schedule') and user.work_schedule:
-                    schedule = user.work_schedule
-                    checkin_time = timezone.now()
-                    scheduled_time = timezone.now().replace(
-                        hour=schedule.start_time.hour,
-                        minute=schedule.start_time.minute,
-                        second=0,
-                        microsecond=0
-                    )
-                    
-                    if checkin_time > scheduled_time:
-                        diff = checkin_time - scheduled_time
-                        late_minutes = int(diff.total_seconds() / 60)
-                        is_late = late_minutes > (getattr(schedule, 'late_threshold', None) or 15)
+                is_late, late_minutes = calculate_lateness(user.work_schedule_id, checkin_time)
             except Exception as e:
                 # Игнорируем ошибки при определении опоздания
                 pass
@@ -145,7 +233,8 @@ class AttendanceCheckinView(APIView):
             # Создаем запись
             attendance = Attendance.objects.create(
                 user=user,
-                checkin_time=timezone.now(),
+                company_id=user.company_id,
+                checkin_time=checkin_time,
                 checkin_photo_url=serializer.validated_data.get('photo_url'),
                 checkin_latitude=latitude,
                 checkin_longitude=longitude,
@@ -174,6 +263,32 @@ class AttendanceCheckinView(APIView):
                 }
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def enqueue_checkin(self, queue, user, today, checkin_time, data):
+        """Ставит приход в очередь, запись в БД выполнит drain_checkin_queue"""
+        event = {
+            'user_id': user.id,
+            'event_type': 'checkin',
+            'timestamp': checkin_time.isoformat(),
+            'photo_url': data.get('photo_url'),
+            'latitude': str(data['latitude']) if data.get('latitude') is not None else None,
+            'longitude': str(data['longitude']) if data.get('longitude') is not None else None,
+            'face_verified': data.get('face_verified', False),
+            'location_verified': data.get('location_verified', False)
+        }
+        if not queue.enqueue(user.id, today, event):
+            return Response({
+                'error': {
+                    'code': 'ALREADY_CHECKED_IN',
+                    'message': 'Вы уже отметили приход сегодня'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'status': 'queued',
+            'user_id': user.id,
+            'checkin_time': event['timestamp']
+        }, status=status.HTTP_202_ACCEPTED)
+
     def send_checkin_event(self, attendance):
         """Отправка WebSocket события о приходе"""
         try:
@@ -206,16 +321,22 @@ class AttendanceCheckoutView(APIView):
             serializer.is_valid(raise_exception=True)
             
             user = request.user
-            today = timezone.now().date()
+            today = local_work_date(timezone.now(), user.company_id)
             
             # Находим активную отметку прихода
-            attendance = Attendance.objects.filter(
-                user=user,
-                checkin_time__date=today,
-                checkout_time__isnull=True
+            attendance = Attendance.objects.open_sessions(today).filter(
+                user=user
             ).order_by('-checkin_time').first()
             
             if not attendance:
+                queue = get_checkin_queue()
+                if queue and queue.pending(user.id, today):
+                    return Response({
+                        'error': {
+                            'code': 'CHECKIN_PENDING',
+                            'message': 'Приход еще обрабатывается, повторите через несколько секунд'
+                        }
+                    }, status=status.HTTP_409_CONFLICT)
                 return Response({
                     'error': {
                         'code': 'NOT_CHECKED_IN',
@@ -272,17 +393,116 @@ class AttendanceCheckoutView(APIView):
             logger.warning(f"Failed to send WebSocket event: {e}")
 
 
+class AttendanceBatchView(APIView):
+    """Пакетные отметки прихода/ухода от турникетов и киосков (Manager/Admin)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role == 'employee':
+            return Response({
+                'error': {
+                    'code': 'FORBIDDEN',
+                    'message': 'Недостаточно прав доступа'
+                }
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = AttendanceBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = {}
+        events = []
+        for index, raw_event in enumerate(serializer.validated_data['events']):
+            event_serializer = AttendanceEventSerializer(data=raw_event)
+            if event_serializer.is_valid():
+                events.append(dict(event_serializer.validated_data, index=index))
+            else:
+                results[index] = event_error(
+                    index, 'VALIDATION_ERROR', 'Ошибка валидации', event_serializer.errors
+                )
+        
+        # Отметки разрешены только для сотрудников своей компании (и отдела для руководителя)
+        users = User.objects.filter(is_active=True)
+        company = getattr(request, 'company', None) or request.user.company
+        if company:
+            users = users.filter(company=company)
+        if request.user.role == 'manager':
+            users = users.filter(department=request.user.department) if request.user.department else users.none()
+        
+        if events:
+            results.update(process_attendance_events(events, users))
+        
+        ordered = [results[index] for index in sorted(results)]
+        failed = sum(1 for result in ordered if result['status'] == 'error')
+        return Response({
+            'processed': len(ordered),
+            'succeeded': len(ordered) - failed,
+            'failed': failed,
+            'results': ordered
+        })
+
+
+class AttendanceSyncView(APIView):
+    """
+    Синхронизация накопленных офлайн отметок текущего пользователя.
+    Повторная отправка того же event_id возвращает сохраненный результат.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = AttendanceBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = {}
+        events = []
+        indexes = []
+        for index, raw_event in enumerate(serializer.validated_data['events']):
+            event_serializer = AttendanceSyncEventSerializer(data=raw_event)
+            if event_serializer.is_valid():
+                events.append(event_serializer.validated_data)
+                indexes.append(index)
+            else:
+                results[index] = dict(
+                    event_error(index, 'VALIDATION_ERROR', 'Ошибка валидации', event_serializer.errors),
+                    event_id=raw_event.get('event_id')
+                )
+        
+        if events:
+            for index, result in zip(indexes, sync_attendance_events(request.user, events)):
+                results[index] = dict(result, index=index)
+        
+        ordered = [results[index] for index in sorted(results)]
+        failed = sum(1 for result in ordered if result['status'] == 'error')
+        return Response({
+            'processed': len(ordered),
+            'succeeded': len(ordered) - failed,
+            'failed': failed,
+            'results': ordered
+        })
+
+
 class AttendanceCurrentView(APIView):
     """Получить текущий статус посещаемости"""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        today = timezone.now().date()
+        today = local_work_date(timezone.now(), user.company_id)
+        
+        # Приход в очереди еще не записан в БД, но уже виден самому сотруднику
+        queue = get_checkin_queue()
+        pending = queue.pending(user.id, today) if queue else None
+        if pending:
+            checkin_time = parse_datetime(pending['timestamp'])
+            return Response({
+                'is_checked_in': True,
+                'checkin_time': checkin_time,
+                'hours_worked': round((timezone.now() - checkin_time).total_seconds() / 3600, 2),
+                'attendance_id': None,
+                'pending': True
+            })
         
-        attendance = Attendance.objects.filter(
-            user=user,
-            checkin_time__date=today
+        attendance = Attendance.objects.for_day(today).filter(
+            user=user
         ).order_by('-checkin_time').first()
         
         if not attendance:
@@ -309,34 +529,35 @@ class AttendanceCurrentView(APIView):
 
 
 class AttendanceActiveView(APIView):
-    """Получить активных сотрудников"""
+    """
+    Получить активных сотрудников
+    При ATTENDANCE_PRESENCE_BACKEND список читается из ростера присутствия (presence.py)
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        today = timezone.now().date()
+        today = local_work_date(timezone.now(), user.company_id)
+        presence = get_presence()
+        if presence:
+            try:
+                return Response(self.roster(presence, request, today))
+            except Exception as e:
+                import logging
+                logging.getLogger(__name__).warning(f"Presence roster unavailable, falling back to SQL: {e}")
+
+        open_sessions = Attendance.objects.open_sessions(today)
         
         # Определяем queryset в зависимости от роли
         if user.role == 'employee':
             # Сотрудники видят только себя, если они на работе
-            queryset = Attendance.objects.filter(
-                user=user,
-                checkin_time__date=today,
-                checkout_time__isnull=True
-            )
+            queryset = open_sessions.filter(user=user)
         elif user.role == 'manager' and user.department:
             # Руководители видят свой отдел
-            queryset = Attendance.objects.filter(
-                user__department=user.department,
-                checkin_time__date=today,
-                checkout_time__isnull=True
-            )
+            queryset = open_sessions.filter(user__department=user.department)
         else:
             # Администраторы видят всех
-            queryset = Attendance.objects.filter(
-                checkin_time__date=today,
-                checkout_time__isnull=True
-            )
+            queryset = open_sessions
         
         # Фильтр по отделу (для админов и менеджеров)
         department_id = request.query_params.get('department_id')
@@ -364,13 +585,13 @@ class AttendanceActiveView(APIView):
         
         # ВАЖНО: Если текущий пользователь на работе, но его нет в списке, добавляем его
         # Это гарантирует, что пользователь всегда видит себя в списке активных
-        current_user_attendance = Attendance.objects.filter(
-            user=user,
-            checkin_time__date=today,
-            checkout_time__isnull=True
-        ).order_by('-checkin_time').first()
+        current_user_attendance = None
+        if user.id not in user_ids_in_list:
+            current_user_attendance = open_sessions.filter(
+                user=user
+            ).order_by('-checkin_time').first()
         
-        if current_user_attendance and user.id not in user_ids_in_list:
+        if current_user_attendance:
             hours_worked = (timezone.now() - current_user_attendance.checkin_time).total_seconds() / 3600
             data.append({
                 'user_id': user.id,
@@ -385,3 +606,38 @@ class AttendanceActiveView(APIView):
             })
         
         return Response(data)
+
+    def roster(self, presence, request, today):
+        """Активные из ростера с той же областью видимости, что и SQL вариант"""
+        user = request.user
+        department_id = request.query_params.get('department_id')
+        if user.role == 'employee':
+            scope = {}
+        elif user.role == 'manager' and user.department_id:
+            # Руководитель видит свой отдел; фильтр по чужому отделу дает пустой список
+            same = not department_id or department_id == str(user.department_id)
+            scope = {'department_id': user.department_id} if same else {}
+        elif department_id and department_id.isdigit():
+            scope = {'department_id': int(department_id)}
+        else:
+            scope = {'everyone': True}
+
+        now = timezone.now()
+        data = []
+        for entry in presence.read(user.company_id, user_id=user.id, **scope):
+            if entry['work_date'] != today.isoformat():
+                continue
+            checkin_time = parse_datetime(entry['checkin_time'])
+            data.append({
+                'user_id': entry['user_id'],
+                'full_name': entry['full_name'],
+                'department': entry['department'],
+                'checkin_time': checkin_time,
+                'hours_worked': round((now - checkin_time).total_seconds() / 3600, 2),
+                'location': {
+                    'latitude': entry['latitude'],
+                    'longitude': entry['longitude']
+                }
+            })
+        data.sort(key=lambda item: item['checkin_time'], reverse=True)
+        return data
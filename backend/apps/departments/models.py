@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.reports.cache import bump_data_version
 
 User = get_user_model()
 
@@ -62,3 +65,22 @@ class WorkSchedule(models.Model):
 
     def __str__(self):
         return self.name
+
+
+@receiver([post_save, post_delete], sender=WorkSchedule)
+def reset_compiled_schedule(sender, instance, **kwargs):
+    from .schedules import invalidate_schedule
+    invalidate_schedule(instance.id)
+
+
+@receiver([post_save, post_delete], sender=WorkSchedule)
+def bump_report_version(sender, instance, **kwargs):
+    # Отсутствия, опоздания и переработки в отчетах считаются по графику
+    bump_data_version([instance.company_id])
+
+
+@receiver(post_save, sender=WorkSchedule)
+def reset_running_overtime(sender, instance, **kwargs):
+    # Переработки в текущих итогах ЗП считаются по графику - пересчитаются при следующем чтении
+    from apps.salary.models import SalaryRunningTotal
+    SalaryRunningTotal.objects.filter(user__work_schedule=instance).delete()
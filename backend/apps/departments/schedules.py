@@ -0,0 +1,160 @@
+"""
+Скомпилированные графики работы
+
+WorkSchedule компилируется один раз в таблицу смен по дням недели
+(начало, конец, перерыв, ожидаемые минуты) и хранится в кэше процесса.
+Опоздание, ожидаемые часы и рабочий ли день считаются поиском в этой
+таблице в часовом поясе компании, без запроса к БД.
+
+Кэш сбрасывается сигналами при сохранении/удалении графика (см. models.py),
+TTL ограничивает устаревание в других процессах (gunicorn, воркеры).
+
+expected_hours - то же для колонок NumPy (аналитика, переработки в ЗП).
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import numpy as np
+from django.utils import timezone
+from apps.users.models import get_company_timezone
+from .models import WorkSchedule
+
+NO_SCHEDULE = -1  # id графика в колонках NumPy для сотрудников без графика
+COMPILED_SCHEDULE_TTL = 300  # секунд
+DEFAULT_LATE_THRESHOLD = 15
+ALL_DAYS = frozenset(range(1, 8))
+
+_compiled_schedules = {}  # id -> (срок годности, CompiledSchedule)
+
+
+@dataclass(frozen=True)
+class DayShift:
+    """Смена дня недели: время начала/конца и длительность без перерыва"""
+    start_time: object
+    end_time: object
+    break_minutes: int
+    expected_minutes: int
+
+
+@dataclass(frozen=True)
+class Shift:
+    """Смена конкретной даты в часовом поясе компании"""
+    start: datetime
+    end: datetime
+    break_minutes: int
+    expected_minutes: int
+
+    @property
+    def expected_hours(self):
+        return self.expected_minutes / 60
+
+
+class CompiledSchedule:
+    def __init__(self, schedule):
+        self.id = schedule.id
+        self.company_id = schedule.company_id
+        self.late_threshold = (
+            schedule.late_threshold if schedule.late_threshold is not None else DEFAULT_LATE_THRESHOLD
+        )
+
+        # Пустой work_days - график без выходных (так он работал до учета рабочих дней)
+        work_days = {int(day) for day in schedule.work_days or [] if 1 <= int(day) <= 7} or ALL_DAYS
+        start = schedule.start_time.hour * 60 + schedule.start_time.minute
+        end = schedule.end_time.hour * 60 + schedule.end_time.minute
+        duration = end - start if end > start else end + 24 * 60 - start  # ночная смена
+        day_shift = DayShift(
+            start_time=schedule.start_time,
+            end_time=schedule.end_time,
+            break_minutes=schedule.break_duration or 0,
+            expected_minutes=max(duration - (schedule.break_duration or 0), 0),
+        )
+        # Индекс - isoweekday() (1 = понедельник), 0 не используется
+        self.days = tuple(day_shift if day in work_days else None for day in range(8))
+
+    @property
+    def tz(self):
+        return get_company_timezone(self.company_id)
+
+    def is_work_day(self, day):
+        return self.days[day.isoweekday()] is not None
+
+    def shift_for(self, day):
+        """Смена на дату (None в выходной)"""
+        day_shift = self.days[day.isoweekday()]
+        if day_shift is None:
+            return None
+        start = datetime.combine(day, day_shift.start_time, tzinfo=self.tz)
+        end = datetime.combine(day, day_shift.end_time, tzinfo=self.tz)
+        if end <= start:
+            end += timedelta(days=1)
+        return Shift(start, end, day_shift.break_minutes, day_shift.expected_minutes)
+
+    def expected_minutes(self, day):
+        day_shift = self.days[day.isoweekday()]
+        return day_shift.expected_minutes if day_shift else 0
+
+    def lateness(self, checkin_time):
+        """(is_late, late_minutes) для отметки прихода; в выходной опоздания нет"""
+        local_time = timezone.localtime(checkin_time, self.tz)
+        shift = self.shift_for(local_time.date())
+        if shift is None or local_time <= shift.start:
+            return False, 0
+        late_minutes = int((local_time - shift.start).total_seconds() // 60)
+        return late_minutes > self.late_threshold, late_minutes
+
+
+def get_schedules(schedule_ids):
+    """{id: CompiledSchedule}; недостающие в кэше графики читаются одним запросом"""
+    now = time.monotonic()
+    result = {}
+    missing = set()
+    for schedule_id in schedule_ids:
+        if not schedule_id:
+            continue
+        cached = _compiled_schedules.get(schedule_id)
+        if cached and cached[0] > now:
+            result[schedule_id] = cached[1]
+        else:
+            missing.add(schedule_id)
+
+    if missing:
+        for schedule in WorkSchedule.objects.filter(id__in=missing):
+            compiled = CompiledSchedule(schedule)
+            _compiled_schedules[schedule.id] = (now + COMPILED_SCHEDULE_TTL, compiled)
+            result[schedule.id] = compiled
+    return result
+
+
+def get_schedule(schedule_id):
+    return get_schedules([schedule_id]).get(schedule_id)
+
+
+def calculate_lateness(schedule_id, checkin_time):
+    """Опоздание по графику сотрудника: (is_late, late_minutes)"""
+    schedule = get_schedule(schedule_id)
+    if schedule is None:
+        return False, 0
+    return schedule.lateness(checkin_time)
+
+
+def invalidate_schedule(schedule_id):
+    _compiled_schedules.pop(schedule_id, None)
+
+
+def iso_weekdays(days):
+    """День недели 1..7 (1 = понедельник) для массива datetime64[D], как isoweekday()"""
+    # 1970-01-01 - четверг
+    return (days.astype('datetime64[D]').astype(np.int64) + 3) % 7 + 1
+
+
+def expected_hours(schedule_ids, weekdays):
+    """Часы по графику для массивов (id графика, день недели); NaN без графика"""
+    ids, rows = np.unique(schedule_ids, return_inverse=True)
+    schedules = get_schedules([i for i in ids.tolist() if i != NO_SCHEDULE])
+    # Таблица [график, день недели] ожидаемых часов
+    table = np.full((len(ids), 8), np.nan)
+    for row, schedule_id in enumerate(ids.tolist()):
+        schedule = schedules.get(schedule_id)
+        if schedule:
+            table[row] = [day.expected_minutes / 60 if day else 0 for day in schedule.days]
+    return table[rows, weekdays]
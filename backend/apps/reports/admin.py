@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ReportJob
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company', 'report_type', 'status', 'progress', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['report_type', 'status']
+    readonly_fields = ['params_hash']
@@ -0,0 +1,207 @@
+"""
+Аналитика посещаемости на NumPy
+
+Дневные сводки компании за период загружаются одним запросом values_list
+в колонки NumPy (сотрудник, отдел, график, дата, приход, часы, опоздание).
+Распределения считаются векторно: группировка - через np.unique с
+return_inverse и np.bincount по составному индексу, без циклов по строкам.
+
+Одна строка - сотрудник за рабочий день (первый приход дня, сумма часов
+закрытых смен), поэтому послеобеденные смены не искажают время прихода.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time
+import numpy as np
+from apps.attendance.models import AttendanceDailySummary
+from apps.departments.models import Department
+from apps.departments.schedules import NO_SCHEDULE, expected_hours, iso_weekdays
+from apps.users.models import get_company_timezone
+
+NULL_ID = NO_SCHEDULE  # None в колонках id (график, отдел)
+SECONDS_PER_DAY = 86400
+ARRIVAL_PERCENTILES = [10, 25, 50, 75, 90]
+OVERTIME_BINS = [0, 0.5, 1, 2, 3, 4, np.inf]  # часы
+
+COLUMNS = [
+    'user_id', 'user__department_id', 'user__work_schedule_id', 'work_date',
+    'first_checkin', 'total_hours', 'late_minutes', 'is_late',
+]
+
+
+@dataclass
+class AttendanceColumns:
+    company_id: int
+    user_id: np.ndarray
+    department_id: np.ndarray
+    schedule_id: np.ndarray
+    work_date: np.ndarray  # datetime64[D]
+    checkin: np.ndarray  # секунды Unix
+    hours: np.ndarray
+    late_minutes: np.ndarray
+    is_late: np.ndarray
+
+    def __len__(self):
+        return len(self.user_id)
+
+    @property
+    def weekday(self):
+        """День недели 1..7 (1 = понедельник), как isoweekday()"""
+        return iso_weekdays(self.work_date)
+
+    def arrival_minutes(self):
+        """Минуты от полуночи рабочей даты в часовом поясе компании"""
+        tz = get_company_timezone(self.company_id)
+        days, inverse = np.unique(self.work_date, return_inverse=True)
+        offsets = np.array([
+            datetime.combine(day.astype(object), time(12), tzinfo=tz).utcoffset().total_seconds()
+            for day in days
+        ], dtype=np.float64)
+        local = self.checkin + offsets[inverse] - self.work_date.astype(np.int64) * SECONDS_PER_DAY
+        return local / 60
+
+    def expected_hours(self):
+        """Часы по графику на дату строки; NaN, если графика нет"""
+        return expected_hours(self.schedule_id, self.weekday)
+
+    def overtime_hours(self):
+        """Переработка за день: часы сверх графика (без графика - NaN)"""
+        return np.maximum(self.hours - self.expected_hours(), 0)
+
+
+def load_columns(company_id, start, end, department_id=None, user_id=None):
+    """Сводки компании за период одним запросом values_list"""
+    summaries = AttendanceDailySummary.objects.filter(
+        company_id=company_id, work_date__range=(start, end)
+    )
+    if department_id:
+        summaries = summaries.filter(user__department_id=department_id)
+    if user_id:
+        summaries = summaries.filter(user_id=user_id)
+    rows = list(summaries.order_by().values_list(*COLUMNS))
+
+    count = len(rows)
+    user_ids, department_ids, schedule_ids, days, checkins, hours, late_minutes, is_late = (
+        zip(*rows) if rows else ([],) * len(COLUMNS)
+    )
+    return AttendanceColumns(
+        company_id=company_id,
+        user_id=np.fromiter(user_ids, dtype=np.int64, count=count),
+        department_id=np.fromiter((NULL_ID if v is None else v for v in department_ids), dtype=np.int64, count=count),
+        schedule_id=np.fromiter((NULL_ID if v is None else v for v in schedule_ids), dtype=np.int64, count=count),
+        work_date=np.array(days, dtype='datetime64[D]'),
+        checkin=np.fromiter((v.timestamp() for v in checkins), dtype=np.float64, count=count),
+        hours=np.fromiter(hours, dtype=np.float64, count=count),
+        late_minutes=np.fromiter(late_minutes, dtype=np.int32, count=count),
+        is_late=np.fromiter(is_late, dtype=bool, count=count),
+    )
+
+
+def department_names(department_ids):
+    return dict(Department.objects.filter(id__in=department_ids).values_list('id', 'name'))
+
+
+def _departments(columns):
+    """(id отделов, индекс отдела для каждой строки, названия)"""
+    ids, inverse = np.unique(columns.department_id, return_inverse=True)
+    names = department_names([i for i in ids.tolist() if i != NULL_ID])
+    return ids, inverse, names
+
+
+def _department_entry(department_id, names):
+    if department_id == NULL_ID:
+        return {'id': None, 'name': None}
+    return {'id': department_id, 'name': names.get(department_id)}
+
+
+def format_minutes(minutes):
+    minutes = int(round(minutes))
+    return f'{minutes // 60 % 24:02d}:{minutes % 60:02d}'
+
+
+def _percentile_entry(values, percentiles):
+    if not len(values):
+        return {'count': 0, 'minutes': [], 'values': []}
+    result = np.percentile(values, percentiles)
+    return {
+        'count': int(len(values)),
+        'minutes': [round(float(v), 1) for v in result],
+        'values': [format_minutes(v) for v in result],
+    }
+
+
+def arrival_percentiles(columns, percentiles=ARRIVAL_PERCENTILES):
+    """Перцентили времени прихода по компании и по отделам"""
+    minutes = columns.arrival_minutes()
+    ids, inverse, names = _departments(columns)
+    # Сортировка по отделу, затем по времени: группы - непрерывные срезы
+    order = np.lexsort((minutes, inverse))
+    bounds = np.searchsorted(inverse[order], np.arange(len(ids) + 1))
+    departments = []
+    for index, department_id in enumerate(ids.tolist()):
+        group = minutes[order[bounds[index]:bounds[index + 1]]]
+        departments.append({**_department_entry(department_id, names), **_percentile_entry(group, percentiles)})
+    return {
+        'percentiles': list(percentiles),
+        'overall': _percentile_entry(minutes, percentiles),
+        'departments': departments,
+    }
+
+
+def lateness_heatmap(columns):
+    """Опоздания по отделам и дням недели: число дней, опозданий, доля и средние минуты"""
+    ids, inverse, names = _departments(columns)
+    cells = inverse * 7 + (columns.weekday - 1)
+    size = len(ids) * 7
+    days = np.bincount(cells, minlength=size).reshape(len(ids), 7)
+    late = np.bincount(cells, weights=columns.is_late, minlength=size).reshape(len(ids), 7)
+    late_minutes = np.bincount(
+        cells, weights=np.where(columns.is_late, columns.late_minutes, 0), minlength=size
+    ).reshape(len(ids), 7)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        late_rate = np.where(days > 0, late / days, 0)
+        average = np.where(late > 0, late_minutes / late, 0)
+
+    return {
+        'weekdays': list(range(1, 8)),
+        'departments': [
+            {
+                **_department_entry(department_id, names),
+                'days': days[index].astype(int).tolist(),
+                'late': late[index].astype(int).tolist(),
+                'late_rate': np.round(late_rate[index], 3).tolist(),
+                'avg_late_minutes': np.round(average[index], 1).tolist(),
+            }
+            for index, department_id in enumerate(ids.tolist())
+        ]
+    }
+
+
+def overtime_histogram(columns, bins=OVERTIME_BINS):
+    """Гистограмма переработок (часы сверх графика за день) по отделам"""
+    overtime = columns.overtime_hours()
+    known = ~np.isnan(overtime)
+    ids, inverse, names = _departments(columns)
+    edges = np.asarray(bins, dtype=np.float64)
+    with_overtime = known & (overtime > 0)
+    bin_index = np.clip(np.searchsorted(edges, overtime, side='right') - 1, 0, len(edges) - 2)
+
+    size = len(ids) * (len(edges) - 1)
+    counts = np.bincount(
+        (inverse * (len(edges) - 1) + bin_index)[with_overtime], minlength=size
+    ).reshape(len(ids), len(edges) - 1)
+    totals = np.bincount(inverse[with_overtime], weights=overtime[with_overtime], minlength=len(ids))
+    days = np.bincount(inverse[known], minlength=len(ids))
+
+    return {
+        'bins': [float(edge) if np.isfinite(edge) else None for edge in edges],
+        'departments': [
+            {
+                **_department_entry(department_id, names),
+                'days': int(days[index]),
+                'overtime_days': int(counts[index].sum()),
+                'overtime_hours': round(float(totals[index]), 2),
+                'counts': counts[index].tolist(),
+            }
+            for index, department_id in enumerate(ids.tolist())
+        ]
+    }
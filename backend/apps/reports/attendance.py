@@ -0,0 +1,92 @@
+"""
+Отчет по посещаемости за период
+
+Строки по сотрудникам считаются в БД: LEFT JOIN на дневные сводки за период
+(FilteredRelation) и GROUP BY по сотруднику, отсутствия - подзапросом по
+штрафам за отсутствие (detect_absences). Результат читается через
+values_list().iterator(), а JSON отдается потоком: объект на сотрудника
+формируется по мере чтения, итоги считаются на лету и пишутся в конце.
+"""
+import json
+from decimal import Decimal
+from django.db.models import (
+    Count, Exists, FilteredRelation, IntegerField, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce
+from apps.attendance.models import AttendanceDailySummary
+from apps.requests.models import Penalty
+from apps.users.models import User
+
+CHUNK_SIZE = 2000
+
+
+def report_users(company_id, start, end, department_id=None, user_id=None):
+    """Сотрудники отчета: активные и уволенные, у которых есть отметки за период"""
+    summaries = AttendanceDailySummary.objects.filter(work_date__range=(start, end))
+    users = User.objects.filter(company_id=company_id)
+    if department_id:
+        users = users.filter(department_id=department_id)
+    if user_id:
+        users = users.filter(id=user_id)
+    return users.filter(
+        Q(is_active=True) | Exists(summaries.filter(user_id=OuterRef('pk')))
+    )
+
+
+def report_rows(users, start, end):
+    absences = Penalty.objects.filter(
+        user_id=OuterRef('pk'),
+        penalty_type='absence',
+        incident_date__range=(start, end),
+    ).order_by().values('user_id').annotate(count=Count('id')).values('count')
+
+    return users.annotate(
+        period=FilteredRelation(
+            'daily_summaries', condition=Q(daily_summaries__work_date__range=(start, end))
+        )
+    ).values('id').annotate(
+        days_worked=Count('period__id'),
+        total_hours=Coalesce(Sum('period__total_hours'), Value(Decimal('0'))),
+        late_count=Count('period__id', filter=Q(period__is_late=True)),
+        absent_count=Coalesce(Subquery(absences, output_field=IntegerField()), Value(0)),
+    ).values_list(
+        'id', 'first_name', 'last_name', 'days_worked', 'total_hours', 'late_count', 'absent_count'
+    ).order_by('last_name', 'first_name', 'id')
+
+
+def iter_report(users, start, end):
+    """JSON отчета частями: period, by_user (строка за строкой), summary"""
+    total_days = AttendanceDailySummary.objects.filter(
+        user__in=users, work_date__range=(start, end)
+    ).values('work_date').distinct().count()
+
+    period = {'start': start.isoformat(), 'end': end.isoformat()}
+    yield '{"period": ' + json.dumps(period) + ', "by_user": ['
+
+    days_worked = late_count = absent_count = 0
+    total_hours = Decimal('0')
+    separator = ''
+    for user_id, first_name, last_name, days, hours, late, absent in report_rows(users, start, end).iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        days_worked += days
+        total_hours += hours
+        late_count += late
+        absent_count += absent
+        yield separator + json.dumps({
+            'user_id': user_id,
+            'user_name': f'{first_name} {last_name}',
+            'days_worked': days,
+            'total_hours': float(hours),
+            'late_count': late,
+            'absent_count': absent,
+        }, ensure_ascii=False)
+        separator = ', '
+
+    summary = {
+        'total_days': total_days,
+        'average_hours_per_day': round(float(total_hours) / days_worked, 2) if days_worked else 0,
+        'total_late_count': late_count,
+        'total_absent_count': absent_count,
+    }
+    yield '], "summary": ' + json.dumps(summary) + '}'
@@ -0,0 +1,84 @@
+"""
+Кэш отчетов
+
+Ключ содержит компанию, отчет, нормализованные параметры и версию данных
+компании. Записи посещаемости, заявок, штрафов, ЗП и сотрудников увеличивают версию
+(bump_data_version из сигналов моделей и пакетных операций), поэтому после
+записи старые значения не читаются, а истекают сами по TTL. Пока данные
+не менялись, одинаковый запрос отчета - одно чтение из кэша.
+
+Версия общая для воркеров только в общем кэше (CACHE_BACKEND=redis): в
+памяти процесса запись в другом воркере ее не увеличит, поэтому там отчеты
+живут не дольше дашборда. Дашборд (текущий день) всегда с коротким TTL.
+"""
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+DASHBOARD_CACHE_TTL = 30  # секунд
+# Страховка от записей мимо bump_data_version (update() из shell)
+REPORT_CACHE_TTL = 3600 if settings.CACHE_BACKEND == 'redis' else DASHBOARD_CACHE_TTL
+
+
+def _version_key(company_id):
+    return f'reports:{company_id}:version'
+
+
+def data_version(company_id):
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        # Начальная версия из времени: после вытеснения ключа версии старые значения не совпадут
+        cache.add(_version_key(company_id), time.time_ns(), None)
+        version = cache.get(_version_key(company_id))
+    return version
+
+
+def bump_data_version(company_ids):
+    for company_id in set(company_ids):
+        try:
+            cache.incr(_version_key(company_id))
+        except ValueError:
+            # Версии еще нет: кэша компании тоже нет
+            pass
+
+
+def report_cache_key(company_id, endpoint, params):
+    """Ключ отчета; params - словарь, порядок ключей и None не важны"""
+    normalized = json.dumps(
+        {name: value for name, value in params.items() if value is not None},
+        sort_keys=True, default=str
+    )
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f'reports:{company_id}:{data_version(company_id)}:{endpoint}:{digest}'
+
+
+def cached_report(company_id, endpoint, params, build, timeout=REPORT_CACHE_TTL):
+    """Результат build() из кэша или вычисленный и сохраненный"""
+    key = report_cache_key(company_id, endpoint, params)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout)
+    return data
+
+
+def cached_stream(company_id, endpoint, params, build, timeout=REPORT_CACHE_TTL):
+    """
+    (тело из кэша, None) или (None, поток). Поток отдает части build() и
+    после последней сохраняет собранное тело в кэш.
+    """
+    key = report_cache_key(company_id, endpoint, params)
+    body = cache.get(key)
+    if body is not None:
+        return body, None
+
+    def stream():
+        parts = []
+        for part in build():
+            parts.append(part)
+            yield part
+        cache.set(key, ''.join(parts), timeout)
+
+    return None, stream()
@@ -0,0 +1,79 @@
+"""
+Дашборд посещаемости за день
+
+Все показатели считаются одним запросом: сотрудники компании с
+FilteredRelation на смены за день, GROUP BY по отделу и условные COUNT.
+Отсутствующие определяются так же, как в detect_absences: рабочий по графику
+день, нет отметки и нет утвержденного отпуска/больничного/выходного.
+"""
+from django.db.models import Count, Exists, FilteredRelation, OuterRef, Q
+from apps.requests.absences import LEAVE_REQUEST_TYPES, working_schedule_ids
+from apps.requests.models import Request
+from apps.users.models import User
+from .cache import DASHBOARD_CACHE_TTL, cached_report
+
+
+def dashboard_rows(company_id, day, department_id=None):
+    """Строки по отделам: total, present, active, late, absent"""
+    on_leave = Request.objects.filter(
+        user_id=OuterRef('pk'),
+        request_type__in=LEAVE_REQUEST_TYPES,
+        status='approved',
+        start_date__lte=day,
+    ).filter(Q(end_date__gte=day) | Q(end_date__isnull=True, start_date=day))
+    expected = (
+        Q(work_schedule_id__in=working_schedule_ids(company_id, day)) &
+        (Q(hire_date__isnull=True) | Q(hire_date__lte=day))
+    )
+
+    users = User.objects.filter(company_id=company_id, is_active=True)
+    if department_id:
+        users = users.filter(department_id=department_id)
+    return users.annotate(
+        day_sessions=FilteredRelation('attendances', condition=Q(attendances__work_date=day))
+    ).values('department_id', 'department__name').annotate(
+        total=Count('id', distinct=True),
+        present=Count('id', filter=Q(day_sessions__id__isnull=False), distinct=True),
+        active=Count(
+            'id', filter=Q(day_sessions__id__isnull=False, day_sessions__checkout_time__isnull=True), distinct=True
+        ),
+        late=Count('id', filter=Q(day_sessions__is_late=True), distinct=True),
+        absent=Count(
+            'id', filter=expected & Q(day_sessions__id__isnull=True) & ~Exists(on_leave), distinct=True
+        ),
+    ).order_by('department__name')
+
+
+def build_dashboard(company_id, day, department_id=None):
+    rows = list(dashboard_rows(company_id, day, department_id))
+    present = sum(row['present'] for row in rows)
+    active = sum(row['active'] for row in rows)
+    return {
+        'date': day.isoformat(),
+        'total_employees': sum(row['total'] for row in rows),
+        'checked_in': active,
+        'checked_out': present - active,
+        'on_break': 0,  # перерывы не отмечаются
+        'late_count': sum(row['late'] for row in rows),
+        'absent_count': sum(row['absent'] for row in rows),
+        'departments': [
+            {
+                'id': row['department_id'],
+                'name': row['department__name'],
+                'total': row['total'],
+                'active': row['active'],
+                'late': row['late'],
+                'absent': row['absent'],
+            }
+            for row in rows if row['department_id']
+        ]
+    }
+
+
+def get_dashboard(company_id, day, department_id=None):
+    """Дашборд из кэша отчетов (сбрасывается при записях данных компании, TTL DASHBOARD_CACHE_TTL)"""
+    return cached_report(
+        company_id, 'dashboard', {'date': day, 'department_id': department_id},
+        lambda: build_dashboard(company_id, day, department_id),
+        timeout=DASHBOARD_CACHE_TTL
+    )
@@ -0,0 +1,140 @@
+"""
+Фоновые задачи отчетов
+
+submit_job создает задачу или возвращает незавершенную задачу с теми же
+параметрами (уникальный params_hash среди pending/running, гонка решается
+ограничением БД). Воркер run_report_jobs забирает задачи через условный
+UPDATE, пишет результат потоком во временный файл в MEDIA_ROOT/reports/
+и обновляет прогресс каждые PROGRESS_EVERY строк. Задача, чей воркер
+перестал обновлять прогресс дольше STALE_AFTER, забирается заново.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.attendance.export import iter_export
+from apps.attendance.models import Attendance
+from .attendance import iter_report, report_users
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['pending', 'running']
+PROGRESS_EVERY = 1000  # строк
+STALE_AFTER = timedelta(minutes=10)
+
+# report_type -> (расширение, content type)
+RESULT_FORMATS = {
+    'attendance': ('json', 'application/json'),
+    'export': ('csv', 'text/csv; charset=utf-8'),
+}
+
+
+def params_hash(company_id, report_type, params):
+    payload = json.dumps([company_id, report_type, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def submit_job(company_id, user, report_type, params):
+    """(задача, created); одинаковая незавершенная задача переиспользуется"""
+    key = params_hash(company_id, report_type, params)
+    for _ in range(3):
+        existing = ReportJob.objects.filter(params_hash=key, status__in=ACTIVE_STATUSES).first()
+        if existing:
+            return existing, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    company_id=company_id,
+                    created_by=user,
+                    report_type=report_type,
+                    params=params,
+                    params_hash=key,
+                )
+            return job, True
+        except IntegrityError:
+            # Такую же задачу только что создал параллельный запрос
+            continue
+    raise IntegrityError('Не удалось создать задачу отчета')
+
+
+def claim_job(now=None):
+    """Следующая задача из очереди (или зависшая), помеченная running"""
+    now = now or timezone.now()
+    candidates = ReportJob.objects.filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=now - STALE_AFTER)
+    ).order_by('created_at').values_list('id', 'status', 'updated_at')[:10]
+    for job_id, job_status, updated_at in candidates:
+        # Условный UPDATE: задачу забирает только один воркер
+        claimed = ReportJob.objects.filter(id=job_id, status=job_status, updated_at=updated_at).update(
+            status='running', started_at=now, updated_at=now, progress=0, processed_rows=0
+        )
+        if claimed:
+            return ReportJob.objects.get(id=job_id)
+    return None
+
+
+def job_rows(job):
+    """(число строк, итератор частей файла) для параметров задачи"""
+    params = job.params
+    start = date.fromisoformat(params['start_date'])
+    end = date.fromisoformat(params['end_date'])
+    if job.report_type == 'attendance':
+        users = report_users(job.company_id, start, end, params.get('department_id'), params.get('user_id'))
+        return users.count(), iter_report(users, start, end)
+
+    queryset = Attendance.objects.filter(company_id=job.company_id, work_date__range=(start, end))
+    if params.get('department_id'):
+        queryset = queryset.filter(user__department_id=params['department_id'])
+    if params.get('user_id'):
+        queryset = queryset.filter(user_id=params['user_id'])
+    return queryset.count(), iter_export(queryset.order_by('-checkin_time'), 'csv')
+
+
+def result_path(job):
+    extension = RESULT_FORMATS[job.report_type][0]
+    return os.path.join('reports', str(job.company_id or 'none'), f'{job.report_type}-{job.id}.{extension}')
+
+
+def run_job(job):
+    """Строит отчет задачи в файл; ошибки сохраняются в задаче"""
+    try:
+        total, chunks = job_rows(job)
+        ReportJob.objects.filter(id=job.id).update(total_rows=total, updated_at=timezone.now())
+
+        name = result_path(job)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        processed = 0
+        with open(path + '.tmp', 'w', encoding='utf-8') as result:
+            for chunk in chunks:
+                result.write(chunk)
+                processed += 1
+                if processed % PROGRESS_EVERY == 0:
+                    ReportJob.objects.filter(id=job.id).update(
+                        processed_rows=min(processed, total),
+                        progress=min(processed * 100 // max(total, 1), 99),
+                        updated_at=timezone.now(),
+                    )
+        os.replace(path + '.tmp', path)
+
+        ReportJob.objects.filter(id=job.id).update(
+            status='done',
+            result=name,
+            processed_rows=total,
+            progress=100,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    except Exception as e:
+        logger.exception(f'Report job {job.id} failed')
+        ReportJob.objects.filter(id=job.id).update(
+            status='failed', error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    job.refresh_from_db()
+    return job
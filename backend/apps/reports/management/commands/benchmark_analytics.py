@@ -0,0 +1,178 @@
+"""
+Бенчмарк аналитики посещаемости
+Запуск: python manage.py benchmark_analytics --users 2000 --days 90
+
+Сравнивает NumPy (apps.reports.analytics) с расчетом через ORM: модели
+сводок с select_related для перцентилей прихода и переработок, агрегат
+GROUP BY по отделу и дню недели для опозданий. Проверяет, что результаты
+совпадают. Синтетические данные откатываются по завершении.
+"""
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractIsoWeekDay
+from django.utils import timezone
+from apps.attendance.models import AttendanceDailySummary
+from apps.departments.models import Department, WorkSchedule
+from apps.departments.schedules import get_schedules
+from apps.users.models import Company, User
+from apps.reports.analytics import (
+    ARRIVAL_PERCENTILES, OVERTIME_BINS, arrival_percentiles, lateness_heatmap, load_columns,
+    overtime_histogram
+)
+
+
+def python_percentile(values, percentile):
+    """Линейная интерполяция, как np.percentile по умолчанию"""
+    position = (len(values) - 1) * percentile / 100
+    low, high = math.floor(position), math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк аналитики посещаемости (NumPy vs ORM)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Количество сотрудников')
+        parser.add_argument('--days', type=int, default=90, help='Количество дней')
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=3, help='Количество замеров на вариант')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            company, start, end = self._create_data(options)
+
+            def numpy_reports():
+                columns = load_columns(company.id, start, end)
+                return arrival_percentiles(columns), lateness_heatmap(columns), overtime_histogram(columns)
+
+            def orm_reports():
+                return self._orm_arrivals(company, start, end), self._orm_lateness(company, start, end), \
+                    self._orm_overtime(company, start, end)
+
+            arrivals, lateness, overtime = numpy_reports()
+            orm_arrivals, orm_lateness, orm_overtime = orm_reports()
+            self._compare(arrivals, lateness, overtime, orm_arrivals, orm_lateness, orm_overtime)
+            self.stdout.write('Результаты NumPy и ORM совпадают\n')
+
+            for label, run in [('ORM', orm_reports), ('NumPy', numpy_reports)]:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(f'{label}: avg {statistics.mean(timings):.0f} ms, min {min(timings):.0f} ms')
+
+            transaction.set_rollback(True)
+
+    def _create_data(self, options):
+        users_count, days = options['users'], options['days']
+        self.stdout.write(f'Создание {users_count} сотрудников и {users_count * days} дневных сводок...')
+
+        company = Company.objects.create(name='Benchmark')
+        schedule = WorkSchedule.objects.create(
+            company=company, name='Benchmark', start_time='09:00', end_time='18:00',
+            break_duration=60, work_days=[1, 2, 3, 4, 5]
+        )
+        departments = Department.objects.bulk_create([
+            Department(company=company, name=f'Benchmark {i}') for i in range(options['departments'])
+        ])
+        users = User.objects.bulk_create([
+            User(
+                company=company,
+                department=departments[i % len(departments)],
+                work_schedule=schedule,
+                email=f'bench-analytics-{i}@benchmark.local',
+                first_name='Bench',
+                last_name=str(i),
+                password='!'
+            )
+            for i in range(users_count)
+        ])
+
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+        tz = timezone.get_current_timezone()
+        randomizer = random.Random(0)
+        batch = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            for user in users:
+                late_minutes = max(int(randomizer.gauss(0, 20)), 0)
+                first_checkin = datetime.combine(day, datetime.min.time(), tzinfo=tz) + timedelta(
+                    hours=9, minutes=late_minutes - randomizer.randint(0, 30)
+                )
+                batch.append(AttendanceDailySummary(
+                    user=user,
+                    company=company,
+                    work_date=day,
+                    first_checkin=first_checkin,
+                    last_checkout=first_checkin + timedelta(hours=9),
+                    total_hours=round(randomizer.uniform(6, 11), 2),
+                    sessions=1,
+                    is_late=late_minutes > 15,
+                    late_minutes=late_minutes,
+                ))
+        AttendanceDailySummary.objects.bulk_create(batch, batch_size=5000)
+        return company, start, end
+
+    def _summaries(self, company, start, end):
+        return AttendanceDailySummary.objects.filter(
+            company=company, work_date__range=(start, end)
+        ).select_related('user')
+
+    def _orm_arrivals(self, company, start, end):
+        by_department = defaultdict(list)
+        for summary in self._summaries(company, start, end):
+            local = timezone.localtime(summary.first_checkin)
+            by_department[summary.user.department_id].append(local.hour * 60 + local.minute + local.second / 60)
+        result = {}
+        for department_id, values in by_department.items():
+            values.sort()
+            result[department_id] = [python_percentile(values, p) for p in ARRIVAL_PERCENTILES]
+        return result
+
+    def _orm_lateness(self, company, start, end):
+        rows = AttendanceDailySummary.objects.filter(
+            company=company, work_date__range=(start, end)
+        ).values('user__department_id', weekday=ExtractIsoWeekDay('work_date')).annotate(
+            days=Count('id'),
+            late=Count('id', filter=Q(is_late=True)),
+            late_minutes=Sum('late_minutes', filter=Q(is_late=True)),
+        )
+        return {(row['user__department_id'], row['weekday']): (row['days'], row['late']) for row in rows}
+
+    def _orm_overtime(self, company, start, end):
+        schedules = {}
+        counts = defaultdict(lambda: [0] * (len(OVERTIME_BINS) - 1))
+        for summary in self._summaries(company, start, end):
+            schedule_id = summary.user.work_schedule_id
+            if schedule_id not in schedules:
+                schedules.update(get_schedules([schedule_id]))
+            overtime = float(summary.total_hours) - schedules[schedule_id].expected_minutes(summary.work_date) / 60
+            if overtime <= 0:
+                continue
+            for index in range(len(OVERTIME_BINS) - 1):
+                if OVERTIME_BINS[index] <= overtime < OVERTIME_BINS[index + 1]:
+                    counts[summary.user.department_id][index] += 1
+                    break
+        return dict(counts)
+
+    def _compare(self, arrivals, lateness, overtime, orm_arrivals, orm_lateness, orm_overtime):
+        for department in arrivals['departments']:
+            expected = orm_arrivals[department['id']]
+            if any(abs(a - round(b, 1)) > 0.05 for a, b in zip(department['minutes'], expected)):
+                raise CommandError(f'Перцентили прихода отличаются: отдел {department["id"]}')
+        for department in lateness['departments']:
+            for weekday, days, late in zip(lateness['weekdays'], department['days'], department['late']):
+                if days and orm_lateness.get((department['id'], weekday)) != (days, late):
+                    raise CommandError(f'Опоздания отличаются: отдел {department["id"]}, день {weekday}')
+        for department in overtime['departments']:
+            if department['counts'] != orm_overtime.get(department['id'], [0] * (len(OVERTIME_BINS) - 1)):
+                raise CommandError(f'Переработки отличаются: отдел {department["id"]}')
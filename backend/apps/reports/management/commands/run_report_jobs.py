@@ -0,0 +1,36 @@
+"""
+Воркер фоновых отчетов
+Запуск: python manage.py run_report_jobs [--once]
+
+Забирает задачи ReportJob из очереди по одной и пишет результаты в
+MEDIA_ROOT/reports/. Можно запускать несколько воркеров.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.reports.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи отчетов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2, help='Пауза при пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true', help='Выполнить очередь и завершиться')
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            job = run_job(job)
+            self.stdout.write(f'Задача {job.id} ({job.report_type}): {job.status}, строк {job.processed_rows}')
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
@@ -0,0 +1,70 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+class ReportJob(models.Model):
+    """
+    Фоновое построение отчета (команда run_report_jobs). Результат - файл
+    в MEDIA_ROOT/reports/. Одинаковые отчеты, заказанные одновременно,
+    сводятся к одной задаче: params_hash уникален среди незавершенных.
+    """
+    REPORT_TYPE_CHOICES = [
+        ('attendance', 'Отчет по посещаемости'),
+        ('export', 'Выгрузка посещаемости'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    company = models.ForeignKey(
+        'users.Company',
+        on_delete=models.CASCADE,
+        related_name='report_jobs',
+        null=True,
+        blank=True
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs'
+    )
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPE_CHOICES)
+    params = models.JSONField(default=dict)
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0)  # проценты
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    result = models.FileField(upload_to='reports/', null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'report_jobs'
+        verbose_name = 'Задача отчета'
+        verbose_name_plural = 'Задачи отчетов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_report_job'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.get_report_type_display()} #{self.id} ({self.status})'
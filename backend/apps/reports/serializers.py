@@ -0,0 +1,30 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'params', 'status', 'progress', 'total_rows', 'processed_rows',
+            'error', 'download_url', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        url = reverse('reports-job-download', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    department_id = serializers.IntegerField(required=False)
+    user_id = serializers.IntegerField(required=False)
@@ -0,0 +1,14 @@
+from django.urls import path
+from .views import (
+    AnalyticsView, AttendanceReportView, DashboardView,
+    ReportJobCreateView, ReportJobDetailView, ReportJobDownloadView
+)
+
+urlpatterns = [
+    path('dashboard/', DashboardView.as_view(), name='reports-dashboard'),
+    path('attendance/', AttendanceReportView.as_view(), name='reports-attendance'),
+    path('analytics/<str:metric>/', AnalyticsView.as_view(), name='reports-analytics'),
+    path('jobs/', ReportJobCreateView.as_view(), name='reports-job-create'),
+    path('jobs/<int:pk>/', ReportJobDetailView.as_view(), name='reports-job-detail'),
+    path('jobs/<int:pk>/download/', ReportJobDownloadView.as_view(), name='reports-job-download'),
+]
@@ -0,0 +1,293 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from apps.attendance.models import local_work_date
+from .analytics import arrival_percentiles, lateness_heatmap, load_columns, overtime_histogram
+from .attendance import iter_report, report_users
+from .cache import cached_report, cached_stream
+from .dashboard import get_dashboard
+from .jobs import RESULT_FORMATS, submit_job
+from .models import ReportJob
+from .serializers import ReportJobCreateSerializer, ReportJobSerializer
+
+
+def parse_report_date(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+class ReportScopeMixin:
+    """Компания и отдел отчета: руководитель видит свой отдел, администратор - любой"""
+
+    def get_scope(self, request, params=None):
+        """(company_id, department_id) или Response с ошибкой"""
+        params = request.query_params if params is None else params
+        user = request.user
+        company = getattr(request, 'company', None) or user.company
+        company_id = company.id if company else None
+        department_id = str(params.get('department_id') or '')
+        if user.role == 'manager':
+            if not user.department_id:
+                return Response({
+                    'error': {
+                        'code': 'NO_DEPARTMENT',
+                        'message': 'У руководителя не указан отдел'
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return company_id, user.department_id
+        if department_id:
+            if not department_id.isdigit():
+                return Response({
+                    'error': {
+                        'code': 'VALIDATION_ERROR',
+                        'message': 'Неверный department_id'
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return company_id, int(department_id)
+        return company_id, None
+
+    def get_user_filter(self, request, params=None):
+        """user_id отчета (сотрудник - всегда он сам) или Response с ошибкой"""
+        params = request.query_params if params is None else params
+        if request.user.role == 'employee':
+            return request.user.id
+        user_id = str(params.get('user_id') or '')
+        if not user_id:
+            return None
+        if not user_id.isdigit():
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Неверный user_id'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return int(user_id)
+
+    def get_period(self, request, company_id, params=None):
+        """(start, end) из start_date/end_date, по умолчанию с начала месяца по сегодня"""
+        params = request.query_params if params is None else params
+        today = local_work_date(timezone.now(), company_id)
+        start = params.get('start_date')
+        end = params.get('end_date')
+        start = parse_report_date(start) if start else today.replace(day=1)
+        end = parse_report_date(end) if end else today
+        if start is None or end is None:
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Неверный формат даты, используйте YYYY-MM-DD'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'end_date раньше start_date'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return start, end
+
+
+class DashboardView(ReportScopeMixin, APIView):
+    """Дашборд посещаемости за день (Manager/Admin), из кэша отчетов"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role == 'employee':
+            return Response({
+                'error': {
+                    'code': 'FORBIDDEN',
+                    'message': 'Недостаточно прав доступа'
+                }
+            }, status=status.HTTP_403_FORBIDDEN)
+        scope = self.get_scope(request)
+        if isinstance(scope, Response):
+            return scope
+        company_id, department_id = scope
+
+        day = request.query_params.get('date')
+        if day:
+            day = parse_report_date(day)
+            if day is None:
+                return Response({
+                    'error': {
+                        'code': 'VALIDATION_ERROR',
+                        'message': 'Неверный формат даты, используйте YYYY-MM-DD'
+                    }
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            day = local_work_date(timezone.now(), company_id)
+
+        return Response(get_dashboard(company_id, day, department_id))
+
+
+class AttendanceReportView(ReportScopeMixin, APIView):
+    """
+    Отчет по посещаемости за период по сотрудникам, отдается потоком
+    Сотрудник видит только себя, руководитель - свой отдел
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        scope = self.get_scope(request)
+        if isinstance(scope, Response):
+            return scope
+        company_id, department_id = scope
+        user_id = self.get_user_filter(request)
+        if isinstance(user_id, Response):
+            return user_id
+
+        period = self.get_period(request, company_id)
+        if isinstance(period, Response):
+            return period
+        start, end = period
+
+        users = report_users(company_id, start, end, department_id, user_id)
+        params = {'start': start, 'end': end, 'department_id': department_id, 'user_id': user_id}
+        body, stream = cached_stream(company_id, 'attendance', params, lambda: iter_report(users, start, end))
+        if body is not None:
+            return HttpResponse(body, content_type='application/json')
+        return StreamingHttpResponse(stream, content_type='application/json')
+
+
+class AnalyticsView(ReportScopeMixin, APIView):
+    """
+    Распределения посещаемости за период (Manager/Admin)
+    arrivals - перцентили прихода, lateness - опоздания по дням недели,
+    overtime - гистограмма переработок; по компании и отделам
+    """
+    permission_classes = [IsAuthenticated]
+    metrics = {
+        'arrivals': arrival_percentiles,
+        'lateness': lateness_heatmap,
+        'overtime': overtime_histogram,
+    }
+
+    def get(self, request, metric):
+        if request.user.role == 'employee':
+            return Response({
+                'error': {
+                    'code': 'FORBIDDEN',
+                    'message': 'Недостаточно прав доступа'
+                }
+            }, status=status.HTTP_403_FORBIDDEN)
+        if metric not in self.metrics:
+            return Response({
+                'error': {
+                    'code': 'NOT_FOUND',
+                    'message': 'Неизвестный отчет'
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+        scope = self.get_scope(request)
+        if isinstance(scope, Response):
+            return scope
+        company_id, department_id = scope
+        period = self.get_period(request, company_id)
+        if isinstance(period, Response):
+            return period
+        start, end = period
+
+        def build():
+            columns = load_columns(company_id, start, end, department_id)
+            return {
+                'period': {'start': start.isoformat(), 'end': end.isoformat()},
+                **self.metrics[metric](columns)
+            }
+
+        params = {'start': start, 'end': end, 'department_id': department_id}
+        return Response(cached_report(company_id, f'analytics:{metric}', params, build))
+
+
+class ReportJobMixin(ReportScopeMixin):
+    def get_job(self, request, pk):
+        """Задача в области видимости пользователя или None"""
+        user = request.user
+        company = getattr(request, 'company', None) or user.company
+        job = ReportJob.objects.filter(id=pk, company=company).first()
+        if job is None or user.role == 'admin':
+            return job
+        if user.role == 'manager':
+            return job if user.department_id and job.params.get('department_id') == user.department_id else None
+        return job if job.params.get('user_id') == user.id else None
+
+    def not_found(self):
+        return Response({
+            'error': {
+                'code': 'NOT_FOUND',
+                'message': 'Задача отчета не найдена'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
+
+
+class ReportJobCreateView(ReportJobMixin, APIView):
+    """
+    Заказ отчета в фоне: возвращает задачу (202), результат строит run_report_jobs
+    Одинаковый отчет, который уже строится, не запускается повторно
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        scope = self.get_scope(request, data)
+        if isinstance(scope, Response):
+            return scope
+        company_id, department_id = scope
+        user_id = self.get_user_filter(request, data)
+        if isinstance(user_id, Response):
+            return user_id
+        period = self.get_period(request, company_id, {
+            'start_date': request.data.get('start_date'),
+            'end_date': request.data.get('end_date'),
+        })
+        if isinstance(period, Response):
+            return period
+        start, end = period
+
+        params = {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'department_id': department_id,
+            'user_id': user_id,
+        }
+        job, created = submit_job(company_id, request.user, data['report_type'], params)
+        return Response(
+            {**ReportJobSerializer(job, context={'request': request}).data, 'deduplicated': not created},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ReportJobDetailView(ReportJobMixin, APIView):
+    """Статус и прогресс задачи отчета, ссылка на результат"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = self.get_job(request, pk)
+        if job is None:
+            return self.not_found()
+        return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+class ReportJobDownloadView(ReportJobMixin, APIView):
+    """Файл результата готовой задачи"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = self.get_job(request, pk)
+        if job is None or job.status != 'done' or not job.result:
+            return self.not_found()
+        extension, content_type = RESULT_FORMATS[job.report_type]
+        return FileResponse(
+            job.result.open('rb'),
+            as_attachment=True,
+            filename=f'{job.report_type}_{job.params["start_date"]}_{job.params["end_date"]}.{extension}',
+            content_type=content_type,
+        )
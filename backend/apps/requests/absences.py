@@ -0,0 +1,75 @@
+"""
+Выявление отсутствий и начисление штрафов
+
+Ожидаемые на работе за день - активные сотрудники компании, у графика
+которых этот день рабочий (скомпилированные графики, без запросов), принятые
+на работу не позже дня. Из них одним запросом (NOT EXISTS) исключаются те,
+у кого есть отметка за день, утвержденный отпуск/больничный/выходной или уже
+начисленный штраф за отсутствие. Штрафы создаются через bulk_create.
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from apps.attendance.models import Attendance
+from apps.departments.models import WorkSchedule
+from apps.departments.schedules import get_schedules
+from apps.reports.cache import bump_data_version
+from apps.salary.running import refresh_running_totals
+from apps.users.models import User
+from .models import Penalty, Request
+
+LEAVE_REQUEST_TYPES = ['vacation', 'sick_leave', 'day_off']
+
+
+def working_schedule_ids(company_id, day):
+    schedule_ids = WorkSchedule.objects.filter(company_id=company_id).values_list('id', flat=True)
+    return [
+        schedule_id for schedule_id, schedule in get_schedules(schedule_ids).items()
+        if schedule.is_work_day(day)
+    ]
+
+
+def absent_users(company_id, day):
+    """QuerySet сотрудников без отметки за рабочий день и без уважительной причины"""
+    leave = Request.objects.filter(
+        user_id=OuterRef('pk'),
+        request_type__in=LEAVE_REQUEST_TYPES,
+        status='approved',
+        start_date__lte=day,
+    ).filter(Q(end_date__gte=day) | Q(end_date__isnull=True, start_date=day))
+
+    return User.objects.filter(
+        Q(hire_date__isnull=True) | Q(hire_date__lte=day),
+        company_id=company_id,
+        is_active=True,
+        work_schedule_id__in=working_schedule_ids(company_id, day),
+    ).exclude(
+        Exists(Attendance.objects.filter(user_id=OuterRef('pk'), work_date=day))
+    ).exclude(
+        Exists(leave)
+    ).exclude(
+        Exists(Penalty.objects.filter(user_id=OuterRef('pk'), penalty_type='absence', incident_date=day))
+    )
+
+
+def create_absence_penalties(company_id, day, amount=None, batch_size=5000):
+    """Начисляет штрафы за отсутствие за день. Повторный запуск не создает дублей."""
+    amount = Decimal(settings.ABSENCE_PENALTY_AMOUNT if amount is None else amount)
+    description = f'Отсутствие {day:%d.%m.%Y}'
+    user_ids = list(absent_users(company_id, day).values_list('id', flat=True))
+    for i in range(0, len(user_ids), batch_size):
+        Penalty.objects.bulk_create([
+            Penalty(
+                user_id=user_id,
+                penalty_type='absence',
+                amount=amount,
+                description=description,
+                period=day.replace(day=1),
+                incident_date=day,
+            )
+            for user_id in user_ids[i:i + batch_size]
+        ], ignore_conflicts=True)
+    if user_ids:
+        bump_data_version([company_id])
+        refresh_running_totals([(user_id, day) for user_id in user_ids])
+    return len(user_ids)
@@ -11,7 +11,7 @@ class RequestAdmin(admin.ModelAdmin):
 
 @admin.register(Penalty)
 class PenaltyAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'penalty_type', 'amount', 'period', 'status', 'created_at']
+    list_display = ['id', 'user', 'penalty_type', 'amount', 'period', 'incident_date', 'status', 'created_at']
     list_filter = ['penalty_type', 'status', 'period']
     search_fields = ['user__first_name', 'user__last_name', 'description']
 
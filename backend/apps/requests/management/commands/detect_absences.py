@@ -0,0 +1,65 @@
+"""
+Выявление отсутствий и начисление штрафов (ежедневно ночью, cron)
+Запуск: python manage.py detect_absences [--date 2024-01-15 | --start-date ... --end-date ...] [--company-id 1]
+
+По умолчанию обрабатывается вчерашний день в часовом поясе каждой компании.
+Повторный запуск за тот же день не создает дублей.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.requests.absences import absent_users, create_absence_penalties
+from apps.users.models import Company, get_company_timezone
+
+
+class Command(BaseCommand):
+    help = 'Выявляет отсутствия за день и начисляет штрафы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='YYYY-MM-DD, по умолчанию вчера')
+        parser.add_argument('--start-date', help='YYYY-MM-DD, начало периода')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, конец периода (включительно)')
+        parser.add_argument('--company-id', type=int)
+        parser.add_argument('--amount', help='Сумма штрафа, по умолчанию ABSENCE_PENALTY_AMOUNT')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать отсутствующих')
+
+    def handle(self, *args, **options):
+        try:
+            start = self._parse(options['date'] or options['start_date'])
+            end = self._parse(options['date'] or options['end_date']) or start
+        except ValueError:
+            raise CommandError('Неверный формат даты, используйте YYYY-MM-DD')
+        if start and end < start:
+            raise CommandError('end-date раньше start-date')
+        try:
+            amount = Decimal(options['amount']) if options['amount'] else None
+        except InvalidOperation:
+            raise CommandError('Неверная сумма штрафа')
+
+        companies = Company.objects.filter(is_active=True)
+        if options['company_id']:
+            companies = companies.filter(id=options['company_id'])
+
+        total = 0
+        for company_id in companies.values_list('id', flat=True):
+            if start:
+                days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+            else:
+                days = [timezone.localtime(timezone.now(), get_company_timezone(company_id)).date() - timedelta(days=1)]
+
+            for day in days:
+                if options['dry_run']:
+                    count = absent_users(company_id, day).count()
+                else:
+                    with transaction.atomic():
+                        count = create_absence_penalties(company_id, day, amount)
+                self.stdout.write(f'Компания {company_id}, {day}: отсутствий {count}')
+                total += count
+
+        action = 'Найдено' if options['dry_run'] else 'Начислено штрафов за отсутствие'
+        self.stdout.write(self.style.SUCCESS(f'{action}: {total}'))
+
+    def _parse(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
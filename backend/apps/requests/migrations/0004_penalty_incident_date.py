@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0003_request_requests_created_b1759c_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='penalty',
+            name='incident_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='penalty',
+            constraint=models.UniqueConstraint(condition=models.Q(('penalty_type', 'absence')), fields=('user', 'incident_date'), name='unique_absence_penalty_per_day'),
+        ),
+    ]
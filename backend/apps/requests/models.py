@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.reports.cache import bump_data_version
 
 User = get_user_model()
 
@@ -46,12 +49,23 @@ class Request(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['start_date', 'end_date']),
+            models.Index(fields=['created_at', 'id']),
         ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f'{self.user} - {self.get_request_type_display()}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._running_state = instance.running_state()
+        return instance
+
+    def running_state(self):
+        """(user_id, request_type, start_date): от них зависят текущие итоги ЗП (авансы)"""
+        return tuple(self.__dict__.get(field) for field in ('user_id', 'request_type', 'start_date'))
+
 
 class Penalty(models.Model):
     PENALTY_TYPE_CHOICES = [
@@ -76,6 +90,7 @@ class Penalty(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(null=True, blank=True)
     period = models.DateField()  # период начисления (год-месяц)
+    incident_date = models.DateField(null=True, blank=True)  # день нарушения (для отсутствий)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_by = models.ForeignKey(
         User,
@@ -90,9 +105,70 @@ class Penalty(models.Model):
         db_table = 'penalties'
         verbose_name = 'Штраф'
         verbose_name_plural = 'Штрафы'
+        constraints = [
+            # Не больше одного штрафа за отсутствие в день (повторный запуск detect_absences)
+            models.UniqueConstraint(
+                fields=['user', 'incident_date'],
+                condition=models.Q(penalty_type='absence'),
+                name='unique_absence_penalty_per_day'
+            ),
+        ]
         indexes = [
             models.Index(fields=['user', 'period']),
         ]
 
     def __str__(self):
         return f'{self.user} - {self.get_penalty_type_display()} - {self.amount}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._running_state = instance.running_state()
+        return instance
+
+    def running_state(self):
+        """(user_id, period): ключ текущих итогов ЗП штрафа"""
+        return tuple(self.__dict__.get(field) for field in ('user_id', 'period'))
+
+
+@receiver([post_save, post_delete], sender=Request)
+@receiver([post_save, post_delete], sender=Penalty)
+def bump_report_version(sender, instance, **kwargs):
+    bump_data_version([instance.user.company_id])
+
+
+def deleted_with_user(origin):
+    """Каскадное удаление от сотрудника или компании: итоги ЗП удаляются вместе с ним"""
+    return origin is not None and getattr(origin, 'model', type(origin)) not in (Penalty, Request)
+
+
+def running_states(instance):
+    """
+    Текущее и загруженное из БД состояние записи: изменение сотрудника,
+    периода или типа заявки пересчитывает итоги и старого, и нового ключа
+    """
+    previous = getattr(instance, '_running_state', None)
+    instance._running_state = instance.running_state()
+    return {previous, instance._running_state} - {None}
+
+
+@receiver([post_save, post_delete], sender=Penalty)
+def refresh_penalty_running_totals(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin):
+        return
+    # apps.salary импортирует эти модели - импорт здесь, не на уровне модуля
+    from apps.salary.running import refresh_running_totals
+    refresh_running_totals(running_states(instance))
+
+
+@receiver([post_save, post_delete], sender=Request)
+def refresh_advance_running_totals(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin):
+        return
+    from apps.salary.running import advance_keys, refresh_running_totals
+    keys = []
+    for user_id, request_type, start_date in running_states(instance):
+        if request_type == 'advance' and start_date:
+            keys += advance_keys(user_id, start_date)
+    if keys:
+        refresh_running_totals(keys)
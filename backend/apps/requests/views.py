@@ -6,6 +6,7 @@ from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from config.mixins import TenantFilterMixin
+from config.pagination import HybridPagination
 from .models import Request
 from .serializers import (
     RequestSerializer, RequestApproveSerializer, RequestRejectSerializer
@@ -22,6 +23,7 @@ class RequestListCreateView(TenantFilterMixin, generics.ListCreateAPIView):
     queryset = Request.objects.all()
     serializer_class = RequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HybridPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['user', 'status', 'request_type']
     search_fields = ['reason']
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Salary, SalaryCalculation
+from .models import PayrollRun, Salary, SalaryCalculation, SalaryRunningTotal
 
 
 @admin.register(Salary)
@@ -14,3 +14,15 @@ class SalaryCalculationAdmin(admin.ModelAdmin):
     list_display = ['id', 'salary', 'calculation_type', 'amount', 'created_at']
     list_filter = ['calculation_type']
 
+
+@admin.register(SalaryRunningTotal)
+class SalaryRunningTotalAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'period', 'hours', 'penalties_amount', 'advances_amount', 'updated_at']
+    list_filter = ['period']
+    search_fields = ['user__first_name', 'user__last_name']
+
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'company', 'department', 'period', 'status', 'completed_chunks', 'processed_users', 'created_at']
+    list_filter = ['status', 'period']
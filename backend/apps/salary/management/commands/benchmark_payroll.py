@@ -0,0 +1,158 @@
+"""
+Бенчмарк расчета ЗП
+Запуск: python manage.py benchmark_payroll --users 50000 --departments 100 --processes 4
+
+Сравнивает расчет в одном процессе (PayrollEngine.run) с расчетом по
+отделам в пуле процессов (run_parallel) на синтетической компании и
+проверяет, что ЗП совпадают. Отдельно замеряется фаза compute: запись
+всегда идет в одном процессе, поэтому ускорение ограничено долей чтения
+и арифметики. Процессы читают данные через свои соединения, поэтому
+синтетические данные коммитятся и удаляются по завершении.
+"""
+import os
+import random
+import statistics
+import time
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.attendance.models import AttendanceDailySummary
+from apps.departments.models import Department
+from apps.requests.models import Penalty, Request
+from apps.users.models import Company, User
+from apps.salary.models import Salary, SalaryCalculation
+from apps.salary.payroll import SHARDS_PER_PROCESS, PayrollEngine, department_shards, period_bounds
+from apps.salary.runs import scope_users
+
+SNAPSHOT_FIELDS = ['user_id', 'base_hours', 'base_amount', 'penalties_amount', 'advances_amount', 'total_amount']
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк расчета ЗП (один процесс vs пул процессов по отделам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help='Количество сотрудников')
+        parser.add_argument('--departments', type=int, default=100)
+        parser.add_argument('--days', type=int, default=22, help='Рабочих дней со сводками в месяце')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=2, help='Количество замеров на вариант')
+
+    def handle(self, *args, **options):
+        company, period = self._create_data(options)
+        try:
+            engine = PayrollEngine(period)
+            users = scope_users(company.id)
+            processes = options['processes']
+            self.stdout.write(f'CPU: {os.cpu_count()}, процессов в пуле: {processes}')
+
+            def parallel_compute():
+                shards = department_shards(users, processes * SHARDS_PER_PROCESS)
+                return [line for _, lines in engine.compute_shards(shards, processes) for line in lines]
+
+            self._measure('compute, 1 процесс', lambda: engine.compute(users), options['repeat'])
+            self._measure(f'compute, {processes} процессов', parallel_compute, options['repeat'])
+
+            snapshots = []
+            for label, run in [
+                ('расчет, 1 процесс', lambda: engine.run(users)),
+                (f'расчет, {processes} процессов', lambda: engine.run_parallel(users, processes)),
+            ]:
+                self._measure(label, run, options['repeat'], before=lambda: self._clear_salaries(company))
+                snapshots.append(self._snapshot(company, period))
+
+            if snapshots[0] != snapshots[1]:
+                raise CommandError('Результаты расчета в одном процессе и в пуле отличаются')
+            self.stdout.write(f'Результаты совпадают ({len(snapshots[0]["salaries"])} ЗП)')
+        finally:
+            self.stdout.write('Удаление синтетических данных...')
+            self._clear_salaries(company)
+            company.delete()
+
+    def _measure(self, label, run, repeat, before=None):
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f'{label}: avg {statistics.mean(timings):.2f} s, min {min(timings):.2f} s')
+
+    @transaction.atomic
+    def _create_data(self, options):
+        users_count, days = options['users'], options['days']
+        self.stdout.write(f'Создание {users_count} сотрудников и {users_count * days} дневных сводок...')
+
+        period = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        start, end = period_bounds(period)
+        work_days = [
+            start + timedelta(days=offset) for offset in range((end - start).days + 1)
+            if (start + timedelta(days=offset)).isoweekday() <= 5
+        ][:days]
+
+        company = Company.objects.create(name='Benchmark payroll')
+        departments = Department.objects.bulk_create([
+            Department(company=company, name=f'Benchmark {i}') for i in range(options['departments'])
+        ])
+        randomizer = random.Random(0)
+        tz = timezone.get_current_timezone()
+        users = User.objects.bulk_create([
+            User(
+                company=company,
+                department=departments[i % len(departments)],
+                email=f'bench-payroll-{i}@benchmark.local',
+                first_name='Bench',
+                last_name=str(i),
+                password='!',
+                salary_type='fixed' if i % 5 == 0 else 'hourly',
+                fixed_salary=Decimal('3000.00') if i % 5 == 0 else None,
+                hourly_rate=None if i % 5 == 0 else Decimal(randomizer.randint(20, 60)),
+            )
+            for i in range(users_count)
+        ], batch_size=5000)
+
+        summaries = []
+        for user in users:
+            for day in work_days:
+                hours = round(randomizer.uniform(6, 10), 2)
+                first_checkin = datetime.combine(day, day_time(9), tzinfo=tz)
+                summaries.append(AttendanceDailySummary(
+                    user=user,
+                    company=company,
+                    work_date=day,
+                    first_checkin=first_checkin,
+                    last_checkout=first_checkin + timedelta(hours=hours),
+                    total_hours=hours,
+                    sessions=1,
+                ))
+            if len(summaries) >= 50000:
+                AttendanceDailySummary.objects.bulk_create(summaries, batch_size=5000)
+                summaries = []
+        AttendanceDailySummary.objects.bulk_create(summaries, batch_size=5000)
+
+        Penalty.objects.bulk_create([
+            Penalty(user=user, penalty_type='violation', amount=Decimal('50.00'), period=period)
+            for user in users[::10]
+        ], batch_size=5000)
+        Request.objects.bulk_create([
+            Request(
+                user=user, request_type='advance', start_date=start, amount=Decimal('500.00'), status='approved'
+            )
+            for user in users[::20]
+        ], batch_size=5000)
+        return company, period
+
+    def _clear_salaries(self, company):
+        SalaryCalculation.objects.filter(salary__user__company=company).delete()
+        Salary.objects.filter(user__company=company).delete()
+
+    def _snapshot(self, company, period):
+        salaries = Salary.objects.filter(user__company=company, period=period)
+        return {
+            'salaries': sorted(salaries.values_list(*SNAPSHOT_FIELDS)),
+            'calculations': sorted(SalaryCalculation.objects.filter(salary__in=salaries).values_list(
+                'salary__user_id', 'calculation_type', 'description', 'amount'
+            )),
+        }
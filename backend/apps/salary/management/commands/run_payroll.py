@@ -0,0 +1,41 @@
+"""
+Воркер фонового расчета ЗП
+Запуск: python manage.py run_payroll [--once] [--processes N]
+
+Забирает расчеты PayrollRun из очереди и считает их по отделам. Расчет,
+прерванный падением воркера, продолжается с последнего отдела. С --processes
+(по умолчанию PAYROLL_PROCESSES) отделы считаются в N процессах.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.salary.runs import claim_run, process_run
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые расчеты ЗП'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2, help='Пауза при пустой очереди, секунды')
+        parser.add_argument('--once', action='store_true', help='Выполнить очередь и завершиться')
+        parser.add_argument('--processes', type=int, default=None, help='Процессов для расчета отделов')
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            close_old_connections()
+            run = claim_run()
+            if run is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            run = process_run(run, options['processes'])
+            self.stdout.write(
+                f'Расчет {run.id} ({run.period:%Y-%m}): {run.status}, '
+                f'сотрудников {run.processed_users}/{run.total_users}'
+            )
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Выполнено расчетов: {done}'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salary', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salary',
+            index=models.Index(fields=['created_at', 'id'], name='salaries_created_a8b176_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:40
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('salary', '0004_payrollrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryRunningTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('penalties_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('advances_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salary_running_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Текущие итоги ЗП',
+                'verbose_name_plural': 'Текущие итоги ЗП',
+                'db_table': 'salary_running_totals',
+                'unique_together': {('user', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:43
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salary', '0005_salaryrunningtotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salaryrunningtotal',
+            name='overtime_hours',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8),
+        ),
+    ]
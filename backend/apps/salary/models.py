@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.reports.cache import bump_data_version
 from decimal import Decimal
 
 User = get_user_model()
@@ -38,6 +41,7 @@ class Salary(models.Model):
         unique_together = ['user', 'period']
         indexes = [
             models.Index(fields=['user', 'period']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
@@ -56,3 +60,109 @@ class SalaryCalculation(models.Model):
         verbose_name = 'Детализация расчета ЗП'
         verbose_name_plural = 'Детализация расчета ЗП'
 
+
+class SalaryRunningTotal(models.Model):
+    """
+    Текущие итоги ЗП сотрудника за месяц: часы, переработки, штрафы и авансы по тем же
+    правилам, что и расчет ЗП. Пересчитываются по затронутым (сотрудник, месяц)
+    при закрытии смен, изменении штрафов и авансов (apps.salary.running),
+    поэтому расчет одного сотрудника и "заработано на сегодня" - одно чтение.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='salary_running_totals')
+    period = models.DateField()  # первое число месяца
+    hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    penalties_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    advances_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'salary_running_totals'
+        verbose_name = 'Текущие итоги ЗП'
+        verbose_name_plural = 'Текущие итоги ЗП'
+        unique_together = ['user', 'period']
+
+    def __str__(self):
+        return f'{self.user} - {self.period}'
+
+
+class PayrollRun(models.Model):
+    """
+    Фоновый расчет ЗП за период (команда run_payroll). Сотрудники
+    обрабатываются по отделам; completed_chunks - контрольная точка, после
+    сбоя расчет продолжается со следующего отдела.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    company = models.ForeignKey(
+        'users.Company',
+        on_delete=models.CASCADE,
+        related_name='payroll_runs',
+        null=True,
+        blank=True
+    )
+    department = models.ForeignKey(
+        'departments.Department',
+        on_delete=models.CASCADE,
+        related_name='payroll_runs',
+        null=True,
+        blank=True
+    )  # None - вся компания
+    period = models.DateField()  # первое число месяца
+    # company:department:period - NULL в уникальном индексе не совпадают, поэтому ключ строкой
+    scope_key = models.CharField(max_length=64)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payroll_runs'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    chunks = models.JSONField(default=list)  # id отделов (null - без отдела) в порядке обработки
+    completed_chunks = models.PositiveIntegerField(default=0)
+    total_users = models.PositiveIntegerField(default=0)
+    processed_users = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'payroll_runs'
+        verbose_name = 'Расчет ЗП'
+        verbose_name_plural = 'Расчеты ЗП'
+        constraints = [
+            # Один незавершенный расчет на компанию, отдел и период
+            models.UniqueConstraint(
+                fields=['scope_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_payroll_run'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.chunks:
+            return 0
+        return self.completed_chunks * 100 // len(self.chunks)
+
+    def __str__(self):
+        return f'{self.company} - {self.period} ({self.status})'
+
+
+@receiver([post_save, post_delete], sender=Salary)
+def bump_report_version(sender, instance, **kwargs):
+    bump_data_version([instance.user.company_id])
@@ -0,0 +1,47 @@
+"""
+Переработки по графикам работы (NumPy)
+
+Дневные сводки всех сотрудников расчета за месяц читаются одним запросом
+values_list в колонки. Переработка дня - часы сверх ожидаемых по графику
+сотрудника (начало-конец смены без перерыва в рабочий день, 0 в выходной),
+считается векторно по таблице [график, день недели] скомпилированных
+графиков и суммируется по сотруднику через np.bincount. Запросов на
+сотрудника нет; сотрудники без графика переработок не имеют.
+"""
+from decimal import Decimal
+import numpy as np
+from apps.attendance.models import AttendanceDailySummary
+from apps.departments.schedules import NO_SCHEDULE, expected_hours, iso_weekdays
+
+
+def daily_overtime(schedule_ids, days, hours):
+    """Переработка за каждый день (массивы одной длины); без графика - 0"""
+    overtime = hours - expected_hours(schedule_ids, iso_weekdays(days))
+    # NaN (нет графика) > 0 - False
+    return np.where(overtime > 0, overtime, 0)
+
+
+def overtime_hours(user_ids, start, end):
+    """{user_id: часы переработки} за период; user_ids - список или подзапрос"""
+    rows = list(AttendanceDailySummary.objects.filter(
+        user_id__in=user_ids,
+        work_date__gte=start,
+        work_date__lte=end
+    ).order_by().values_list('user_id', 'user__work_schedule_id', 'work_date', 'total_hours'))
+    if not rows:
+        return {}
+
+    count = len(rows)
+    users, schedules, days, hours = zip(*rows)
+    user_column = np.fromiter(users, dtype=np.int64, count=count)
+    overtime = daily_overtime(
+        np.fromiter((NO_SCHEDULE if v is None else v for v in schedules), dtype=np.int64, count=count),
+        np.array(days, dtype='datetime64[D]'),
+        np.fromiter(hours, dtype=np.float64, count=count),
+    )
+    ids, inverse = np.unique(user_column, return_inverse=True)
+    totals = np.round(np.bincount(inverse, weights=overtime, minlength=len(ids)), 2)
+    return {
+        user_id: Decimal(f'{value:.2f}')
+        for user_id, value in zip(ids.tolist(), totals.tolist()) if value > 0
+    }
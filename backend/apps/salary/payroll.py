@@ -0,0 +1,289 @@
+"""
+Расчет ЗП за период для набора сотрудников
+
+Часы, штрафы и авансы всех сотрудников читаются тремя запросами с GROUP BY
+по сотруднику, переработки - одним запросом дневных сводок (apps.salary.overtime),
+ЗП и детализация пишутся пакетно (bulk_create/bulk_update)
+в одной транзакции. Число запросов не зависит от числа сотрудников.
+
+Расчет разделен на compute (чтение и арифметика, строки PayrollLine) и
+write (одна фаза записи). Для крупных компаний compute выполняется по
+отделам в пуле процессов (run_parallel, PAYROLL_PROCESSES), у каждого
+процесса свое соединение с БД; запись остается в вызывающем процессе.
+
+Правила те же, что были в SalaryCalculateView: часы - сумма дневных сводок
+за месяц, штрафы - активные штрафы периода, авансы - все утвержденные
+авансы с датой не позже конца месяца. Часы сверх графика почасовым
+сотрудникам оплачиваются по ставке с коэффициентом OVERTIME_RATE_MULTIPLIER,
+в их base_hours входят только часы в пределах графика. Оклад от часов не
+зависит: у сотрудников с фиксированной ЗП переработки только учитываются.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+from apps.attendance.models import AttendanceDailySummary
+from apps.reports.cache import bump_data_version
+from apps.requests.models import Penalty, Request
+from apps.users.models import User
+from .models import Salary, SalaryCalculation
+from .overtime import overtime_hours
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+WRITE_BATCH_SIZE = 1000
+SHARDS_PER_PROCESS = 2  # шарды меньше - ровнее загрузка, больше - меньше накладных расходов
+SALARY_UPDATE_FIELDS = [
+    'base_hours', 'base_amount', 'overtime_hours', 'overtime_amount',
+    'penalties_amount', 'advances_amount', 'total_amount', 'updated_at',
+]
+
+
+def period_bounds(period_date):
+    """Первый и последний день месяца period_date"""
+    start_date = period_date.replace(day=1)
+    if start_date.month == 12:
+        end_date = start_date.replace(year=start_date.year + 1, month=1) - timedelta(days=1)
+    else:
+        end_date = start_date.replace(month=start_date.month + 1) - timedelta(days=1)
+    return start_date, end_date
+
+
+@dataclass
+class PayrollLine:
+    """Рассчитанные суммы сотрудника (без сохранения; передается между процессами)"""
+    user_id: int
+    company_id: int
+    base_hours: Decimal
+    base_amount: Decimal
+    base_description: str
+    overtime_hours: Decimal
+    overtime_amount: Decimal
+    overtime_description: str
+    penalties_amount: Decimal
+    advances_amount: Decimal
+
+    @property
+    def total_amount(self):
+        return self.base_amount + self.overtime_amount - self.penalties_amount - self.advances_amount
+
+
+@dataclass
+class PayrollResult:
+    salaries: list
+    created: int
+
+
+class PayrollEngine:
+    def __init__(self, period_date):
+        self.period = period_date.replace(day=1)
+        self.start_date, self.end_date = period_bounds(self.period)
+
+    def _user_ids(self, users):
+        # QuerySet уходит в SQL подзапросом, список (сотрудников или id) - IN (...)
+        if isinstance(users, QuerySet):
+            return users.values('id')
+        return [getattr(user, 'id', user) for user in users]
+
+    def totals(self, users):
+        """{user_id: сумма} для часов, переработок, штрафов и авансов - по запросу на каждое"""
+        user_ids = self._user_ids(users)
+        hours = AttendanceDailySummary.objects.filter(
+            user_id__in=user_ids,
+            work_date__gte=self.start_date,
+            work_date__lte=self.end_date
+        ).values('user_id').annotate(total=Sum('total_hours')).values_list('user_id', 'total')
+        penalties = Penalty.objects.filter(
+            user_id__in=user_ids,
+            period=self.period,
+            status='active'
+        ).values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total')
+        advances = Request.objects.filter(
+            user_id__in=user_ids,
+            request_type='advance',
+            status='approved',
+            start_date__lte=self.end_date
+        ).values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total')
+        overtime = overtime_hours(user_ids, self.start_date, self.end_date)
+        return dict(hours), overtime, dict(penalties), dict(advances)
+
+    def compute(self, users):
+        """Суммы по сотрудникам: чтение и арифметика, без записи"""
+        hours, overtime, penalties, advances = self.totals(users)
+        return [
+            self.line(user, hours.get(user.id), overtime.get(user.id), penalties.get(user.id), advances.get(user.id))
+            for user in users
+        ]
+
+    def line(self, user, hours, overtime, penalties, advances):
+        """Суммы сотрудника по его часам, переработкам, штрафам и авансам за период"""
+        overtime = overtime or ZERO
+        if user.salary_type == 'fixed':
+            base_amount = user.fixed_salary or ZERO
+            base_hours = ZERO
+            # Оклад покрывает любые часы: переработка учитывается, но не оплачивается
+            overtime_rate = ZERO
+        else:
+            # Переработка оплачивается отдельно, в базе - часы по графику
+            base_hours = (hours or ZERO) - overtime
+            base_amount = base_hours * (user.hourly_rate or ZERO)
+            overtime_rate = ((user.hourly_rate or ZERO) * Decimal(settings.OVERTIME_RATE_MULTIPLIER)).quantize(CENT)
+        return PayrollLine(
+            user_id=user.id,
+            company_id=user.company_id,
+            base_hours=base_hours,
+            base_amount=base_amount,
+            base_description=f'Отработанные часы ({base_hours} ч × {user.hourly_rate or 0} руб)',
+            overtime_hours=overtime,
+            overtime_amount=(overtime * overtime_rate).quantize(CENT),
+            overtime_description=f'Переработки ({overtime} ч × {overtime_rate} руб)',
+            penalties_amount=penalties or ZERO,
+            advances_amount=advances or ZERO,
+        )
+
+    def apply(self, salary, line):
+        """Заполняет ЗП и возвращает строки детализации (без сохранения)"""
+        salary.base_hours = line.base_hours
+        salary.base_amount = line.base_amount
+        salary.overtime_hours = line.overtime_hours
+        salary.overtime_amount = line.overtime_amount
+        salary.penalties_amount = line.penalties_amount
+        salary.advances_amount = line.advances_amount
+        salary.total_amount = line.total_amount
+
+        calculations = [SalaryCalculation(
+            salary=salary,
+            calculation_type='base',
+            description=line.base_description,
+            amount=line.base_amount
+        )]
+        if line.overtime_amount > 0:
+            calculations.append(SalaryCalculation(
+                salary=salary,
+                calculation_type='overtime',
+                description=line.overtime_description,
+                amount=line.overtime_amount
+            ))
+        if line.penalties_amount > 0:
+            calculations.append(SalaryCalculation(
+                salary=salary,
+                calculation_type='penalty',
+                description='Штрафы',
+                amount=-line.penalties_amount
+            ))
+        if line.advances_amount > 0:
+            calculations.append(SalaryCalculation(
+                salary=salary,
+                calculation_type='advance',
+                description='Авансы',
+                amount=-line.advances_amount
+            ))
+        return calculations
+
+    def write(self, lines):
+        """Одна фаза записи: ЗП и детализация пакетами в транзакции"""
+        if not lines:
+            return PayrollResult(salaries=[], created=0)
+        user_ids = [line.user_id for line in lines]
+
+        with transaction.atomic():
+            existing = {}
+            for i in range(0, len(user_ids), WRITE_BATCH_SIZE):
+                existing.update(
+                    (salary.user_id, salary)
+                    for salary in Salary.objects.select_for_update().filter(
+                        user_id__in=user_ids[i:i + WRITE_BATCH_SIZE], period=self.period
+                    )
+                )
+            # Пересчет: старая детализация удаляется
+            salary_ids = [salary.id for salary in existing.values()]
+            for i in range(0, len(salary_ids), WRITE_BATCH_SIZE):
+                SalaryCalculation.objects.filter(salary_id__in=salary_ids[i:i + WRITE_BATCH_SIZE]).delete()
+
+            now = timezone.now()
+            salaries, new_salaries, calculations = [], [], []
+            for line in lines:
+                salary = existing.get(line.user_id)
+                if salary is None:
+                    salary = Salary(user_id=line.user_id, period=self.period, status='calculated')
+                    new_salaries.append(salary)
+                salary.updated_at = now
+                calculations.extend(self.apply(salary, line))
+                salaries.append(salary)
+
+            Salary.objects.bulk_create(new_salaries, batch_size=WRITE_BATCH_SIZE)
+            Salary.objects.bulk_update(list(existing.values()), SALARY_UPDATE_FIELDS, batch_size=WRITE_BATCH_SIZE)
+            # id новых ЗП известны только после bulk_create
+            SalaryCalculation.objects.bulk_create(calculations, batch_size=WRITE_BATCH_SIZE)
+
+        # Во внешней транзакции (фоновый расчет) - после ее коммита
+        company_ids = {line.company_id for line in lines}
+        transaction.on_commit(lambda: bump_data_version(company_ids))
+        return PayrollResult(salaries=salaries, created=len(new_salaries))
+
+    def run(self, users):
+        """Рассчитывает (или пересчитывает) ЗП сотрудников за период в этом процессе"""
+        return self.write(self.compute(users))
+
+    def compute_shards(self, shards, processes):
+        """
+        Считает шарды [список id сотрудников] в пуле процессов и отдает
+        (индекс шарда, строки) в порядке шардов. Запись остается за вызывающим.
+        """
+        if processes <= 1 or len(shards) <= 1:
+            for index, user_ids in enumerate(shards):
+                yield index, self.compute(User.objects.filter(id__in=user_ids))
+            return
+
+        # Дочерние процессы не должны унаследовать открытые соединения родителя
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+            results = pool.map(_compute_shard, [self.period] * len(shards), shards)
+            yield from enumerate(results)
+
+    def run_parallel(self, users, processes):
+        """Шарды по отделам считаются в processes процессах, запись - одна фаза здесь"""
+        shards = department_shards(users, processes * SHARDS_PER_PROCESS)
+        lines = []
+        for _, shard_lines in self.compute_shards(shards, processes):
+            lines.extend(shard_lines)
+        return self.write(lines)
+
+
+def department_shards(users, count=None):
+    """
+    Id сотрудников, сгруппированные по отделам (без отдела - последним шардом).
+    С count отделы целиком раскладываются в count шардов близкого размера.
+    """
+    by_department = defaultdict(list)
+    for user_id, department_id in users.order_by('id').values_list('id', 'department_id'):
+        by_department[department_id].append(user_id)
+    shards = [
+        by_department[key] for key in sorted(by_department, key=lambda value: (value is None, value or 0))
+    ]
+    if not count or len(shards) <= count:
+        return shards
+
+    # Крупные отделы первыми - в самый легкий шард
+    packed = [[] for _ in range(count)]
+    for shard in sorted(shards, key=len, reverse=True):
+        min(packed, key=len).extend(shard)
+    return packed
+
+
+def _init_worker():
+    # При старте spawn (не fork) Django в процессе еще не настроен
+    import django
+    django.setup()
+
+
+def _compute_shard(period, user_ids):
+    try:
+        return PayrollEngine(period).compute(User.objects.filter(id__in=user_ids))
+    finally:
+        connections.close_all()
@@ -0,0 +1,88 @@
+"""
+Текущие итоги ЗП (SalaryRunningTotal)
+
+Итог сотрудника за месяц пересчитывается по затронутым парам (сотрудник,
+месяц), как дневные сводки посещаемости: часы и переработки - при
+обновлении сводок (закрытие смены, пакетные отметки, автозакрытие,
+исправления), штрафы и авансы - сигналами моделей и из пакетных путей.
+Смена графика сбрасывает итоги его сотрудников (пересчет при чтении). Пересчет идет запросами
+PayrollEngine.totals (по четыре на месяц независимо от числа сотрудников),
+поэтому итоги совпадают с полным расчетом и не накапливают расхождений
+при параллельных изменениях.
+
+Расчет ЗП одного сотрудника читает одну строку итогов и только записывает
+результат (finalize_salary); "заработано на сегодня" - то же чтение без записи.
+"""
+from collections import defaultdict
+from django.utils import timezone
+from .models import SalaryRunningTotal
+from .payroll import ZERO, PayrollEngine
+
+RUNNING_UPDATE_FIELDS = ['hours', 'overtime_hours', 'penalties_amount', 'advances_amount', 'updated_at']
+
+
+def refresh_running_totals(keys):
+    """Пересчитывает итоги для пар (user_id, день месяца)"""
+    by_period = defaultdict(set)
+    for user_id, day in keys:
+        if user_id and day:
+            by_period[day.replace(day=1)].add(user_id)
+
+    now = timezone.now()
+    totals = []
+    for period, user_ids in by_period.items():
+        hours, overtime, penalties, advances = PayrollEngine(period).totals(sorted(user_ids))
+        totals.extend(
+            SalaryRunningTotal(
+                user_id=user_id,
+                period=period,
+                hours=hours.get(user_id) or ZERO,
+                overtime_hours=overtime.get(user_id) or ZERO,
+                penalties_amount=penalties.get(user_id) or ZERO,
+                advances_amount=advances.get(user_id) or ZERO,
+                updated_at=now,
+            )
+            for user_id in user_ids
+        )
+    if totals:
+        SalaryRunningTotal.objects.bulk_create(
+            totals,
+            update_conflicts=True,
+            unique_fields=['user', 'period'],
+            update_fields=RUNNING_UPDATE_FIELDS
+        )
+
+
+def advance_keys(user_id, start_date):
+    """
+    Аванс вычитается из ЗП всех месяцев с его даты (правило расчета ЗП),
+    поэтому затрагивает месяц аванса и уже заведенные итоги после него.
+    """
+    period = start_date.replace(day=1)
+    later = SalaryRunningTotal.objects.filter(user_id=user_id, period__gt=period).values_list('period', flat=True)
+    return [(user_id, period)] + [(user_id, later_period) for later_period in later]
+
+
+def get_running_total(user_id, period):
+    """Итоги сотрудника за месяц; отсутствующие (первое обращение) считаются сразу"""
+    period = period.replace(day=1)
+    total = SalaryRunningTotal.objects.filter(user_id=user_id, period=period).first()
+    if total is None:
+        refresh_running_totals([(user_id, period)])
+        total = SalaryRunningTotal.objects.get(user_id=user_id, period=period)
+    return total
+
+
+def running_line(user, period):
+    """Суммы ЗП сотрудника на текущий момент (PayrollLine) и строка итогов"""
+    total = get_running_total(user.id, period)
+    engine = PayrollEngine(period)
+    return engine.line(
+        user, total.hours, total.overtime_hours, total.penalties_amount, total.advances_amount
+    ), total
+
+
+def finalize_salary(user, period):
+    """ЗП сотрудника за месяц по текущим итогам: одно чтение и запись расчета"""
+    line, _ = running_line(user, period)
+    return PayrollEngine(period).write([line])
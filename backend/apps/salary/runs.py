@@ -0,0 +1,174 @@
+"""
+Фоновый расчет ЗП (PayrollRun)
+
+submit_run ставит расчет в очередь или возвращает незавершенный расчет той
+же компании, отдела и периода. Воркер run_payroll обрабатывает сотрудников
+по отделам: расчет отдела (PayrollEngine) и сдвиг контрольной точки
+completed_chunks коммитятся одной транзакцией, поэтому после падения
+воркера расчет, который перестал обновляться дольше STALE_AFTER, забирается
+заново и продолжается со следующего отдела. По завершении в группу
+dashboard отправляется событие payroll:completed.
+
+При PAYROLL_PROCESSES > 1 оставшиеся отделы считаются в пуле процессов,
+а запись и контрольная точка по-прежнему идут по отделу в воркере.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from apps.users.models import User
+from .models import PayrollRun
+from .payroll import PayrollEngine
+
+logger = logging.getLogger(__name__)
+channel_layer = get_channel_layer()
+
+ACTIVE_STATUSES = ['pending', 'running']
+STALE_AFTER = timedelta(minutes=10)
+
+
+def run_scope_key(company_id, department_id, period):
+    return f'{company_id or "none"}:{department_id or "all"}:{period.isoformat()}'
+
+
+def scope_users(company_id, department_id=None):
+    """Активные сотрудники расчета"""
+    users = User.objects.filter(is_active=True)
+    if company_id:
+        users = users.filter(company_id=company_id)
+    if department_id:
+        users = users.filter(department_id=department_id)
+    return users
+
+
+def chunk_users(run, department_id):
+    users = scope_users(run.company_id, run.department_id)
+    if department_id is None:
+        return users.filter(department__isnull=True)
+    return users.filter(department_id=department_id)
+
+
+def submit_run(company_id, department_id, period, user):
+    """(расчет, created); незавершенный расчет того же охвата переиспользуется"""
+    key = run_scope_key(company_id, department_id, period)
+    for _ in range(3):
+        existing = PayrollRun.objects.filter(scope_key=key, status__in=ACTIVE_STATUSES).first()
+        if existing:
+            return existing, False
+
+        users = scope_users(company_id, department_id)
+        # Отделы по возрастанию id, сотрудники без отдела - последним шагом
+        chunks = sorted(
+            set(users.values_list('department_id', flat=True)),
+            key=lambda value: (value is None, value or 0)
+        )
+        try:
+            with transaction.atomic():
+                run = PayrollRun.objects.create(
+                    company_id=company_id,
+                    department_id=department_id,
+                    period=period,
+                    scope_key=key,
+                    created_by=user,
+                    chunks=chunks,
+                    total_users=users.count(),
+                )
+            return run, True
+        except IntegrityError:
+            # Такой же расчет только что создал параллельный запрос
+            continue
+    raise IntegrityError('Не удалось создать расчет ЗП')
+
+
+def claim_run(now=None):
+    """Следующий расчет из очереди или зависший, помеченный running"""
+    now = now or timezone.now()
+    candidates = PayrollRun.objects.filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=now - STALE_AFTER)
+    ).order_by('created_at').values_list('id', 'status', 'updated_at')[:10]
+    for run_id, run_status, updated_at in candidates:
+        # Условный UPDATE: расчет забирает только один воркер
+        claimed = PayrollRun.objects.filter(id=run_id, status=run_status, updated_at=updated_at).update(
+            status='running', updated_at=now
+        )
+        if claimed:
+            run = PayrollRun.objects.get(id=run_id)
+            if run.started_at is None:
+                PayrollRun.objects.filter(id=run_id).update(started_at=now)
+            return run
+    return None
+
+
+def process_chunk(run, index):
+    """Расчет одного отдела вместе с контрольной точкой"""
+    with transaction.atomic():
+        result = PayrollEngine(run.period).run(chunk_users(run, run.chunks[index]))
+        PayrollRun.objects.filter(id=run.id).update(
+            completed_chunks=index + 1,
+            processed_users=F('processed_users') + len(result.salaries),
+            updated_at=timezone.now(),
+        )
+
+
+def write_chunk(run, index, engine, lines):
+    """Запись отдела, посчитанного в пуле процессов, вместе с контрольной точкой"""
+    with transaction.atomic():
+        result = engine.write(lines)
+        PayrollRun.objects.filter(id=run.id).update(
+            completed_chunks=index + 1,
+            processed_users=F('processed_users') + len(result.salaries),
+            updated_at=timezone.now(),
+        )
+
+
+def process_run(run, processes=None):
+    """Обрабатывает оставшиеся отделы расчета; ошибка сохраняется в расчете"""
+    processes = processes or settings.PAYROLL_PROCESSES
+    try:
+        remaining = range(run.completed_chunks, len(run.chunks))
+        if processes > 1 and len(remaining) > 1:
+            engine = PayrollEngine(run.period)
+            shards = [
+                list(chunk_users(run, run.chunks[index]).values_list('id', flat=True))
+                for index in remaining
+            ]
+            for offset, lines in engine.compute_shards(shards, processes):
+                write_chunk(run, remaining[offset], engine, lines)
+        else:
+            for index in remaining:
+                process_chunk(run, index)
+        PayrollRun.objects.filter(id=run.id).update(
+            status='done', finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    except Exception as e:
+        logger.exception(f'Payroll run {run.id} failed')
+        PayrollRun.objects.filter(id=run.id).update(
+            status='failed', error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    run.refresh_from_db()
+    send_run_event(run)
+    return run
+
+
+def send_run_event(run):
+    try:
+        if channel_layer:
+            async_to_sync(channel_layer.group_send)(
+                'dashboard',
+                {
+                    'type': 'payroll_completed',
+                    'run_id': run.id,
+                    'company_id': run.company_id,
+                    'department_id': run.department_id,
+                    'period': run.period.strftime('%Y-%m'),
+                    'status': run.status,
+                    'processed_users': run.processed_users,
+                    'total_users': run.total_users,
+                }
+            )
+    except Exception as e:
+        logger.warning(f"Failed to send WebSocket event: {e}")
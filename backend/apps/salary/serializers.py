@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Salary, SalaryCalculation
+from .models import PayrollRun, Salary, SalaryCalculation
 from apps.users.serializers import UserSerializer
 
 
@@ -31,3 +31,20 @@ class SalarySerializer(serializers.ModelSerializer):
 class SalaryCalculateSerializer(serializers.Serializer):
     period = serializers.CharField()  # YYYY-MM format
 
+
+class PayrollRunSerializer(serializers.ModelSerializer):
+    period = serializers.DateField(format='%Y-%m', read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+    total_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PayrollRun
+        fields = [
+            'id', 'company', 'department', 'period', 'status', 'progress',
+            'completed_chunks', 'total_chunks', 'processed_users', 'total_users',
+            'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_total_chunks(self, obj):
+        return len(obj.chunks)
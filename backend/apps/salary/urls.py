@@ -1,11 +1,13 @@
 from django.urls import path
 from .views import (
     SalaryListCreateView, SalaryRetrieveUpdateDestroyView,
-    SalaryCalculateView
+    SalaryCalculateView, SalaryEarnedView, PayrollRunDetailView
 )
 
 urlpatterns = [
     path('', SalaryListCreateView.as_view(), name='salary-list-create'),
     path('<int:pk>/', SalaryRetrieveUpdateDestroyView.as_view(), name='salary-detail'),
     path('calculate/', SalaryCalculateView.as_view(), name='salary-calculate'),
+    path('earned/', SalaryEarnedView.as_view(), name='salary-earned'),
+    path('runs/<int:pk>/', PayrollRunDetailView.as_view(), name='salary-run-detail'),
 ]
@@ -2,14 +2,14 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q
-from datetime import datetime, timedelta
-from decimal import Decimal
+from datetime import datetime
+from django.utils import timezone
 from config.mixins import TenantFilterMixin
-from .models import Salary, SalaryCalculation
-from .serializers import SalarySerializer, SalaryCalculateSerializer
-from apps.attendance.models import Attendance
-from apps.requests.models import Request, Penalty
+from config.pagination import HybridPagination
+from .models import PayrollRun, Salary
+from .running import finalize_salary, running_line
+from .runs import submit_run
+from .serializers import PayrollRunSerializer, SalarySerializer, SalaryCalculateSerializer
 
 
 class SalaryListCreateView(TenantFilterMixin, generics.ListCreateAPIView):
@@ -17,6 +17,8 @@ class SalaryListCreateView(TenantFilterMixin, generics.ListCreateAPIView):
     queryset = Salary.objects.all()
     serializer_class = SalarySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HybridPagination
+    cursor_ordering = '-created_at'
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -123,11 +125,33 @@ class SalaryCalculateView(APIView):
         
         from apps.users.models import User
         
-        # Определяем список пользователей для расчета
+        # Расчет по отделу или компании - в фоне (воркер run_payroll)
+        if not user_id and request.user.role in ['manager', 'admin']:
+            if request.user.role == 'manager':
+                if not request.user.department_id:
+                    return Response({
+                        'error': {
+                            'code': 'NO_DEPARTMENT',
+                            'message': 'У руководителя не указан отдел'
+                        }
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                department_id = request.user.department_id
+            else:
+                department_id = request.data.get('department_id')
+                try:
+                    department_id = int(department_id) if department_id else None
+                except (ValueError, TypeError):
+                    department_id = None
+            company = getattr(request, 'company', None) or request.user.company
+            run, created = submit_run(company.id if company else None, department_id, period_date, request.user)
+            return Response(
+                {**PayrollRunSerializer(run).data, 'deduplicated': not created},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
         if user_id:
-            # Рассчитываем для одного пользователя
             try:
-                users_to_calculate = [User.objects.get(id=user_id)]
+                user = User.objects.get(id=user_id)
             except User.DoesNotExist:
                 return Response({
                     'error': {
@@ -136,136 +160,84 @@ class SalaryCalculateView(APIView):
                     }
                 }, status=status.HTTP_404_NOT_FOUND)
         else:
-            # Рассчитываем для всех пользователей (в зависимости от роли)
-            if request.user.role == 'employee':
-                users_to_calculate = [request.user]
-            elif request.user.role == 'manager' and request.user.department:
-                users_to_calculate = User.objects.filter(department=request.user.department, is_active=True)
-            else:  # admin
-                users_to_calculate = User.objects.filter(is_active=True)
-        
-        # Рассчитываем ЗП для каждого пользователя
-        results = []
-        any_created = False
-        for user in users_to_calculate:
-            # Проверяем, не рассчитана ли уже ЗП
-            salary, created = Salary.objects.get_or_create(
-                user=user,
-                period=period_date,
-                defaults={'status': 'calculated', 'base_hours': Decimal('0.00'), 'base_amount': Decimal('0.00'), 'total_amount': Decimal('0.00')}
-            )
-            
-            if created:
-                any_created = True
-            
-            if not created:
-                # Пересчитываем
-                salary.calculations.all().delete()
-            
-            # Рассчитываем ЗП
-            self._calculate_salary(user.id, period_date, salary)
-            results.append(salary)
-        
-        # Возвращаем список результатов или один результат
-        if len(results) == 1:
-            return Response(SalarySerializer(results[0]).data, status=status.HTTP_201_CREATED if any_created else status.HTTP_200_OK)
-        else:
-            return Response(SalarySerializer(results, many=True).data, status=status.HTTP_201_CREATED)
+            user = request.user
+        
+        # Один сотрудник: чтение текущих итогов месяца и запись расчета
+        result = finalize_salary(user, period_date)
+        salary = Salary.objects.select_related('user', 'user__department').prefetch_related(
+            'calculations'
+        ).get(id=result.salaries[0].id)
+        return Response(
+            SalarySerializer(salary).data,
+            status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK
+        )
+
+
+class PayrollRunDetailView(APIView):
+    """Статус и прогресс фонового расчета ЗП (Manager/Admin)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        user = request.user
+        company = getattr(request, 'company', None) or user.company
+        run = PayrollRun.objects.filter(id=pk, company=company).first()
+        if run and user.role == 'manager' and run.department_id != user.department_id:
+            run = None
+        if run is None or user.role == 'employee':
+            return Response({
+                'error': {
+                    'code': 'NOT_FOUND',
+                    'message': 'Расчет не найден'
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(PayrollRunSerializer(run).data)
+
+
+class SalaryEarnedView(APIView):
+    """Заработано за месяц на текущий момент (по текущим итогам, без расчета ЗП)"""
+    permission_classes = [IsAuthenticated]
 
-    def _calculate_salary(self, user_id, period_date, salary):
-        """Логика расчета ЗП"""
+    def get(self, request):
         from apps.users.models import User
-        
-        user = User.objects.get(id=user_id)
-        
-        # Начало и конец периода (period_date всегда первое число месяца)
-        start_date = period_date
-        if period_date.month == 12:
-            end_date = period_date.replace(year=period_date.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            end_date = period_date.replace(month=period_date.month + 1, day=1) - timedelta(days=1)
-        
-        # Отработанные часы
-        attendances = Attendance.objects.filter(
-            user=user,
-            checkin_time__date__gte=start_date,
-            checkin_time__date__lte=end_date,
-            checkout_time__isnull=False
-        )
-        
-        total_hours = sum(float(att.total_hours or 0) for att in attendances)
-        
-        # Базовая сумма
-        if user.salary_type == 'fixed':
-            # Фиксированная ЗП
-            base_amount = user.fixed_salary or Decimal('0.00')
-            base_hours = Decimal('0.00')
-        else:
-            # Почасовая оплата
-            hourly_rate = user.hourly_rate or Decimal('0.00')
-            base_hours = Decimal(str(total_hours))
-            base_amount = base_hours * hourly_rate
-        
-        salary.base_hours = base_hours
-        salary.base_amount = base_amount
-        
-        # Переработки (если есть норма часов)
-        # TODO: Добавить логику переработок
-        
-        # Штрафы
-        penalties = Penalty.objects.filter(
-            user=user,
-            period=period_date,
-            status='active'
-        )
-        penalties_amount = penalties.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        salary.penalties_amount = penalties_amount
-        
-        # Авансы
-        advances = Request.objects.filter(
-            user=user,
-            request_type='advance',
-            status='approved',
-            start_date__lte=end_date
-        )
-        advances_amount = advances.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        salary.advances_amount = advances_amount
-        
-        # Итоговая сумма
-        salary.total_amount = base_amount + salary.overtime_amount - penalties_amount - advances_amount
-        
-        salary.save()
-        
-        # Детализация
-        SalaryCalculation.objects.create(
-            salary=salary,
-            calculation_type='base',
-            description=f'Отработанные часы ({base_hours} ч × {user.hourly_rate or 0} руб)',
-            amount=base_amount
-        )
-        
-        if salary.overtime_amount > 0:
-            SalaryCalculation.objects.create(
-                salary=salary,
-                calculation_type='overtime',
-                description=f'Переработки ({salary.overtime_hours} ч)',
-                amount=salary.overtime_amount
-            )
-        
-        if penalties_amount > 0:
-            SalaryCalculation.objects.create(
-                salary=salary,
-                calculation_type='penalty',
-                description='Штрафы',
-                amount=-penalties_amount
-            )
-        
-        if advances_amount > 0:
-            SalaryCalculation.objects.create(
-                salary=salary,
-                calculation_type='advance',
-                description='Авансы',
-                amount=-advances_amount
-            )
-        
-        return salary
+
+        user = request.user
+        target = user
+        user_id = request.query_params.get('user_id')
+        if user_id and user.role in ['manager', 'admin']:
+            company = getattr(request, 'company', None) or user.company
+            target = User.objects.filter(id=user_id, company=company).first()
+            if target and user.role == 'manager' and target.department_id != user.department_id:
+                target = None
+            if target is None:
+                return Response({
+                    'error': {
+                        'code': 'NOT_FOUND',
+                        'message': 'Пользователь не найден'
+                    }
+                }, status=status.HTTP_404_NOT_FOUND)
+
+        period = request.query_params.get('period')
+        try:
+            period_date = datetime.strptime(period, '%Y-%m').date() if period else timezone.localdate()
+        except ValueError:
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Неверный формат периода. Используйте YYYY-MM'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        period_date = period_date.replace(day=1)
+
+        line, total = running_line(target, period_date)
+        return Response({
+            'user_id': target.id,
+            'period': period_date.strftime('%Y-%m'),
+            'base_hours': line.base_hours,
+            'base_amount': line.base_amount,
+            'overtime_hours': line.overtime_hours,
+            'overtime_amount': line.overtime_amount,
+            'penalties_amount': line.penalties_amount,
+            'advances_amount': line.advances_amount,
+            'total_amount': line.total_amount,
+            'updated_at': timezone.localtime(total.updated_at),
+        })
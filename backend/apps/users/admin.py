@@ -5,7 +5,7 @@ from .models import User, Company
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'domain', 'is_active', 'created_at']
+    list_display = ['id', 'name', 'domain', 'timezone', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'domain']
     list_editable = ['is_active']
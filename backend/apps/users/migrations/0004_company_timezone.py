@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_remove_company_name_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='timezone',
+            field=models.CharField(default='Asia/Tashkent', max_length=64, verbose_name='Часовой пояс'),
+        ),
+    ]
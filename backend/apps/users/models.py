@@ -1,12 +1,18 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
+from apps.reports.cache import bump_data_version
 
 
 class Company(models.Model):
     """Модель компании для мультитенантности"""
     name = models.CharField(max_length=200, verbose_name='Название компании')
     domain = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='Домен')
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE, verbose_name='Часовой пояс')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
@@ -21,6 +27,28 @@ class Company(models.Model):
         return self.name
 
 
+# Кэш часовых поясов компаний в процессе: {company_id: ZoneInfo}
+_company_timezones = {}
+
+
+def get_company_timezone(company_id):
+    """Часовой пояс компании (по умолчанию - TIME_ZONE проекта)"""
+    if company_id is None:
+        return ZoneInfo(settings.TIME_ZONE)
+    if company_id not in _company_timezones:
+        name = Company.objects.filter(id=company_id).values_list('timezone', flat=True).first()
+        try:
+            _company_timezones[company_id] = ZoneInfo(name or settings.TIME_ZONE)
+        except (ZoneInfoNotFoundError, ValueError):
+            _company_timezones[company_id] = ZoneInfo(settings.TIME_ZONE)
+    return _company_timezones[company_id]
+
+
+@receiver(post_save, sender=Company)
+def reset_company_timezone(sender, instance, **kwargs):
+    _company_timezones.pop(instance.id, None)
+
+
 class UserManager(BaseUserManager):
     def create_user(self, email=None, password=None, **extra_fields):
         if not email and not extra_fields.get('telegram_id'):
@@ -123,3 +151,29 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # График на момент загрузки: его смена сбрасывает текущие итоги ЗП
+        instance._loaded_work_schedule_id = instance.__dict__.get('work_schedule_id')
+        return instance
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_report_version(sender, instance, update_fields=None, **kwargs):
+    # Вход в систему (last_login) на отчеты не влияет
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_data_version([instance.company_id])
+
+
+@receiver(post_save, sender=User)
+def reset_running_overtime(sender, instance, created, **kwargs):
+    # Переработки в текущих итогах ЗП зависят от графика сотрудника - сброс только при его смене
+    previous = getattr(instance, '_loaded_work_schedule_id', None)
+    instance._loaded_work_schedule_id = instance.__dict__.get('work_schedule_id')
+    if created or previous == instance._loaded_work_schedule_id:
+        return
+    from apps.salary.models import SalaryRunningTotal
+    SalaryRunningTotal.objects.filter(user=instance).delete()
@@ -29,9 +29,11 @@ class TenantFilterMixin:
         return queryset
     
     def perform_create(self, serializer):
-        # Автоматически устанавливаем company при создании
+        # Автоматически устанавливаем company при создании.
+        # Модели с user (Attendance и др.) сохраняются от имени пользователя,
+        # денормализованная company берется из него
         if hasattr(self.request, 'company') and self.request.company:
-            if hasattr(serializer.Meta.model, 'company'):
+            if hasattr(serializer.Meta.model, 'company') and not hasattr(serializer.Meta.model, 'user'):
                 serializer.save(company=self.request.company)
             elif hasattr(serializer.Meta.model, 'user'):
                 # Для моделей с user, company берется из user
@@ -46,7 +48,7 @@ class TenantFilterMixin:
             # Если company не определена, пытаемся взять из user
             if hasattr(self.request, 'user') and self.request.user.is_authenticated:
                 if hasattr(self.request.user, 'company') and self.request.user.company:
-                    if hasattr(serializer.Meta.model, 'company'):
+                    if hasattr(serializer.Meta.model, 'company') and not hasattr(serializer.Meta.model, 'user'):
                         serializer.save(company=self.request.user.company)
                     elif hasattr(serializer.Meta.model, 'user'):
                         serializer.save(user=self.request.user)
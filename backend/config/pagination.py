@@ -0,0 +1,180 @@
+"""
+Пагинация больших списков
+
+HybridPagination по умолчанию ведет себя как PageNumberPagination (page, count),
+а при параметре cursor (или pagination=cursor для первой страницы) переходит
+на keyset пагинацию по (поле сортировки, id): WHERE (field, id) < (v, id)
+ORDER BY field, id LIMIT n. Глубокие страницы стоят столько же, сколько первая,
+COUNT(*) не выполняется.
+
+count=estimate заменяет точный COUNT(*) оценкой планировщика PostgreSQL.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по статистике планировщика (PostgreSQL), иначе точный COUNT"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с count=estimate"""
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset пагинация по (поле сортировки, id).
+
+    Поле берется из OrderingFilter представления (ordering / ?ordering=),
+    иначе из атрибута представления cursor_ordering.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = '-created_at'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+        self.count = (
+            estimate_count(queryset)
+            if request.query_params.get(self.count_query_param) == 'estimate' else None
+        )
+
+        position, pk, reverse = self.decode_cursor(request, queryset)
+        # Прямой проход по убыванию или обратный по возрастанию используют "<"
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if position is not None:
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': position}) |
+                Q(**{self.field: position, f'pk__{lookup}': pk})
+            )
+        prefix = '-' if lookup == 'lt' else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        self.next_item = results[-1] if results and has_next else None
+        self.previous_item = results[0] if results and has_previous else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        term = ordering[0] if ordering else getattr(view, 'cursor_ordering', self.ordering)
+        if '__' in term:
+            term = getattr(view, 'cursor_ordering', self.ordering)
+        return term.lstrip('-'), term.startswith('-')
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if data['f'] != self.field:
+                raise ValueError
+            position = queryset.model._meta.get_field(self.field).to_python(data['v'])
+            return position, int(data['id']), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        # Элемент страницы - модель или строка values()
+        if isinstance(item, dict):
+            value, pk = item[self.field], item['id']
+        else:
+            value, pk = getattr(item, self.field), item.pk
+        data = {
+            'f': self.field,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else value,
+            'id': pk,
+            'r': int(reverse)
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_item, False) if self.next_item else None
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_item, True) if self.previous_item else None
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class HybridPagination(BasePagination):
+    """Номера страниц по умолчанию, keyset при ?cursor= или ?pagination=cursor"""
+    page_number_class = EstimatedCountPageNumberPagination
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        use_keyset = (
+            self.keyset_class.cursor_query_param in request.query_params or
+            request.query_params.get('pagination') == 'cursor'
+        )
+        self.paginator = self.keyset_class() if use_keyset else self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'apps.requests',
     'apps.face_id',
     'apps.geolocation',
+    'apps.reports',
 ]
 
 MIDDLEWARE = [
@@ -111,6 +112,23 @@ REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = os.getenv('REDIS_PORT', '6379')
 REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 
+# Кэш (дашборд и отчеты): CACHE_BACKEND=redis - общий для всех воркеров gunicorn,
+# иначе память процесса (разработка)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Channels
 CHANNEL_LAYERS = {
     'default': {
@@ -121,6 +139,26 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Очередь отметок прихода (write-behind): '' - синхронная запись,
+# 'redis' - Redis stream, 'memory' - очередь в процессе (тесты, разработка)
+ATTENDANCE_CHECKIN_QUEUE = os.getenv('ATTENDANCE_CHECKIN_QUEUE', '')
+
+# Ростер присутствия для /api/attendance/active/: '' - из SQL,
+# 'redis' - хэши Redis, 'memory' - в процессе (тесты, разработка)
+ATTENDANCE_PRESENCE_BACKEND = os.getenv('ATTENDANCE_PRESENCE_BACKEND', '')
+
+# Штраф за отсутствие без уважительной причины (detect_absences), 0 - только учет
+ABSENCE_PENALTY_AMOUNT = os.getenv('ABSENCE_PENALTY_AMOUNT', '0')
+
+# Холодный архив посещаемости (archive_attendance): {dir}/{company_id}/{YYYY-MM}.npz
+ATTENDANCE_ARCHIVE_DIR = os.getenv('ATTENDANCE_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Коэффициент оплаты часов сверх графика (переработки) к часовой ставке, только почасовым сотрудникам
+OVERTIME_RATE_MULTIPLIER = os.getenv('OVERTIME_RATE_MULTIPLIER', '1.5')
+
+# Процессы фонового расчета ЗП (run_payroll): отделы считаются параллельно, 1 - в воркере
+PAYROLL_PROCESSES = int(os.getenv('PAYROLL_PROCESSES', '1'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -32,7 +32,7 @@ urlpatterns = [
     path('api/requests/', include('apps.requests.urls')),
     path('api/face-id/', include('apps.face_id.urls')),
     path('api/geolocation/', include('apps.geolocation.urls')),
-    path('api/reports/', include('apps.attendance.urls')),
+    path('api/reports/', include('apps.reports.urls')),
     
     # API Documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),